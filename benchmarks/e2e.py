@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+"""
+End-to-end benchmarks of mbget update against a local fake GitHub.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.e2e --deps 1 10 50 --latency 0.02 --output e2e.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import mbget
+from mbget import main
+from benchmarks.fake_github import FakeGithub
+
+# Prepares the project in a directory before the timed run
+Setup = Callable[[str, "Scenario"], None]
+
+
+class Scenario(object):
+    def __init__(
+        self,
+        github: FakeGithub,
+        dependencies: int,
+        requirement: str = "1.0",
+        jobs: int = 4,
+        token: Optional[str] = None,
+    ):
+        self.github = github
+        self.dependencies = dependencies
+        self.requirement = requirement
+        self.jobs = jobs
+        self.token = token
+
+    @property
+    def package_names(self) -> List[str]:
+        return ["Package{:03d}".format(i) for i in range(self.dependencies)]
+
+    def write_project(self, root: str, store: str = "none") -> None:
+        os.makedirs(root)
+
+        manifest = (
+            '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+            "<iq:application><iq:barrels>"
+        )
+        for name in self.package_names:
+            manifest += '<iq:depends name="{name}" version="{version}"/>'.format(
+                name=name, version=self.requirement
+            )
+        manifest += "</iq:barrels></iq:application></iq:manifest>"
+        with open(os.path.join(root, "manifest.xml"), "w") as f:
+            f.write(manifest)
+
+        with open(os.path.join(root, "packages.txt"), "w") as f:
+            for name in self.package_names:
+                f.write("{name}=>bench/{name}\n".format(name=name))
+
+        with open(os.path.join(root, "mbgetcfg.ini"), "w") as f:
+            f.write("[mbget]\n")
+            f.write("api_url = {url}\n".format(url=self.github.url))
+            f.write("store = {store}\n".format(store=store))
+            f.write("jobs = {jobs}\n".format(jobs=self.jobs))
+
+    def run_update(self, root: str) -> None:
+        args = argparse.Namespace(
+            token=self.token,
+            package=None,
+            directory=None,
+            jungle=None,
+            manifest=None,
+            config=None,
+            jobs=None,
+            verify=None,
+            workspace=None,
+        )
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            main.run_update(args)
+        finally:
+            os.chdir(cwd)
+
+    def missing_barrels(self, root: str) -> List[str]:
+        return [
+            name
+            for name in self.package_names
+            if not os.path.exists(
+                os.path.join(root, ".mbpkg", "{name}.barrel".format(name=name))
+            )
+        ]
+
+
+def setup_cold(workdir: str, scenario: Scenario) -> None:
+    """
+    Nothing downloaded yet
+    """
+    scenario.write_project(os.path.join(workdir, "project"))
+
+
+def setup_warm(workdir: str, scenario: Scenario) -> None:
+    """
+    Every barrel already downloaded by a previous update
+    """
+    setup_cold(workdir, scenario)
+    scenario.run_update(os.path.join(workdir, "project"))
+
+
+def setup_partial(workdir: str, scenario: Scenario) -> None:
+    """
+    Half of the barrels were removed since the previous update
+    """
+    setup_warm(workdir, scenario)
+    barrel_dir = os.path.join(workdir, "project", ".mbpkg")
+    for name in scenario.package_names[::2]:
+        os.remove(os.path.join(barrel_dir, "{name}.barrel".format(name=name)))
+
+
+def setup_store(workdir: str, scenario: Scenario) -> None:
+    """
+    A new project whose barrels were all downloaded to the store by another
+    """
+    store = os.path.join(workdir, "store")
+    scenario.write_project(os.path.join(workdir, "other"), store)
+    scenario.run_update(os.path.join(workdir, "other"))
+    scenario.write_project(os.path.join(workdir, "project"), store)
+
+
+SCENARIOS: Dict[str, Setup] = {
+    "cold": setup_cold,
+    "warm": setup_warm,
+    "partial": setup_partial,
+    "store": setup_store,
+}
+
+
+def run_scenario(name: str, scenario: Scenario, repeat: int) -> Dict[str, Any]:
+    """
+    Time repeat updates of a freshly prepared project.
+
+    :return: The scenario's results, with the fake GitHub's request counts of
+             each run
+    """
+    runs = []
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="mbget-bench-")
+        try:
+            SCENARIOS[name](workdir, scenario)
+            root = os.path.join(workdir, "project")
+
+            scenario.github.reset_stats()
+            start = time.perf_counter()
+            scenario.run_update(root)
+            seconds = time.perf_counter() - start
+
+            missing = scenario.missing_barrels(root)
+            if len(missing) > 0:
+                raise RuntimeError(
+                    "{name}: {count} barrels were not installed".format(
+                        name=name, count=len(missing)
+                    )
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        runs.append(dict(scenario.github.stats, seconds=seconds))
+
+    times = [run["seconds"] for run in runs]
+    return {
+        "scenario": name,
+        "dependencies": scenario.dependencies,
+        "seconds": {
+            "min": min(times),
+            "median": statistics.median(times),
+            "max": max(times),
+        },
+        "runs": runs,
+    }
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    github = FakeGithub(
+        releases=args.releases,
+        asset_size=args.asset_size,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    results = []
+    with github:
+        for count in args.deps:
+            scenario = Scenario(
+                github,
+                count,
+                args.requirement,
+                args.jobs,
+                "bench" if args.token else None,
+            )
+            for name in scenario.package_names:
+                github.add_repo("bench/{name}".format(name=name), name)
+
+            for name in args.scenario:
+                result = run_scenario(name, scenario, args.repeat)
+                print(
+                    "{scenario} with {deps} dependencies: {median:.3f}s".format(
+                        scenario=name, deps=count, median=result["seconds"]["median"]
+                    ),
+                    file=sys.stderr,
+                )
+                results.append(result)
+
+    return {
+        "mbget": mbget.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "scenario", "deps", "verbose")
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark mbget update against a local fake GitHub"
+    )
+    parser.add_argument(
+        "--scenario",
+        nargs="+",
+        choices=sorted(SCENARIOS),
+        default=["cold", "warm", "partial", "store"],
+        help="Scenarios to run (default: all)",
+    )
+    parser.add_argument(
+        "--deps",
+        nargs="+",
+        type=int,
+        default=[10],
+        help="Numbers of dependencies to run each scenario with (default: 10)",
+    )
+    parser.add_argument(
+        "--releases", type=int, default=10, help="Releases per repository"
+    )
+    parser.add_argument(
+        "--asset-size", type=int, default=64 * 1024, help="Barrel size in bytes"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to each response"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, help="API requests allowed per rate limit window"
+    )
+    parser.add_argument(
+        "--rate-limit-window",
+        type=float,
+        default=60.0,
+        help="Seconds until the rate limit resets",
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="Share of downloads that are dropped half way",
+    )
+    parser.add_argument(
+        "--requirement",
+        default="1.0",
+        help="Version every dependency requires (default: 1.0, any 1.0.x)",
+    )
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent downloads")
+    parser.add_argument(
+        "--token",
+        action="store_true",
+        help="Run with a token, resolving with GraphQL and downloading over the API",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--seed", type=int, default=0, help="Failure injection seed")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument(
+        "--verbose", action="store_true", help="Show the warnings logged by mbget"
+    )
+    return parser.parse_args(argv)
+
+
+def main_benchmark(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(
+        format="%(levelname)s:%(message)s",
+        level=logging.INFO if args.verbose else logging.ERROR,
+    )
+
+    results = run_benchmarks(args)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main_benchmark()
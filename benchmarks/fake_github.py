@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import io
+import json
+import random
+import re
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+def build_barrel(package_name: str, size: int, depends: Dict[str, str]) -> bytes:
+    """
+    Build a barrel of roughly size bytes, with a manifest that requires depends
+    """
+    manifest = (
+        '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+        '<iq:barrel module="{name}"><iq:barrels>'
+    ).format(name=package_name)
+    for name, version in sorted(depends.items()):
+        manifest += '<iq:depends name="{name}" version="{version}"/>'.format(
+            name=name, version=version
+        )
+    manifest += "</iq:barrels></iq:barrel></iq:manifest>"
+
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w", zipfile.ZIP_STORED) as barrel:
+        barrel.writestr("manifest.xml", manifest)
+        # Random content, so the barrel neither compresses nor deduplicates
+        barrel.writestr(
+            "resources/data.bin",
+            (
+                random.Random(package_name).getrandbits(8 * size).to_bytes(size, "big")
+                if size > 0
+                else b""
+            ),
+        )
+
+    return content.getvalue()
+
+
+class _FakeRepo(object):
+    def __init__(
+        self, repo: str, package_name: str, first_id: int, depends: Dict[str, str]
+    ):
+        self.repo = repo
+        self.package_name = package_name
+        self.first_id = first_id
+        self.depends = depends
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, github: "FakeGithub"):
+        super(_Server, self).__init__(("127.0.0.1", 0), _Handler)
+        self.github = github
+
+
+class FakeGithub(object):
+    """
+    A local stand-in for the GitHub REST and GraphQL APIs and for the host that
+    serves release assets, for benchmarking mbget without network access.
+
+    Each repository publishes tags v1.0.0 to v1.0.<releases - 1>, each with one
+    barrel of about asset_size bytes. Every response is delayed by latency
+    seconds. API requests count against a quota of rate_limit requests per
+    rate_limit_window seconds, past which GitHub's rate limit error is
+    returned; asset downloads do not count. failure_rate is the share of asset
+    downloads that drop the connection half way through the content.
+    """
+
+    def __init__(
+        self,
+        releases: int = 10,
+        asset_size: int = 64 * 1024,
+        latency: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_limit_window: float = 60.0,
+        failure_rate: float = 0.0,
+        per_page: int = 30,
+        seed: int = 0,
+    ):
+        self.releases = releases
+        self.asset_size = asset_size
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.failure_rate = failure_rate
+        self.per_page = per_page
+
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__repos: Dict[str, _FakeRepo] = {}
+        self.__barrels: Dict[Tuple[str, str], bytes] = {}
+        self.__window_start = time.time()
+        self.__window_calls = 0
+        self.__server: Optional[_Server] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.reset_stats()
+
+    def __enter__(self) -> "FakeGithub":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self.__server = _Server(self)
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    @property
+    def url(self) -> str:
+        assert self.__server is not None, "The server is not running"
+        return "http://127.0.0.1:{port}".format(port=self.__server.server_address[1])
+
+    def add_repo(
+        self, repo: str, package_name: str, depends: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Publish a repository whose barrels are named after package_name and
+        require the packages in depends
+        """
+        with self.__lock:
+            first_id = (len(self.__repos) + 1) * 100000
+            self.__repos[repo] = _FakeRepo(repo, package_name, first_id, depends or {})
+
+    def reset_stats(self) -> None:
+        with self.__lock:
+            self.stats: Dict[str, int] = {
+                "api_requests": 0,
+                "graphql_requests": 0,
+                "downloads": 0,
+                "bytes_sent": 0,
+                "rate_limited": 0,
+                "failures": 0,
+            }
+
+    def count(self, stat: str, value: int = 1) -> None:
+        with self.__lock:
+            self.stats[stat] += value
+
+    def should_fail(self) -> bool:
+        with self.__lock:
+            return self.__random.random() < self.failure_rate
+
+    def take_quota(self) -> Tuple[bool, Dict[str, str]]:
+        """
+        Count an API request against the rate limit.
+
+        :return: Whether the request is within the limit, and the rate limit
+                 headers to answer it with
+        """
+        limit = self.rate_limit if self.rate_limit is not None else 5000
+        with self.__lock:
+            now = time.time()
+            if now >= self.__window_start + self.rate_limit_window:
+                self.__window_start = now
+                self.__window_calls = 0
+
+            allowed = self.rate_limit is None or self.__window_calls < limit
+            if allowed:
+                self.__window_calls += 1
+            else:
+                self.stats["rate_limited"] += 1
+
+            reset = self.__window_start + self.rate_limit_window
+            headers = {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(max(0, limit - self.__window_calls)),
+                "X-RateLimit-Reset": str(int(reset + 0.999)),
+            }
+
+        return allowed, headers
+
+    def find_repo(self, repo: str) -> Optional[_FakeRepo]:
+        return self.__repos.get(repo)
+
+    def tags(self, repo: _FakeRepo) -> List[str]:
+        """
+        The release tags of a repository, newest first
+        """
+        return ["v1.0.{}".format(i) for i in reversed(range(self.releases))]
+
+    def barrel(self, repo: _FakeRepo, tag: str) -> bytes:
+        key = (repo.repo, tag)
+        with self.__lock:
+            content = self.__barrels.get(key)
+        if content is None:
+            content = build_barrel(repo.package_name, self.asset_size, repo.depends)
+            with self.__lock:
+                self.__barrels[key] = content
+        return content
+
+    def release_id(self, repo: _FakeRepo, tag: str) -> int:
+        return repo.first_id + int(tag.rpartition(".")[2])
+
+    def asset_name(self, repo: _FakeRepo) -> str:
+        return "{name}.barrel".format(name=repo.package_name)
+
+    def release_json(self, repo: _FakeRepo, tag: str) -> Dict[str, Any]:
+        release_id = self.release_id(repo, tag)
+        asset_id = release_id * 10 + 1
+        name = self.asset_name(repo)
+        api = "{url}/repos/{repo}".format(url=self.url, repo=repo.repo)
+        return {
+            "id": release_id,
+            "url": "{api}/releases/{id}".format(api=api, id=release_id),
+            "tag_name": tag,
+            "name": tag,
+            "draft": False,
+            "prerelease": False,
+            "created_at": "2020-01-01T00:00:00Z",
+            "published_at": "2020-01-01T00:00:00Z",
+            "assets": [
+                {
+                    "id": asset_id,
+                    "name": name,
+                    "url": "{api}/releases/assets/{id}".format(api=api, id=asset_id),
+                    "browser_download_url": "{url}/download/{repo}/{tag}/{name}".format(
+                        url=self.url, repo=repo.repo, tag=tag, name=name
+                    ),
+                    "content_type": "application/octet-stream",
+                    "state": "uploaded",
+                    "size": len(self.barrel(repo, tag)),
+                }
+            ],
+        }
+
+    def find_asset(self, repo: _FakeRepo, asset_id: int) -> Optional[str]:
+        """
+        :return: The tag of the release that holds the asset
+        """
+        for tag in self.tags(repo):
+            if self.release_id(repo, tag) * 10 + 1 == asset_id:
+                return tag
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    RELEASES = re.compile(r"^/repos/([^/]+/[^/]+)/releases$")
+    RELEASE_BY_TAG = re.compile(r"^/repos/([^/]+/[^/]+)/releases/tags/([^/]+)$")
+    ASSET = re.compile(r"^/repos/([^/]+/[^/]+)/releases/assets/(\d+)$")
+    REPO = re.compile(r"^/repos/([^/]+/[^/]+)$")
+    DOWNLOAD = re.compile(r"^/download/([^/]+/[^/]+)/([^/]+)/([^/]+)$")
+
+    server: _Server
+
+    @property
+    def github(self) -> FakeGithub:
+        return self.server.github
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.github.latency)
+        url = urlparse(self.path)
+
+        match = self.DOWNLOAD.match(url.path)
+        if match is not None:
+            self.__download(*match.groups())
+            return
+
+        allowed, headers = self.github.take_quota()
+        self.github.count("api_requests")
+        if not allowed:
+            self.__send_json(
+                403,
+                {"message": "API rate limit exceeded for 127.0.0.1."},
+                headers,
+            )
+            return
+
+        if url.path == "/rate_limit":
+            core = {
+                "limit": int(headers["X-RateLimit-Limit"]),
+                "remaining": int(headers["X-RateLimit-Remaining"]),
+                "reset": int(headers["X-RateLimit-Reset"]),
+            }
+            self.__send_json(200, {"resources": {"core": core}, "rate": core}, headers)
+            return
+
+        match = self.RELEASES.match(url.path)
+        if match is not None:
+            self.__list_releases(match.group(1), parse_qs(url.query), headers)
+            return
+
+        match = self.RELEASE_BY_TAG.match(url.path)
+        if match is not None:
+            repo = self.github.find_repo(match.group(1))
+            if repo is not None and match.group(2) in self.github.tags(repo):
+                self.__send_json(
+                    200, self.github.release_json(repo, match.group(2)), headers
+                )
+                return
+
+        match = self.ASSET.match(url.path)
+        if match is not None:
+            repo = self.github.find_repo(match.group(1))
+            tag = (
+                None
+                if repo is None
+                else self.github.find_asset(repo, int(match.group(2)))
+            )
+            if repo is not None and tag is not None:
+                asset = self.github.release_json(repo, tag)["assets"][0]
+                if self.headers.get("Accept") == "application/octet-stream":
+                    # The API redirects asset downloads to the storage host
+                    self.send_response(302)
+                    self.send_header("Location", asset["browser_download_url"])
+                    self.send_header("Content-Length", "0")
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.end_headers()
+                else:
+                    self.__send_json(200, asset, headers)
+                return
+
+        match = self.REPO.match(url.path)
+        if match is not None and self.github.find_repo(match.group(1)) is not None:
+            self.__send_json(
+                200, {"full_name": match.group(1), "name": match.group(1)}, headers
+            )
+            return
+
+        self.__send_json(404, {"message": "Not Found"}, headers)
+
+    def do_POST(self):
+        time.sleep(self.github.latency)
+        length = int(self.headers.get("Content-Length", "0"))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        allowed, headers = self.github.take_quota()
+        self.github.count("graphql_requests")
+        if urlparse(self.path).path != "/graphql":
+            self.__send_json(404, {"message": "Not Found"}, headers)
+            return
+        if not allowed:
+            self.__send_json(
+                403,
+                {"message": "API rate limit exceeded for 127.0.0.1."},
+                headers,
+            )
+            return
+
+        first = re.search(r"releases\(first: (\d+)", body.get("query", ""))
+        count = int(first.group(1)) if first is not None else 30
+        variables = body.get("variables", {})
+
+        data: Dict[str, Any] = {}
+        i = 0
+        while "o{}".format(i) in variables:
+            repo = self.github.find_repo(
+                "{}/{}".format(variables["o{}".format(i)], variables["n{}".format(i)])
+            )
+            data["r{}".format(i)] = (
+                None if repo is None else self.__graphql_repo(repo, count)
+            )
+            i += 1
+
+        self.__send_json(200, {"data": data}, headers)
+
+    def __graphql_repo(self, repo: _FakeRepo, count: int) -> Dict[str, Any]:
+        tags = self.github.tags(repo)
+        nodes = []
+        for tag in tags[:count]:
+            release = self.github.release_json(repo, tag)
+            nodes.append(
+                {
+                    "databaseId": release["id"],
+                    "tagName": tag,
+                    "publishedAt": release["published_at"],
+                    "releaseAssets": {
+                        "nodes": [
+                            {
+                                "databaseId": a["id"],
+                                "name": a["name"],
+                                "size": a["size"],
+                                "downloadUrl": a["browser_download_url"],
+                            }
+                            for a in release["assets"]
+                        ]
+                    },
+                }
+            )
+        return {
+            "releases": {"pageInfo": {"hasNextPage": len(tags) > count}, "nodes": nodes}
+        }
+
+    def __list_releases(
+        self, name: str, query: Dict[str, List[str]], headers: Dict[str, str]
+    ) -> None:
+        repo = self.github.find_repo(name)
+        if repo is None:
+            self.__send_json(404, {"message": "Not Found"}, headers)
+            return
+
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", [str(self.github.per_page)])[0])
+        tags = self.github.tags(repo)
+        first = (page - 1) * per_page
+        page_tags = tags[first : first + per_page]  # noqa: E203
+
+        headers = dict(headers)
+        if first + per_page < len(tags):
+            headers["Link"] = (
+                '<{url}/repos/{repo}/releases?page={page}&per_page={per_page}>; rel="next"'
+            ).format(url=self.github.url, repo=name, page=page + 1, per_page=per_page)
+
+        self.__send_json(
+            200, [self.github.release_json(repo, tag) for tag in page_tags], headers
+        )
+
+    def __download(self, name: str, tag: str, asset_name: str) -> None:
+        repo = self.github.find_repo(name)
+        if (
+            repo is None
+            or tag not in self.github.tags(repo)
+            or asset_name != self.github.asset_name(repo)
+        ):
+            self.__send_json(404, {"message": "Not Found"}, {})
+            return
+
+        content = self.github.barrel(repo, tag)
+        first, last = 0, len(content) - 1
+        match = re.match(r"^bytes=(\d+)-(\d*)$", self.headers.get("Range") or "")
+        if match is not None:
+            first = int(match.group(1))
+            if match.group(2):
+                last = min(int(match.group(2)), last)
+            if first > last:
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(first, last, len(content))
+            )
+        else:
+            self.send_response(200)
+
+        body = content[first : last + 1]  # noqa: E203
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.github.count("downloads")
+
+        if len(body) > 1 and self.github.should_fail():
+            # Drop the connection half way through the content
+            self.github.count("failures")
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.github.count("bytes_sent", len(body) // 2)
+            self.close_connection = True
+            return
+
+        self.wfile.write(body)
+        self.github.count("bytes_sent", len(body))
+
+    def __send_json(self, status: int, body: Any, headers: Dict[str, str]) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+"""
+Microbenchmarks of the data paths of warm-cache updates, compared against a
+committed baseline.
+
+Each benchmark is measured in units of a calibration workload that is timed
+alongside it, rather than in seconds. The ratio carries over between machines
+far better than absolute times, and a machine that slows down part way through
+a run slows the calibration down with it.
+
+Run from the repository root, e.g.:
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --update-baseline
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mbget.cache import Cache
+from mbget.config import Config
+from mbget.dependency import Dependency
+from mbget.file_hasher import FileHasher
+from mbget.manifest import Manifest
+from mbget.packages import Packages
+from mbget.project import Project
+from mbget.version import Version
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Prepares a benchmark in a scratch directory and returns the operation to time
+Setup = Callable[[str], Callable[[], object]]
+
+
+def build_config(root: str, verify: str = "stat") -> Config:
+    args = argparse.Namespace(
+        token=None,
+        package=None,
+        directory=None,
+        jungle=None,
+        manifest=None,
+        config=None,
+        jobs=None,
+        verify=verify,
+    )
+    config = Config(args, root)
+    config.prepare_project_dir()
+    return config
+
+
+def package_names(count: int) -> List[str]:
+    return ["Package{:04d}".format(i) for i in range(count)]
+
+
+def write_manifest(path: str, count: int) -> None:
+    with open(path, "w") as f:
+        f.write(
+            '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+            "<iq:application><iq:barrels>"
+        )
+        for i, name in enumerate(package_names(count)):
+            f.write(
+                '<iq:depends name="{name}" version="1.{minor}"/>'.format(
+                    name=name, minor=i % 10
+                )
+            )
+        f.write("</iq:barrels></iq:application></iq:manifest>")
+
+
+def write_packages(path: str, count: int) -> None:
+    with open(path, "w") as f:
+        for name in package_names(count):
+            f.write("{name}=>owner/{name}\n".format(name=name))
+
+
+def build_cached_project(root: str, count: int, verify: str) -> Config:
+    """
+    A project with count dependencies that are all downloaded and cached
+    """
+    config = build_config(root, verify)
+    write_manifest(config.manifest, count)
+    write_packages(config.package, count)
+
+    cache = Cache(config)
+    for i, name in enumerate(package_names(count)):
+        dep = Dependency(name)
+        dep.set_version("1.{minor}.0".format(minor=i % 10))
+        barrel = os.path.join(config.barrel_dir, "{name}.barrel".format(name=name))
+        with open(barrel, "wb") as f:
+            f.write(name.encode() * 256)
+        dep.set_barrel_name(barrel)
+        cache.add_dependency(dep)
+    cache.write_cache()
+    return config
+
+
+def hash_file(size: int) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        path = os.path.join(root, "barrel")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+
+        hasher = FileHasher()
+        return lambda: hasher.hash_file(path)
+
+    return setup
+
+
+def validate_cache(count: int, verify: str) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        config = build_cached_project(root, count, verify)
+        deps = []
+        for i, name in enumerate(package_names(count)):
+            dep = Dependency(name)
+            dep.set_version("1.{minor}".format(minor=i % 10))
+            deps.append(dep)
+
+        def run() -> object:
+            cache = Cache(config)
+            return [dep in cache for dep in deps]
+
+        return run
+
+    return setup
+
+
+def match_versions(count: int) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        tags = [
+            "v{major}.{minor}.{patch}".format(major=i // 1000, minor=i // 100, patch=i)
+            for i in range(count)
+        ]
+        requirement = Version("2.25")
+        return lambda: [requirement.matches(tag) for tag in tags]
+
+    return setup
+
+
+def parse_manifest(count: int) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        path = os.path.join(root, "manifest.xml")
+        write_manifest(path, count)
+
+        def run() -> object:
+            manifest = Manifest(path)
+            return [manifest.get_required_version(d) for d in manifest.get_depends()]
+
+        return run
+
+    return setup
+
+
+def parse_packages(count: int) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        config = build_config(root)
+        write_packages(config.package, count)
+        return lambda: Packages(config)
+
+    return setup
+
+
+def write_jungle(count: int) -> Setup:
+    def setup(root: str) -> Callable[[], object]:
+        project = Project.load(build_cached_project(root, count, "none"))
+        return project.write_barrel_jungle
+
+    return setup
+
+
+# Name, setup and how many times the operation is run per measurement
+BENCHMARKS: List[Tuple[str, Setup, int]] = [
+    ("hash_file[4KiB]", hash_file(4 * 1024), 2000),
+    ("hash_file[1MiB]", hash_file(1024 * 1024), 50),
+    ("hash_file[16MiB]", hash_file(16 * 1024 * 1024), 5),
+    ("validate_cache[500,stat]", validate_cache(500, "stat"), 20),
+    ("validate_cache[500,full]", validate_cache(500, "full"), 10),
+    ("version_matches[5000]", match_versions(5000), 10),
+    ("parse_manifest[1000]", parse_manifest(1000), 20),
+    ("parse_packages[1000]", parse_packages(1000), 50),
+    ("write_barrel_jungle[500]", write_jungle(500), 50),
+]
+
+
+CALIBRATION_DATA = bytes(range(256)) * 256
+
+
+def calibrate() -> object:
+    """
+    A fixed mix of interpreter work and hashing, like the benchmarks
+    """
+    hashlib.sha256(CALIBRATION_DATA).hexdigest()
+    return sorted(str(i) for i in range(2000))
+
+
+def run_benchmark(setup: Setup, number: int, repeat: int) -> Tuple[float, float]:
+    """
+    Time the operation and the calibration in turns, so that both see the same
+    load on the machine
+
+    :return: The fastest time in seconds of a single run of the operation, and
+             that time in units of the calibration
+    """
+    root = tempfile.mkdtemp(prefix="mbget-micro-")
+    try:
+        operation = setup(root)
+        operation()
+        calibrate()
+
+        seconds = []
+        calibration = []
+        for _ in range(repeat):
+            calibration.append(timeit.timeit(calibrate, number=20) / 20)
+            seconds.append(timeit.timeit(operation, number=number) / number)
+        return min(seconds), min(seconds) / min(calibration)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[str]:
+    """
+    :param results: Times of the benchmarks in calibration units
+    :param baseline: Baseline times in calibration units
+    :return: The benchmarks that are slower than their baseline by more than
+             threshold, as a share of the baseline
+    """
+    return [
+        name
+        for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + threshold)
+    ]
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the mbget microbenchmarks and compare them to a baseline"
+    )
+    parser.add_argument(
+        "-k", "--filter", help="Only run the benchmarks whose name contains this"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=7, help="Measurements per benchmark"
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE, help="Baseline file to compare against"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Slowdown over the baseline that fails the run (default: 0.5)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing",
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main_benchmark(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    baseline: Dict[str, float] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    results: Dict[str, float] = {}
+    for name, setup, number in BENCHMARKS:
+        if args.filter is not None and args.filter not in name:
+            continue
+
+        seconds, results[name] = run_benchmark(setup, number, args.repeat)
+        expected = baseline.get(name)
+        print(
+            "{name:<28} {ms:>10.3f} ms {units:>10.2f} units{ratio}".format(
+                name=name,
+                ms=seconds * 1000,
+                units=results[name],
+                ratio=(
+                    ""
+                    if expected is None
+                    else "  {:+.0%} vs baseline".format(results[name] / expected - 1)
+                ),
+            ),
+            file=sys.stderr,
+        )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name in regressions:
+        print(
+            "{name} regressed beyond {threshold:.0%} of its baseline".format(
+                name=name, threshold=args.threshold
+            ),
+            file=sys.stderr,
+        )
+
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -32,10 +32,13 @@ from mbget.version import Version
 
 
 class BarrelAsset(object):
-    def __init__(self, asset_name: str, asset_version: str, asset_content: bytes):
+    def __init__(
+        self, asset_name: str, asset_version: str, asset_path: str, asset_hash: str
+    ):
         self.__name = asset_name
         self.__version = Version(asset_version)
-        self.__content = asset_content
+        self.__path = asset_path
+        self.__hash = asset_hash
 
     @property
     def name(self) -> str:
@@ -46,5 +49,15 @@ class BarrelAsset(object):
         return self.__version
 
     @property
-    def content(self) -> bytes:
-        return self.__content
+    def path(self) -> str:
+        """
+        Location on disk that the barrel was downloaded to
+        """
+        return self.__path
+
+    @property
+    def hash(self) -> str:
+        """
+        SHA-256 hex digest of the barrel, computed while it was downloaded
+        """
+        return self.__hash
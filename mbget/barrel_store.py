@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import errno
+import logging
+import os
+import shutil
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from mbget.config import Config
+
+
+class BarrelStore(object):
+    """
+    User level, content addressable store of downloaded barrels that is shared
+    by every project on the machine.
+
+    Each unique barrel is stored once as sha256/<digest>. Refs record which
+    content a release asset holds as refs/<repo>/<tag>/<asset name>, so the same
+    barrel published under several tags is only stored once.
+
+    Barrels are installed into a project with a reflink where the file system
+    supports it, then a hardlink, and a copy as the last resort.
+    """
+
+    # Linux ioctl that clones a file's extents, see ioctl_ficlone(2)
+    FICLONE = 0x40049409
+
+    def __init__(self, root: str):
+        self.__root = root
+        self.__lock = threading.Lock()
+        self.__asset_locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+
+    def __object_path(self, digest: str) -> str:
+        return os.path.join(self.__root, "sha256", digest)
+
+    def __ref_path(self, repo: str, tag: str, name: str) -> str:
+        return os.path.join(
+            self.__root,
+            "refs",
+            quote(repo, safe=""),
+            quote(tag, safe=""),
+            quote(name, safe=""),
+        )
+
+    @staticmethod
+    def __temp_path(path: str) -> str:
+        return "{path}.{id}.tmp".format(path=path, id=uuid.uuid4().hex)
+
+    @contextmanager
+    def lock(self, repo: str, tag: str, name: str) -> Iterator[None]:
+        """
+        Hold a release asset while it is looked up, downloaded and added, so
+        that projects updated side by side download each asset only once
+        """
+        with self.__lock:
+            asset_lock = self.__asset_locks.setdefault(
+                (repo, tag, name), threading.Lock()
+            )
+
+        with asset_lock:
+            yield
+
+    def contains(self, digest: str) -> bool:
+        return os.path.exists(self.__object_path(digest))
+
+    def lookup(self, repo: str, tag: str, name: str) -> Optional[str]:
+        """
+        Find the digest of a release asset that is in the store
+
+        :return: The SHA-256 digest of the asset, None if it is not stored
+        """
+        try:
+            with open(self.__ref_path(repo, tag, name), "r") as f:
+                digest = f.read().strip()
+        except OSError:
+            return None
+
+        if not self.contains(digest):
+            return None
+
+        return digest
+
+    def add(
+        self, repo: str, tag: str, name: str, barrel_path: str, digest: str
+    ) -> None:
+        """
+        Add a downloaded barrel to the store, if its content is not already
+        stored, and record it as the content of the release asset.
+        """
+        object_path = self.__object_path(digest)
+        try:
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                temp_path = self.__temp_path(object_path)
+                self.__clone(barrel_path, temp_path)
+                os.replace(temp_path, object_path)
+
+            ref_path = self.__ref_path(repo, tag, name)
+            os.makedirs(os.path.dirname(ref_path), exist_ok=True)
+            Config.replace_file(ref_path, "w", lambda f: f.write(digest))
+        except OSError as e:
+            # The store is only an optimization, the barrel is still installed
+            logging.debug(
+                "Unable to add {barrel} to the barrel store: {err}".format(
+                    barrel=barrel_path, err=e
+                )
+            )
+
+    def install(self, digest: str, barrel_path: str) -> bool:
+        """
+        Install a stored barrel at barrel_path, replacing any existing file
+
+        :return: True if the barrel was installed, False if it is not stored
+        """
+        object_path = self.__object_path(digest)
+        if not os.path.exists(object_path):
+            return False
+
+        temp_path = self.__temp_path(barrel_path)
+        try:
+            self.__clone(object_path, temp_path)
+            os.replace(temp_path, barrel_path)
+        except OSError as e:
+            logging.debug(
+                "Unable to install {barrel} from the barrel store: {err}".format(
+                    barrel=barrel_path, err=e
+                )
+            )
+            return False
+
+        return True
+
+    @classmethod
+    def __clone(cls, src: str, dst: str) -> None:
+        """
+        Make dst a copy of src as cheaply as the file system allows
+        """
+        error: Optional[OSError] = None
+        for method in (cls.__reflink, os.link, cls.__copy):
+            try:
+                method(src, dst)
+                return
+            except OSError as e:
+                error = e
+                if os.path.exists(dst):
+                    os.remove(dst)
+
+        assert error is not None
+        raise error
+
+    @classmethod
+    def __reflink(cls, src: str, dst: str) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported")
+
+        import fcntl
+
+        with open(src, "rb") as s, open(dst, "xb") as d:
+            fcntl.ioctl(d.fileno(), cls.FICLONE, s.fileno())
+
+    @staticmethod
+    def __copy(src: str, dst: str) -> None:
+        with open(src, "rb") as s, open(dst, "xb") as d:
+            if hasattr(os, "copy_file_range"):
+                # Copy in the kernel, without passing the data through here
+                remaining = os.fstat(s.fileno()).st_size
+                try:
+                    while remaining > 0:
+                        copied = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                    return
+                except OSError:
+                    s.seek(0)
+                    d.seek(0)
+                    d.truncate()
+
+            shutil.copyfileobj(s, d)
@@ -31,28 +31,70 @@
 import json
 import os
 import logging
-from typing import TextIO, Dict
+import threading
+from contextlib import contextmanager
+from typing import Any, TextIO, Dict, Iterator, Optional, Set
 
 from mbget.config import Config
 from mbget.dependency import Dependency
 from mbget.file_hasher import FileHasher
+from mbget.tracing import NullTracer, Tracer
 
 
 class Cache(object):
-    def __init__(self, config: Config, hasher: FileHasher = FileHasher()):
-        self.cache: Dict[str, Dict[str, str]] = {}
+    VERIFY_NONE = "none"
+    VERIFY_STAT = "stat"
+    VERIFY_FULL = "full"
+
+    def __init__(
+        self,
+        config: Config,
+        hasher: FileHasher = FileHasher(),
+        tracer: Tracer = NullTracer(),
+    ):
+        self.cache: Dict[str, Dict[str, Any]] = {}
         self.__hasher = hasher
+        self.__tracer = tracer
         self.__config = config
+        self.__lock = threading.Lock()
+        self.__dirty = False
+        self.__journal = False
+
+        # Entries are only validated when they are first looked up, so entries
+        # for packages the manifest no longer references are never hashed
+        self.__validated: Set[str] = set()
+        self.__looked_up: Set[str] = set()
 
         self.__read_cache_file_if_exists()
-        self.__validate_cache()
-        self.__dirty = False
 
     def __process_cache(self, file: TextIO):
+        """
+        The cache file holds a snapshot of the cache, followed by a journal
+        record for each dependency added since the snapshot was written. Each
+        is a JSON document on its own line.
+        """
         try:
-            self.cache = json.load(file)
-        except (OSError, json.JSONDecodeError):
+            lines = file.read().splitlines()
+        except OSError:
             logging.debug("Cache file is corrupt.")
+            return
+
+        for line in lines:
+            if len(line.strip()) == 0:
+                continue
+
+            try:
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    self.cache = record
+                else:
+                    package, entry = record
+                    self.cache[package] = entry
+                    self.__dirty = True
+            except (TypeError, ValueError):
+                # Everything before a torn or corrupt record is still usable
+                logging.debug("Cache file is corrupt.")
+                break
 
     def __read_cache_file_if_exists(self) -> None:
         """
@@ -63,53 +105,142 @@ class Cache(object):
 
     def write_cache(self):
         """
-        Write the cache file out to disk
+        Write the cache file out to disk if it has been modified
         """
-        self.__config.open_file(
-            self.__cache_file, "w", lambda f: json.dump(self.cache, f)
-        )
-        self.__dirty = False
+        with self.__lock:
+            if not self.__dirty:
+                return
+
+            # An interrupted write can never leave a truncated cache behind
+            with self.__tracer.span("write cache", "file", entries=len(self.cache)):
+                self.__config.replace_file(
+                    self.__cache_file, "w", lambda f: json.dump(self.cache, f)
+                )
+            self.__dirty = False
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Stage the dependencies added within the context and commit them to the
+        cache file once on exit.
+
+        Each dependency added is also appended to the cache file as a journal
+        record, so an interrupted run keeps the barrels it had finished.
+        """
+        with self.__lock:
+            self.__journal = True
+
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__journal = False
+            self.write_cache()
+
+    def __append_journal(self, key: str) -> None:
+        def append(file: TextIO) -> None:
+            file.write("\n" + json.dumps([key, self.cache[key]]))
+            file.flush()
+            os.fsync(file.fileno())
+
+        with self.__tracer.span("append cache journal", "file", dependency=key):
+            self.__config.open_file(self.__cache_file, "a", append)
 
     def add_dependency(self, dependency: Dependency):
-        entry = {
-            "asset": str(dependency.barrel_name),
-            "hash": self.__hasher.hash_file(dependency.barrel_name),
+        """
+        Add a downloaded dependency to the cache. Safe to call from multiple
+        download workers at once.
+        """
+        barrel_hash = dependency.barrel_hash
+        if barrel_hash is None:
+            with self.__tracer.phase("hash", dependency.package_name):
+                barrel_hash = self.__hasher.hash_file(dependency.barrel_name)
+
+        entry: Dict[str, Any] = {
+            "asset": self.__config.relative_path(str(dependency.barrel_name)),
+            "hash": barrel_hash,
             "version": str(dependency.version),
         }
+        if dependency.resolved_tag is not None:
+            entry["tag"] = dependency.resolved_tag
+        entry.update(self.__stat_asset(str(dependency.barrel_name)))
 
-        self.cache[dependency.package_name] = entry
-        self.__dirty = True
+        with self.__lock:
+            self.cache[dependency.package_name] = entry
+            self.__validated.add(dependency.package_name)
+            self.__dirty = True
+
+            if self.__journal:
+                self.__append_journal(dependency.package_name)
 
     def __get_asset(self, key: str) -> str:
+        """
+        Get the path of a cached asset, assets are recorded relative to the
+        project root
+        """
         assert key in self.cache
-        return self.cache[key]["asset"]
-
-    def __validate_cache(self):
-        invalid_entries = []
-        for key in self.cache:
-            if not self.__asset_exists(key):
-                logging.debug(
-                    "Asset {asset} removed.".format(asset=self.__get_asset(key))
-                )
-                invalid_entries.append(key)
-            elif not self.__is_asset_valid(key):
-                logging.debug(
-                    "Asset {asset} corrupt.".format(asset=self.__get_asset(key))
-                )
-                invalid_entries.append(key)
+        asset = self.cache[key]["asset"]
+        if not self.__config.root:
+            return asset
+        return os.path.join(self.__config.root, asset)
 
-        for entry in invalid_entries:
-            self.cache.pop(entry)
+    @staticmethod
+    def __stat_asset(asset_path: str) -> Dict[str, int]:
+        """
+        Get the stat metadata used to detect changes to a cached asset without
+        rehashing it. Returns an empty dict if the asset can not be read.
+        """
+        try:
+            st = os.stat(asset_path)
+        except OSError:
+            return {}
 
-    def __contains__(self, item: Dependency) -> bool:
-        if item.package_name not in self.cache:
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+    def __validate_entry(self, key: str) -> bool:
+        """
+        Validate a cache entry the first time it is looked up, dropping it from
+        the cache if its asset was removed or is corrupt.
+
+        :return: True if the entry is in the cache and valid
+        """
+        if key not in self.cache:
             return False
 
-        cached_dep = self.cache[item.package_name]
-        if item.version is not None:
-            return item.version.matches(cached_dep["version"])
+        if key in self.__validated:
+            return True
+
+        if not self.__asset_exists(key):
+            logging.debug("Asset {asset} removed.".format(asset=self.__get_asset(key)))
+        elif not self.__is_asset_valid(key):
+            logging.debug("Asset {asset} corrupt.".format(asset=self.__get_asset(key)))
+        else:
+            self.__validated.add(key)
+            return True
+
+        self.cache.pop(key)
+        self.__dirty = True
         return False
 
+    def __contains__(self, item: Dependency) -> bool:
+        with self.__lock:
+            cached_version = None
+            if self.__validate_entry(item.package_name):
+                cached_version = self.cache[item.package_name]["version"]
+
+            # Each package is looked up several times during an update
+            first_lookup = item.package_name not in self.__looked_up
+            self.__looked_up.add(item.package_name)
+
+        hit = (
+            cached_version is not None
+            and item.version is not None
+            and item.version.matches(cached_version)
+        )
+        if first_lookup:
+            self.__tracer.count("cache_hits" if hit else "cache_misses")
+        return hit
+
     @property
     def __cache_file(self):
         return os.path.join(self.__config.barrel_dir, ".mbgetcache")
@@ -118,9 +249,45 @@ class Cache(object):
         return os.path.exists(self.__get_asset(key))
 
     def __is_asset_valid(self, key: str):
+        verify = self.__config.verify
+        if verify == self.VERIFY_NONE:
+            return True
+
         asset_path = self.__get_asset(key)
-        expected_hash = self.cache[key]["hash"]
-        return self.__hasher.match(asset_path, expected_hash)
+        entry = self.cache[key]
+        stat = self.__stat_asset(asset_path)
+        if verify != self.VERIFY_FULL and len(stat) > 0:
+            if all(entry.get(k) == v for k, v in stat.items()):
+                # Unchanged since it was last hashed, trust it
+                return True
+
+        with self.__tracer.phase("hash", key):
+            matched = self.__hasher.match(asset_path, entry["hash"])
+        if not matched:
+            return False
+
+        if len(stat) > 0 and any(entry.get(k) != v for k, v in stat.items()):
+            # Contents are intact but the metadata moved (touched, copied, ...),
+            # record the new metadata so the next run can skip the hash
+            entry.update(stat)
+            self.__dirty = True
+
+        return True
 
     def get_barrel_for_package(self, dep: Dependency) -> str:
-        return self.cache[dep.package_name]["asset"]
+        with self.__lock:
+            if not self.__validate_entry(dep.package_name):
+                raise KeyError(dep.package_name)
+
+            return self.__get_asset(dep.package_name)
+
+    def get_tag_for_package(self, dep: Dependency) -> Optional[str]:
+        """
+        The tag of the release a cached barrel was installed from, unknown for
+        entries recorded before tags were
+        """
+        with self.__lock:
+            if not self.__validate_entry(dep.package_name):
+                raise KeyError(dep.package_name)
+
+            return self.cache[dep.package_name].get("tag")
@@ -29,8 +29,11 @@
 # ############################################################################ #
 
 import os
+import uuid
 from configparser import ConfigParser
-from typing import Optional
+from typing import Dict, Optional, Tuple
+
+from mbget.errors import Error
 
 
 class Config(object):
@@ -39,15 +42,33 @@ class Config(object):
         "directory": ".mbpkg",
         "jungle": "barrels.jungle",
         "manifest": "manifest.xml",
+        "jobs": "4",
+        "verify": "stat",
+        "pool_size": "0",
+        "store": "",
+        "rate_limit_wait": "3600",
+        "retries": "3",
+        "segments": "1",
+        "api_url": "https://api.github.com",
+        "metrics_file": "",
+        "statsd": "",
+        "metrics_prefix": "mbget",
     }
 
-    def __init__(self, args):
+    VERIFY_LEVELS = ("stat", "full", "none")
+
+    def __init__(self, args, root: str = ""):
+        """
+        :param args: The parsed command line arguments
+        :param root: The project directory, output paths are relative to it
+        """
         self.__args = args
+        self.__root = root
         self.__config_file = None
         if args.config is not None:
             config_path = args.config
         else:
-            config_path = "mbgetcfg.ini"
+            config_path = os.path.join(root, "mbgetcfg.ini")
 
         if os.path.exists(config_path):
             config = ConfigParser()
@@ -59,7 +80,7 @@ class Config(object):
             if "mbget" in config:
                 self.__config_file = config["mbget"]
 
-        self.__cached_vals = {}
+        self.__cached_vals: Dict[str, str] = {}
 
         if args.token is not None:
             self.__token = args.token
@@ -68,17 +89,21 @@ class Config(object):
         else:
             self.__token = None
 
+    @property
+    def root(self) -> str:
+        return self.__root
+
     @property
     def jungle(self) -> str:
-        return self.__get_cached_config("jungle")
+        return os.path.join(self.__root, self.__get_cached_config("jungle"))
 
     @property
     def package(self) -> str:
-        return self.__get_cached_config("package")
+        return os.path.join(self.__root, self.__get_cached_config("package"))
 
     @property
     def barrel_dir(self) -> str:
-        return self.__get_cached_config("directory")
+        return os.path.join(self.__root, self.__get_cached_config("directory"))
 
     @property
     def token(self) -> Optional[str]:
@@ -86,7 +111,130 @@ class Config(object):
 
     @property
     def manifest(self) -> str:
-        return self.__get_cached_config("manifest")
+        return os.path.join(self.__root, self.__get_cached_config("manifest"))
+
+    @property
+    def jobs(self) -> int:
+        """
+        Number of dependencies that may be downloaded concurrently
+        """
+        return max(1, int(self.__get_cached_config("jobs")))
+
+    @property
+    def pool_size(self) -> int:
+        """
+        Number of keep-alive connections kept open to each host. 0 sizes the
+        pool to the number of download jobs.
+        """
+        pool_size = int(self.__get_cached_config("pool_size"))
+        if pool_size <= 0:
+            return self.jobs
+
+        return pool_size
+
+    @property
+    def rate_limit_wait(self) -> int:
+        """
+        Longest time in seconds to wait for the GitHub API rate limit to reset
+        before failing a request
+        """
+        return max(0, int(self.__get_cached_config("rate_limit_wait")))
+
+    @property
+    def retries(self) -> int:
+        """
+        How many times an interrupted download is resumed before it fails
+        """
+        return max(0, int(self.__get_cached_config("retries")))
+
+    @property
+    def segments(self) -> int:
+        """
+        How many parallel range requests a large barrel is downloaded with
+        """
+        return max(1, int(self.__get_cached_config("segments")))
+
+    @property
+    def api_url(self) -> str:
+        """
+        The GitHub REST API to resolve releases with, e.g.
+        https://github.example.com/api/v3 for a GitHub Enterprise server
+        """
+        return self.__get_cached_config("api_url")
+
+    @property
+    def store_dir(self) -> Optional[str]:
+        """
+        Location of the barrel store shared by every project of the user, or
+        None if the store is disabled with "none".
+        """
+        store = self.__get_cached_config("store")
+        if store == "none":
+            return None
+
+        if store == "":
+            cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache"
+            )
+            store = os.path.join(cache_home, "mbget", "store")
+
+        return store
+
+    @property
+    def metrics_file(self) -> Optional[str]:
+        """
+        Prometheus textfile the metrics of each run are written to, or None
+        """
+        metrics_file = self.__get_cached_config("metrics_file")
+        if metrics_file == "":
+            return None
+        return os.path.join(self.__root, metrics_file)
+
+    @property
+    def statsd(self) -> Optional[Tuple[str, int]]:
+        """
+        Host and port of the StatsD daemon the metrics of each run are sent
+        to, or None. The port defaults to 8125.
+        """
+        statsd = self.__get_cached_config("statsd")
+        if statsd == "":
+            return None
+
+        host, _, port = statsd.rpartition(":")
+        if host == "" or not port.isdigit():
+            return statsd, 8125
+        return host, int(port)
+
+    @property
+    def metrics_prefix(self) -> str:
+        return self.__get_cached_config("metrics_prefix")
+
+    @property
+    def verify(self) -> str:
+        """
+        How thoroughly cached barrels are checked before they are reused.
+
+        stat only rehashes a barrel if its size, mtime or inode changed, full
+        always rehashes it and none trusts the cache as is.
+        """
+        verify = self.__get_cached_config("verify")
+        if verify not in self.VERIFY_LEVELS:
+            raise Error("Invalid verify level: {verify}".format(verify=verify))
+
+        return verify
+
+    def relative_path(self, path: Optional[str]) -> Optional[str]:
+        """
+        Express an output path relative to the project root, the form recorded in
+        the dependency cache and the barrel jungle
+        """
+        if not self.__root or not path:
+            return path
+
+        # Only paths built from the root, an absolute directory is kept as is
+        if not path.startswith(os.path.join(self.__root, "")):
+            return path
+        return os.path.relpath(path, self.__root)
 
     def prepare_project_dir(self) -> None:
         """
@@ -125,3 +273,27 @@ class Config(object):
     def open_file(name, mode, callback) -> None:
         with open(name, mode) as f:
             callback(f)
+
+    @staticmethod
+    def replace_file(name, mode, callback) -> None:
+        """
+        Atomically replace a file with what callback writes. The new contents
+        are written and synced to a temporary file that is then renamed over
+        the original, so readers never see a partially written file. Each
+        writer has a temporary file of its own, concurrent processes can
+        replace the same file.
+        """
+        temp_name = "{name}.{id}.tmp".format(name=name, id=uuid.uuid4().hex)
+        try:
+            with open(temp_name, mode) as f:
+                callback(f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(temp_name, name)
+        except BaseException:
+            try:
+                os.remove(temp_name)
+            except FileNotFoundError:
+                pass
+            raise
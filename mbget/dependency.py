@@ -39,6 +39,8 @@ class Dependency(object):
         self.__required_version: Optional[Version] = None
         self.__repo: Optional[str] = None
         self.__barrel_name: Optional[str] = None
+        self.__barrel_hash: Optional[str] = None
+        self.__resolved_tag: Optional[str] = None
         pass
 
     def __eq__(self, other: Any) -> bool:
@@ -75,3 +77,18 @@ class Dependency(object):
 
     def set_barrel_name(self, name: str) -> None:
         self.__barrel_name = name
+
+    @property
+    def barrel_hash(self) -> Optional[str]:
+        return self.__barrel_hash
+
+    def set_barrel_hash(self, barrel_hash: str) -> None:
+        self.__barrel_hash = barrel_hash
+
+    @property
+    def resolved_tag(self) -> Optional[str]:
+        """The tag of the release installed for the dependency, if known"""
+        return self.__resolved_tag
+
+    def set_resolved_tag(self, tag: str) -> None:
+        self.__resolved_tag = tag
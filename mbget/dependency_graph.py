@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import logging
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from mbget.dependency import Dependency
+from mbget.errors import Error, UpdateError
+from mbget.manifest import Manifest
+from mbget.project import Project
+from mbget.version import Version
+
+
+class DependencyGraph(object):
+    """
+    The dependencies of a project's barrels, walked one layer at a time.
+
+    A barrel can depend on other barrels through the manifest it embeds. Each
+    layer holds the packages that are first required by the barrels of the
+    previous layer, so that a whole layer can be installed concurrently.
+
+    A package is installed once, at the version its first requirement asks for.
+    Any other requirement of the package has to be satisfied by the release
+    that was installed for it, conflicts are reported as soon as they are
+    found, before the next layer is installed.
+    """
+
+    APPLICATION = "the application manifest"
+
+    def __init__(self, project: Project):
+        self.__project = project
+        self.__lock = threading.Lock()
+
+        # What first required each package, for conflict reports
+        self.__required_by: Dict[str, str] = {
+            name: self.APPLICATION for name in project.dependencies
+        }
+
+        # The requirements read from the barrel of each (repo, version) node
+        self.__nodes: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+
+    def read_depends(self, dep: Dependency) -> List[Tuple[str, str]]:
+        """
+        Read the packages an installed barrel depends on. Safe to call from
+        multiple workers at once.
+
+        :return: The name and required version of each package
+        """
+        if dep.barrel_name is None or dep.repo is None:
+            return []
+
+        node = (dep.repo, str(dep.version))
+        with self.__lock:
+            if node in self.__nodes:
+                return self.__nodes[node]
+
+        try:
+            manifest = Manifest.from_barrel(dep.barrel_name)
+            depends = [
+                (name, manifest.get_required_version(name))
+                for name in manifest.get_depends()
+            ]
+        except Error as e:
+            logging.warning(
+                "Not resolving the dependencies of {dep}: {msg}".format(
+                    dep=dep.package_name, msg=e.message
+                )
+            )
+            depends = []
+
+        with self.__lock:
+            self.__nodes[node] = depends
+        return depends
+
+    def next_layer(
+        self, layer: Sequence[Dependency], depends: Sequence[List[Tuple[str, str]]]
+    ) -> List[Dependency]:
+        """
+        Require the packages that the barrels of a layer depend on
+
+        :param layer: The dependencies of the layer
+        :param depends: What each barrel of the layer depends on, see read_depends
+        :return: The packages required for the first time, the next layer
+        :raises UpdateError: If two requirements of a package conflict
+        """
+        # Packages new to this layer, their requirement can still be narrowed
+        # to satisfy every barrel of the layer
+        new: Dict[str, Tuple[str, str]] = {}
+        for dep, requirements in zip(layer, depends):
+            for name, version in requirements:
+                self.__require(new, dep.package_name, name, version)
+
+        next_layer = []
+        for name, (version, required_by) in new.items():
+            self.__required_by[name] = required_by
+            next_layer.append(self.__project.require(name, version))
+        return next_layer
+
+    def __require(
+        self, new: Dict[str, Tuple[str, str]], parent: str, name: str, version: str
+    ) -> None:
+        requirement = Version(version)
+
+        if name in new:
+            current, required_by = new[name]
+            if requirement.matches(current):
+                return
+            if Version(current).matches(version):
+                new[name] = (version, parent)
+                return
+            self.__conflict(name, current, required_by, version, parent)
+
+        dep = self.__project.dependencies.get(name)
+        if dep is None:
+            new[name] = (version, parent)
+            return
+
+        installed = dep.resolved_tag
+        if installed is not None:
+            if not requirement.matches(installed):
+                self.__conflict(
+                    name,
+                    "{version}, installed as {tag}".format(
+                        version=dep.version, tag=installed
+                    ),
+                    self.__required_by[name],
+                    version,
+                    parent,
+                )
+        elif dep.version is None or not (
+            requirement.matches(dep.version) or dep.version.matches(version)
+        ):
+            # Without the installed release, a requirement that narrows the
+            # first one is taken on trust
+            self.__conflict(
+                name, str(dep.version), self.__required_by[name], version, parent
+            )
+
+    @staticmethod
+    def __conflict(
+        name: str, version: str, required_by: str, other: str, other_by: str
+    ) -> None:
+        raise UpdateError(
+            "Conflicting versions of {name}: {by} requires {version}, "
+            "{other_by} requires {other}".format(
+                name=name,
+                by=required_by,
+                version=version,
+                other_by=other_by,
+                other=other,
+            )
+        )
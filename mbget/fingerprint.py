@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from mbget.config import Config
+from mbget.lockfile import Lockfile
+
+
+class Fingerprint(object):
+    """
+    A digest of everything an update reads and writes, stamped in the barrel
+    dir after a successful update. While the stamp matches, the project is up
+    to date and an update has nothing to do: no config beyond the paths, no
+    manifest parsing, no cache validation, no network and no file writes.
+
+    The manifest and package map are hashed, they are small and editors do not
+    always change their modification time. The cache, the installed barrels,
+    the jungle and the lockfile are covered by their stat data, like the
+    default "stat" cache verification.
+    """
+
+    FILE_NAME = ".mbgetstamp"
+
+    # Config values that change what an update installs or writes
+    CONFIG_VALUES = (
+        "manifest",
+        "package",
+        "jungle",
+        "barrel_dir",
+        "store_dir",
+        "api_url",
+        "verify",
+    )
+
+    def __init__(self, config: Config, mode: str):
+        """
+        :param config: The project's config
+        :param mode: The update mode, a stamp only matches updates in the same
+            mode
+        """
+        self.__config = config
+        self.__mode = mode
+
+    @property
+    def __stamp_file(self) -> str:
+        return os.path.join(self.__config.barrel_dir, self.FILE_NAME)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Full verification hashes every cached barrel on each update, which
+        the stamp's stat data can not stand in for
+        """
+        return self.__config.verify != "full"
+
+    def read_inputs(self) -> Dict[str, Any]:
+        """
+        The update's inputs, read before updating so that an input edited
+        while the update runs is not stamped as installed
+        """
+        inputs: Dict[str, Any] = {
+            name: getattr(self.__config, name) for name in self.CONFIG_VALUES
+        }
+        inputs["mode"] = self.__mode
+        inputs["manifest_sha256"] = self.__hash_file(self.__config.manifest)
+        inputs["package_sha256"] = self.__hash_file(self.__config.package)
+        return inputs
+
+    def read_outputs(self) -> Dict[str, Any]:
+        """
+        The stat data of the files an update writes and of the barrel dir's
+        contents, the cache and the installed barrels
+        """
+        lockfile = os.path.join(
+            os.path.dirname(self.__config.manifest), Lockfile.FILE_NAME
+        )
+        return {
+            "jungle": self.__stat(self.__config.jungle),
+            "lockfile": self.__stat(lockfile),
+            "barrel_dir": self.__stat_barrel_dir(),
+        }
+
+    def digest(self, inputs: Dict[str, Any], outputs: Dict[str, Any]) -> str:
+        data = json.dumps([inputs, outputs], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def is_current(self) -> bool:
+        """
+        Whether the stamp matches the project as it is now
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            with open(self.__stamp_file, "r") as f:
+                stamp = f.read().strip()
+        except OSError:
+            return False
+
+        return stamp == self.digest(self.read_inputs(), self.read_outputs())
+
+    def write(self, inputs: Dict[str, Any]) -> None:
+        """
+        Stamp the barrel dir once an update of the inputs has succeeded
+        """
+        if not self.enabled:
+            return
+
+        digest = self.digest(inputs, self.read_outputs())
+        self.__config.replace_file(
+            self.__stamp_file, "w", lambda f: f.write(digest + "\n")
+        )
+
+    @staticmethod
+    def __hash_file(path: str) -> Optional[str]:
+        try:
+            with open(path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    @staticmethod
+    def __stat(path: str) -> Optional[List[int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def __stat_barrel_dir(self) -> Optional[Dict[str, List[int]]]:
+        try:
+            entries = list(os.scandir(self.__config.barrel_dir))
+        except OSError:
+            return None
+
+        barrels = {}
+        for entry in entries:
+            if entry.name == self.FILE_NAME or entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            barrels[entry.name] = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        return barrels
@@ -28,71 +28,502 @@
 #                                                                              #
 # ############################################################################ #
 
+import logging
+import os
 import re
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
 
 import requests
-from github import Github
+from requests.adapters import HTTPAdapter
+from github import Github, RateLimitExceededException, UnknownObjectException
 from github.GitRelease import GitRelease
 from github.GitReleaseAsset import GitReleaseAsset
 
 from mbget.barrel_asset import BarrelAsset
 from mbget.errors import Error
 from mbget.dependency import Dependency
+from mbget.graphql_resolver import GraphqlResolver
+from mbget.tracing import NullTracer, Tracer
+from mbget.rate_limiter import RateLimiter
+from mbget.resumable_download import ResumableDownload
+from mbget.release_index import ReleaseIndex
+
+T = TypeVar("T")
+
+
+DEFAULT_API_URL = "https://api.github.com"
 
 
 class GithubDownloader(object):
     BARREL_FILE = re.compile(r"^.+\.barrel$")
+    # Seconds to wait for a connection or for the next bytes of a download
+    TIMEOUT = 60
+    # Releases listed per page, PyGithub's default
+    PER_PAGE = 30
 
-    def __init__(self, token: str = None):
+    def __init__(
+        self,
+        index: ReleaseIndex,
+        token: Optional[str] = None,
+        pool_size: int = 10,
+        max_wait: float = 3600,
+        retries: int = 3,
+        segments: int = 1,
+        api_url: str = DEFAULT_API_URL,
+        tracer: Tracer = NullTracer(),
+    ):
+        """
+        :param index: The release index to resolve dependencies from
+        :param token: GitHub API token, anonymous requests have a far lower
+            rate limit
+        :param pool_size: Connections to keep open to each host
+        :param max_wait: Longest time to wait for the API rate limit to reset
+        :param retries: How many times an interrupted download is resumed
+        :param segments: How many parallel range requests a large barrel is
+            downloaded with
+        :param api_url: The GitHub REST API, for GitHub Enterprise servers
+        :param tracer: Traces the API requests and asset transfers
+        """
         self.__token = token
+        self.__tracer = tracer
+        self.__api_url = api_url.rstrip("/")
+        self.__index = index
+        self.__retries = retries
+        self.__segments = segments
+        self.__limiter = RateLimiter(max_wait)
+        self.__refreshed: Set[str] = set()
+        self.__repo_locks: Dict[str, threading.Lock] = {}
+        self.__lock = threading.Lock()
+
+        # One keep-alive session shared by every asset transfer, so the API
+        # host and the storage host that it redirects to each keep a pool of
+        # warm connections rather than a new TLS handshake per barrel. Transfers
+        # beyond the pool's size wait for a connection instead of opening one
+        # that is thrown away, so a workspace updating many projects at once
+        # never holds more than pool_size sockets per host.
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2, pool_maxsize=pool_size, pool_block=True
+        )
+        self.__session.mount("https://", adapter)
+        self.__session.mount("http://", adapter)
 
         if token is not None:
-            self.__github = Github(login_or_token=token)
+            self.__github = Github(
+                login_or_token=token, base_url=self.__api_url, pool_size=pool_size
+            )
         else:
-            self.__github = Github()
+            self.__github = Github(base_url=self.__api_url, pool_size=pool_size)
+
+    def prefetch(self, dependencies: Iterable[Dependency]) -> None:
+        """
+        Resolve the releases of every dependency's repository up front with a
+        single GraphQL query, so that the dependencies can then be downloaded
+        straight from the release index.
+
+        GitHub does not allow anonymous GraphQL queries, without a token each
+        dependency is resolved as it is downloaded.
+        """
+        if self.__token is None:
+            return
+
+        # Repositories refreshed during this run and pinned versions that are
+        # already indexed need no resolving
+        repos = {
+            dep.repo
+            for dep in dependencies
+            if dep.repo is not None
+            and dep.version is not None
+            and dep.repo not in self.__refreshed
+            and not (
+                dep.version.is_exact
+                and self.__index.find(dep.repo, dep.version) is not None
+            )
+        }
+        if len(repos) == 0:
+            return
+
+        resolver = GraphqlResolver(
+            self.__session,
+            self.__token,
+            self.__graphql_url,
+            self.__api_url,
+            self.TIMEOUT,
+        )
+        # One query per batch of repositories
+        self.__tracer.count(
+            "api_requests", -(-len(repos) // GraphqlResolver.REPOS_PER_QUERY)
+        )
+        with self.__tracer.span("GraphQL releases", "api", repos=len(repos)):
+            resolved = resolver.resolve(repos)
+        for repo, (releases, complete) in resolved.items():
+            known_ids = self.__index.release_ids(repo)
+            if (
+                not complete
+                and len(known_ids) > 0
+                and known_ids.isdisjoint(r["id"] for r in releases)
+            ):
+                # More releases were published than were fetched since the
+                # index was last refreshed, leave it to a full refresh
+                continue
+
+            self.__index.add_releases(repo, releases, complete)
+            self.__refreshed.add(repo)
+
+    @property
+    def __graphql_url(self) -> str:
+        # GitHub Enterprise serves the REST API under /api/v3 and GraphQL
+        # under /api/graphql
+        if self.__api_url.endswith("/v3"):
+            return self.__api_url[:-3] + "/graphql"
+        return self.__api_url + "/graphql"
+
+    def close(self) -> None:
+        """
+        Close the pooled connections and report the API quota used
+        """
+        self.__session.close()
 
-    def download_barrel(self, dependency: Dependency) -> BarrelAsset:
+        summary = self.__limiter.summary()
+        if summary is not None:
+            logging.info(summary)
+
+        remaining, limit = self.__limiter.quota
+        if remaining is not None and limit is not None:
+            self.__tracer.gauge("rate_limit_remaining", remaining)
+            self.__tracer.gauge("rate_limit", limit)
+
+    def download_barrel(self, dependency: Dependency, directory: str) -> BarrelAsset:
+        """
+        Download the barrel for a dependency into directory.
+
+        The barrel is streamed into a temporary file next to its destination and
+        only renamed into place once the transfer has completed, so a failed
+        download never leaves a partial barrel behind.
+        """
+        release, asset = self.resolve_barrel(dependency)
+        return self.fetch_barrel(release, asset, directory)
+
+    def resolve_barrel(
+        self, dependency: Dependency
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Find the release that satisfies a dependency and its barrel asset,
+        without downloading it.
+
+        :return: The release index records of the release and of the asset
+        """
         release = self.__find_release(dependency)
-        asset = self.__get_barrel_asset(release)
-        content = self.__request_barrel_content(asset)
+        return release, self.__get_barrel_asset(release)
+
+    def fetch_barrel(
+        self, release: Dict[str, Any], asset: Dict[str, Any], directory: str
+    ) -> BarrelAsset:
+        """
+        Download a barrel asset found by resolve_barrel into directory
+        """
+        barrel_path = os.path.join(directory, asset["name"])
+        barrel_hash = self.__request_barrel_content(asset, barrel_path)
+
+        return BarrelAsset(asset["name"], release["tag"], barrel_path, barrel_hash)
+
+    @staticmethod
+    def __get_asset_digest(asset: GitReleaseAsset) -> Optional[str]:
+        """
+        Get the SHA-256 digest that GitHub publishes for an asset, if any.
+
+        The digest is read from the listing data directly, asking PyGithub for
+        it would trigger a second request to complete the asset object.
+        """
+        algorithm, _, digest = (asset._rawData.get("digest") or "").partition(":")
+        if algorithm != "sha256" or len(digest) == 0:
+            return None
+
+        return digest
+
+    @classmethod
+    def __index_release(cls, release: GitRelease) -> Dict[str, Any]:
+        """
+        Build the release index record for a listed release. The assets are
+        embedded in the listing, so no further requests are made.
+        """
+        published_at = release.published_at
+        return {
+            "id": release.id,
+            "tag": release.tag_name,
+            "published_at": None if published_at is None else published_at.isoformat(),
+            "assets": [
+                {
+                    "id": asset.id,
+                    "name": asset.name,
+                    "url": asset.url,
+                    "download_url": asset.browser_download_url,
+                    "size": asset.size,
+                    "digest": cls.__get_asset_digest(asset),
+                }
+                for asset in release.assets
+            ],
+        }
+
+    def __call_api(self, call: Callable[[], T], name: str, **args: Any) -> T:
+        """
+        Make a PyGithub call within the API rate limit, waiting for the limit to
+        reset rather than failing when it is exceeded
+
+        :param name: Name of the call's trace span
+        :param args: Details of the call for its trace span
+        """
+        while True:
+            self.__limiter.acquire()
+            self.__tracer.count("api_requests")
+            try:
+                with self.__tracer.span(name, "api", **args):
+                    result = call()
+            except RateLimitExceededException as e:
+                self.__limiter.limited(e.headers or {})
+                continue
+
+            # Github.rate_limiting would request /rate_limit whenever the
+            # response had no rate limit headers, which GitHub Enterprise
+            # servers without rate limiting answer with a 404
+            self.__limiter.update(self.__response_headers(result))
+            return result
+
+    @staticmethod
+    def __response_headers(result: Any) -> Mapping[str, str]:
+        """
+        The headers of the response that a PyGithub result was built from,
+        the objects listed from a page share the headers of the page
+        """
+        if isinstance(result, list):
+            result = result[0] if len(result) > 0 else None
 
-        return BarrelAsset(asset.name, release.tag_name, content)
+        # Read directly, raw_headers would complete a listed object with a
+        # request of its own
+        headers = getattr(result, "_headers", None)
+        return headers if isinstance(headers, dict) else {}
 
-    def __request_barrel_content(self, asset: GitReleaseAsset) -> bytes:
-        # Found a barrel file, Download it.
-        headers = {"Accept": "application/octet-stream"}
+    def __get_barrel_content(
+        self, asset: Dict[str, Any], headers: Dict[str, str]
+    ) -> requests.Response:
+        """
+        Start the download of a barrel asset.
 
+        Anonymous downloads use the asset's browser download URL when it is
+        known, which does not count against the API rate limit and leaves the
+        whole budget for resolving dependencies.
+        """
+        download_url = asset.get("download_url")
+        if self.__token is None and download_url is not None:
+            with self.__tracer.span(
+                "GET download", "http", asset=asset["name"], range=headers.get("Range")
+            ) as span:
+                req = self.__session.get(
+                    download_url, headers=headers, stream=True, timeout=self.TIMEOUT
+                )
+                span["status"] = req.status_code
+            return req
+
+        headers = dict(headers, Accept="application/octet-stream")
         if self.__token is not None:
             headers["Authorization"] = "token {token}".format(token=self.__token)
 
-        req = requests.get(asset.url, headers=headers)
-        return req.content
+        while True:
+            self.__limiter.acquire()
+            self.__tracer.count("api_requests")
+            # Lasts until the storage host that the API redirects to responds
+            with self.__tracer.span(
+                "GET asset", "api", asset=asset["name"], range=headers.get("Range")
+            ) as span:
+                req = self.__session.get(
+                    asset["url"], headers=headers, stream=True, timeout=self.TIMEOUT
+                )
+                span["status"] = req.status_code
+                span["redirects"] = len(req.history)
+
+            # The API answers with a redirect to the storage host
+            for response in list(req.history) + [req]:
+                self.__limiter.update(response.headers)
+
+            if not RateLimiter.is_limited(req.status_code, req.headers):
+                return req
+
+            self.__limiter.limited(req.headers)
+            req.close()
+
+    def __request_barrel_content(self, asset: Dict[str, Any], barrel_path: str) -> str:
+        # Named after the asset, so that only a download of the very same asset
+        # resumes from it
+        part_path = os.path.join(
+            os.path.dirname(barrel_path),
+            ".{name}.{id}.part".format(name=asset["name"], id=asset["id"]),
+        )
+        download = ResumableDownload(
+            asset["name"],
+            lambda headers: self.__get_barrel_content(asset, headers),
+            part_path,
+            asset.get("size"),
+            self.__retries,
+            self.__segments,
+        )
+        with self.__tracer.span("transfer", "transfer", asset=asset["name"]) as span:
+            try:
+                barrel_hash = download.run()
+            finally:
+                span["bytes"] = download.bytes_received
+                self.__tracer.count("bytes_downloaded", download.bytes_received)
+
+        expected_hash = asset["digest"]
+        if expected_hash is not None and expected_hash != barrel_hash:
+            os.remove(part_path)
+            raise Error(
+                "Downloaded {name} does not match its published digest".format(
+                    name=asset["name"]
+                )
+            )
+
+        os.replace(part_path, barrel_path)
+        return barrel_hash
 
-    def __get_barrel_asset(self, release: GitRelease) -> GitReleaseAsset:
+    def __get_barrel_asset(self, release: Dict[str, Any]) -> Dict[str, Any]:
         # Matching tag download the barrels
-        for asset in release.get_assets():
-            if self.BARREL_FILE.match(asset.name) is not None:
+        for asset in release["assets"]:
+            if self.BARREL_FILE.match(asset["name"]) is not None:
                 return asset
 
         raise Error(
-            "No barrel asset found in release: {rel}".format(rel=release.tag_name)
+            "No barrel asset found in release: {rel}".format(rel=release["tag"])
         )
 
-    def __find_release(self, dependency: Dependency) -> GitRelease:
+    def __get_repo_lock(self, repo: str) -> threading.Lock:
+        with self.__lock:
+            return self.__repo_locks.setdefault(repo, threading.Lock())
+
+    def __refresh_releases(self, dependency: Dependency) -> None:
+        """
+        List the releases published since the repository was last indexed.
+
+        Listing stops at the first release that is already indexed. If the
+        index has never been listed back to the repository's first release and
+        holds no match for the dependency, listing continues past indexed
+        releases until a match is found, as it would without an index.
+        """
+        assert dependency.repo is not None
+        assert dependency.version is not None
+
+        repo = dependency.repo
+        known_ids = self.__index.release_ids(repo)
+        complete = self.__index.is_complete(repo)
+        has_match = self.__index.find(repo, dependency.version) is not None
+
+        version = dependency.version
+        releases = self.__github.get_repo(repo, lazy=True).get_releases()
+
+        def list_new_releases() -> Tuple[List[Dict[str, Any]], bool]:
+            new_releases: List[Dict[str, Any]] = []
+            page = 0
+            while True:
+                # Each page is a request of its own, made within the rate limit
+                # so that a limited page is retried rather than the listing
+                listed = self.__call_api(
+                    lambda: releases.get_page(page),
+                    "list releases",
+                    repo=repo,
+                    page=page,
+                )
+                for release in listed:
+                    if release.id in known_ids:
+                        if complete or has_match:
+                            return new_releases, False
+                        continue
+
+                    new_releases.append(self.__index_release(release))
+                    if not complete and version.matches(release.tag_name):
+                        return new_releases, False
+
+                if len(listed) < self.PER_PAGE:
+                    return new_releases, True
+                page += 1
+
+        new_releases, reached_end = list_new_releases()
+        if len(new_releases) > 0 or reached_end:
+            self.__index.add_releases(repo, new_releases, reached_end)
+
+    def __get_release_by_tag(self, dependency: Dependency) -> Optional[Dict[str, Any]]:
+        """
+        Look up the release for an exact version by its tag, trying the tag
+        with and without a v prefix. The release's assets are embedded in the
+        response, so the barrel is located with the same request.
+        """
         assert dependency.repo is not None
         assert dependency.version is not None
 
-        repo = self.__github.get_repo(dependency.repo)
+        version = str(dependency.version)
+        if version.startswith("v"):
+            version = version[1:]
 
-        # Search the releases for a version that we can use
-        for release in repo.get_releases():
-            if not dependency.version.matches(release.tag_name):
-                # Version does not match our requirement
+        repo = self.__github.get_repo(dependency.repo, lazy=True)
+        for tag in ["v" + version, version]:
+            try:
+                release = self.__index_release(
+                    self.__call_api(
+                        lambda: repo.get_release(tag),
+                        "get release",
+                        repo=dependency.repo,
+                        tag=tag,
+                    )
+                )
+            except UnknownObjectException:
                 continue
+
+            self.__index.add_releases(dependency.repo, [release], False)
             return release
 
-        raise Error(
-            "Unable to find matching version {version}".format(
-                version=dependency.version
+        return None
+
+    def __find_release(self, dependency: Dependency) -> Dict[str, Any]:
+        assert dependency.repo is not None
+        assert dependency.version is not None
+
+        if dependency.version.is_exact:
+            # A pinned version can only ever resolve to one release, so it is
+            # answered from the index or by tag without listing releases
+            with self.__get_repo_lock(dependency.repo):
+                release = self.__index.find(dependency.repo, dependency.version)
+                if release is None:
+                    release = self.__get_release_by_tag(dependency)
+
+            if release is not None:
+                return release
+
+        with self.__get_repo_lock(dependency.repo):
+            # Each repository only needs to be refreshed once per run, unless
+            # an incomplete index did not hold this dependency's version
+            if (
+                dependency.repo not in self.__refreshed
+                or self.__index.find(dependency.repo, dependency.version) is None
+            ):
+                self.__refresh_releases(dependency)
+                self.__refreshed.add(dependency.repo)
+
+        release = self.__index.find(dependency.repo, dependency.version)
+        if release is None:
+            raise Error(
+                "Unable to find matching version {version}".format(
+                    version=dependency.version
+                )
             )
-        )
+
+        return release
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+
+class GraphqlResolver(object):
+    """
+    Resolves the recent releases of many repositories with a single GitHub
+    GraphQL query, rather than listing each repository's releases over REST.
+    """
+
+    RELEASES_PER_REPO = 30
+    ASSETS_PER_RELEASE = 20
+    REPOS_PER_QUERY = 50
+
+    __RELEASE_FIELDS = """
+        releases(first: {releases}, orderBy: {{field: CREATED_AT, direction: DESC}}) {{
+          pageInfo {{ hasNextPage }}
+          nodes {{
+            databaseId
+            tagName
+            publishedAt
+            releaseAssets(first: {assets}) {{
+              nodes {{ databaseId name size downloadUrl }}
+            }}
+          }}
+        }}"""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        token: str,
+        url: str = "https://api.github.com/graphql",
+        api_url: str = "https://api.github.com",
+        timeout: float = 60,
+    ):
+        """
+        :param timeout: Seconds to wait for a connection or for the response
+        """
+        self.__session = session
+        self.__token = token
+        self.__url = url
+        self.__api_url = api_url.rstrip("/")
+        self.__timeout = timeout
+
+    def resolve(self, repos: Iterable[str]) -> Dict[str, Tuple[List[Dict], bool]]:
+        """
+        Fetch the recent releases of each repository.
+
+        :param repos: Repositories as owner/name
+        :return: For each repository that could be resolved, its release index
+                 records newest first, and whether they reach back to the
+                 repository's first release
+        """
+        repos = sorted(set(repos))
+        resolved: Dict[str, Tuple[List[Dict], bool]] = {}
+        batch: List[str] = []
+        for repo in repos:
+            batch.append(repo)
+            if len(batch) == self.REPOS_PER_QUERY:
+                resolved.update(self.__resolve_batch(batch))
+                batch = []
+
+        if len(batch) > 0:
+            resolved.update(self.__resolve_batch(batch))
+
+        return resolved
+
+    def __build_query(self, repos: List[str]) -> Tuple[str, Dict[str, str]]:
+        fields = self.__RELEASE_FIELDS.format(
+            releases=self.RELEASES_PER_REPO, assets=self.ASSETS_PER_RELEASE
+        )
+
+        params = []
+        aliases = []
+        variables = {}
+        for i, repo in enumerate(repos):
+            owner, _, name = repo.partition("/")
+            variables["o{}".format(i)] = owner
+            variables["n{}".format(i)] = name
+            params.append("$o{i}: String!, $n{i}: String!".format(i=i))
+            aliases.append(
+                "r{i}: repository(owner: $o{i}, name: $n{i}) {{{fields}\n}}".format(
+                    i=i, fields=fields
+                )
+            )
+
+        query = "query({params}) {{\n{aliases}\n}}".format(
+            params=", ".join(params), aliases="\n".join(aliases)
+        )
+        return query, variables
+
+    def __post(self, query: str, variables: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        headers = {"Authorization": "bearer {token}".format(token=self.__token)}
+        try:
+            response = self.__session.post(
+                self.__url,
+                json={"query": query, "variables": variables},
+                headers=headers,
+                timeout=self.__timeout,
+            )
+        except requests.RequestException as e:
+            logging.debug("GraphQL release query failed: {err}".format(err=e))
+            return None
+
+        if response.status_code != 200:
+            logging.debug(
+                "GraphQL release query failed with HTTP {status}".format(
+                    status=response.status_code
+                )
+            )
+            return None
+
+        try:
+            return response.json().get("data")
+        except ValueError:
+            logging.debug("GraphQL release query returned invalid JSON")
+            return None
+
+    def __resolve_batch(self, repos: List[str]) -> Dict[str, Tuple[List[Dict], bool]]:
+        data = self.__post(*self.__build_query(repos))
+        if data is None:
+            return {}
+
+        resolved = {}
+        for i, repo in enumerate(repos):
+            # Repositories that do not exist or are not visible resolve to null
+            result = data.get("r{}".format(i))
+            if result is None:
+                continue
+
+            releases = result["releases"]
+            resolved[repo] = (
+                [self.__index_release(repo, r) for r in releases["nodes"]],
+                not releases["pageInfo"]["hasNextPage"],
+            )
+
+        return resolved
+
+    def __index_release(self, repo: str, release: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": release["databaseId"],
+            "tag": release["tagName"],
+            "published_at": release["publishedAt"],
+            "assets": [
+                {
+                    "id": asset["databaseId"],
+                    "name": asset["name"],
+                    "url": "{api}/repos/{repo}/releases/assets/{id}".format(
+                        api=self.__api_url, repo=repo, id=asset["databaseId"]
+                    ),
+                    "download_url": asset.get("downloadUrl"),
+                    "size": asset["size"],
+                    # Not queried, older GitHub Enterprise servers would reject
+                    # the whole query. A digest already indexed over REST is
+                    # kept when the records are merged.
+                    "digest": None,
+                }
+                for asset in release["releaseAssets"]["nodes"]
+            ],
+        }
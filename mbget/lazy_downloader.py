@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from mbget.barrel_asset import BarrelAsset
+from mbget.dependency import Dependency
+
+if TYPE_CHECKING:
+    # PyGithub and requests take longer to import than the rest of mbget, they
+    # are only imported once a download is needed
+    from mbget.github_downloader import GithubDownloader  # noqa: F401
+
+
+class LazyDownloader(object):
+    """
+    Stands in for a GithubDownloader that is only created, and the network
+    stack only imported, the first time a dependency has to be downloaded.
+    An update of a project whose barrels are all cached never needs it.
+    """
+
+    def __init__(self, factory: Callable[[], "GithubDownloader"]):
+        """
+        :param factory: Creates the downloader
+        """
+        self.__factory = factory
+        self.__downloader: Optional["GithubDownloader"] = None
+        self.__lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        """
+        Whether the downloader was needed
+        """
+        return self.__downloader is not None
+
+    @property
+    def downloader(self) -> "GithubDownloader":
+        """
+        The downloader, created by the first download worker to need it
+        """
+        with self.__lock:
+            if self.__downloader is None:
+                self.__downloader = self.__factory()
+            return self.__downloader
+
+    def prefetch(self, dependencies: Iterable[Dependency]) -> None:
+        dependencies = list(dependencies)
+        if len(dependencies) > 0:
+            self.downloader.prefetch(dependencies)
+
+    def download_barrel(self, dependency: Dependency, directory: str) -> BarrelAsset:
+        return self.downloader.download_barrel(dependency, directory)
+
+    def resolve_barrel(
+        self, dependency: Dependency
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        return self.downloader.resolve_barrel(dependency)
+
+    def fetch_barrel(
+        self, release: Dict[str, Any], asset: Dict[str, Any], directory: str
+    ) -> BarrelAsset:
+        return self.downloader.fetch_barrel(release, asset, directory)
+
+    def close(self) -> None:
+        """
+        Close the downloader if it was created
+        """
+        with self.__lock:
+            downloader = self.__downloader
+        if downloader is not None:
+            downloader.close()
+
+
+# Either downloader can be handed to an update
+Downloader = Union["GithubDownloader", LazyDownloader]
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional, TextIO, Tuple
+
+from mbget.config import Config
+from mbget.dependency import Dependency
+from mbget.errors import UpdateError
+
+
+class Lockfile(object):
+    """
+    The exact release asset installed for each package, kept in mbget.lock next
+    to the manifest.
+
+    Committing the lockfile lets every checkout install the very same barrels
+    straight from their recorded URLs and digests, without resolving any
+    versions.
+    """
+
+    FILE_NAME = "mbget.lock"
+
+    def __init__(self, config: Config):
+        self.packages: Dict[str, Dict[str, Any]] = {}
+        self.__config = config
+        self.__lock = threading.Lock()
+        self.__dirty = False
+
+        self.__read_lockfile_if_exists()
+
+    def __process_lockfile(self, file: TextIO):
+        try:
+            self.packages = json.load(file)["packages"]
+        except (KeyError, TypeError, ValueError):
+            raise UpdateError(
+                "Invalid lockfile {path}".format(path=self.__lockfile_path)
+            )
+
+    def __read_lockfile_if_exists(self) -> None:
+        if self.exists:
+            self.__config.open_file(self.__lockfile_path, "r", self.__process_lockfile)
+
+    @property
+    def __lockfile_path(self) -> str:
+        return os.path.join(os.path.dirname(self.__config.manifest), self.FILE_NAME)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.__lockfile_path)
+
+    def find(
+        self, dependency: Dependency
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Find the locked release asset of a dependency. Entries left behind by a
+        different repository or version requirement are ignored.
+
+        :return: The release and asset records, as resolved by the downloader
+        """
+        with self.__lock:
+            entry = self.packages.get(dependency.package_name)
+
+        if (
+            entry is None
+            or entry["repo"] != dependency.repo
+            or dependency.version is None
+            or not dependency.version.matches(entry["tag"])
+        ):
+            return None
+
+        release = {"tag": entry["tag"]}
+        asset = {
+            "id": entry["asset_id"],
+            "name": entry["name"],
+            "url": entry["url"],
+            # Entries locked before download URLs were recorded go through the
+            # API asset endpoint
+            "download_url": entry.get("download_url"),
+            "size": entry["size"],
+            "digest": entry["sha256"],
+        }
+        return release, asset
+
+    def add(
+        self,
+        dependency: Dependency,
+        release: Dict[str, Any],
+        asset: Dict[str, Any],
+        sha256: str,
+    ) -> None:
+        """
+        Lock a dependency to the release asset that was installed for it. Safe
+        to call from multiple download workers at once.
+        """
+        entry = {
+            "repo": dependency.repo,
+            "tag": release["tag"],
+            "asset_id": asset["id"],
+            "name": asset["name"],
+            "url": asset["url"],
+            "download_url": asset.get("download_url"),
+            "size": asset["size"],
+            "sha256": sha256,
+        }
+
+        with self.__lock:
+            if self.packages.get(dependency.package_name) != entry:
+                self.packages[dependency.package_name] = entry
+                self.__dirty = True
+
+    def write(self, package_names: Iterable[str]) -> None:
+        """
+        Write the lockfile out to disk if it changed, dropping the entries of
+        packages that are no longer dependencies
+        """
+        names = set(package_names)
+        with self.__lock:
+            for name in [name for name in self.packages if name not in names]:
+                self.packages.pop(name)
+                self.__dirty = True
+
+            if not self.__dirty:
+                return
+
+            self.__config.replace_file(self.__lockfile_path, "w", self.__write_lockfile)
+            self.__dirty = False
+
+    def __write_lockfile(self, file: TextIO):
+        json.dump({"packages": self.packages}, file, indent=2, sort_keys=True)
+        file.write("\n")
@@ -30,28 +30,147 @@
 
 import argparse
 import logging
+import sys
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
-from mbget.github_downloader import GithubDownloader
-from mbget.cache import Cache
+from mbget.barrel_store import BarrelStore
 from mbget.config import Config
-from mbget.manifest import Manifest
-from mbget.packages import Packages
+from mbget.errors import Error
+from mbget.fingerprint import Fingerprint
+from mbget.lazy_downloader import LazyDownloader
+from mbget.lockfile import Lockfile
+from mbget.metrics import Metrics, publish
+from mbget.profiler import Profiler
 from mbget.project import Project
+from mbget.release_index import ReleaseIndex
+from mbget.tracing import ChromeTraceExporter, NullTracer, Tracer
 from mbget.update import Update
+from mbget.workspace import Workspace
+
+
+def update_project(args, mode: str, tracer: Tracer = NullTracer()):
+    with tracer.phase("config"):
+        config = Config(args)
+
+    fingerprint = Fingerprint(config, mode)
+    with tracer.phase("fingerprint"):
+        if fingerprint.is_current():
+            logging.info("Dependencies are up to date")
+            return
+        inputs = fingerprint.read_inputs()
+
+    project = Project.load(config, tracer)
+
+    def create_downloader():
+        with tracer.phase("client setup"):
+            # Only import PyGithub and requests once a download is needed
+            from mbget.github_downloader import GithubDownloader
+
+            return GithubDownloader(
+                ReleaseIndex(config),
+                config.token,
+                config.pool_size,
+                config.rate_limit_wait,
+                config.retries,
+                config.segments,
+                config.api_url,
+                tracer,
+            )
+
+    downloader = LazyDownloader(create_downloader)
+    store = None if config.store_dir is None else BarrelStore(config.store_dir)
+    updater = Update(project, downloader, store, Lockfile(config), mode, tracer)
+
+    try:
+        if updater.update_project():
+            fingerprint.write(inputs)
+    finally:
+        downloader.close()
+
+
+@contextmanager
+def instrument(args) -> Iterator[Tracer]:
+    """
+    Profile the run if asked to with --profile, trace it with --trace and
+    publish its metrics if the config asks for them, reporting the profile,
+    writing the trace and publishing the metrics even if the run fails
+    """
+    profile_path: Optional[str] = getattr(args, "profile", None)
+    trace_path: Optional[str] = getattr(args, "trace", None)
+    config = Config(args)
+    publish_metrics = config.metrics_file is not None or config.statsd is not None
+    if profile_path is None and trace_path is None and not publish_metrics:
+        yield NullTracer()
+        return
+
+    profiler = None
+    if profile_path is not None:
+        profiler = Profiler()
+    elif publish_metrics:
+        # Metrics only need the counters, skip the overhead of tracemalloc
+        profiler = Profiler(trace_memory=False)
+    tracer = Tracer() if profiler is None else profiler
+
+    metrics = None
+    if publish_metrics and profiler is not None:
+        metrics = Metrics(profiler, config.metrics_prefix)
+
+    exporter = None
+    if trace_path is not None:
+        exporter = ChromeTraceExporter()
+        tracer.add_callback(exporter)
+
+    tracer.start()
+    success = False
+    try:
+        yield tracer
+        success = True
+    finally:
+        tracer.stop()
+        if metrics is not None:
+            metrics.finish(success)
+            publish(metrics, config)
+        if profile_path is not None and profiler is not None:
+            logging.info(profiler.format_report())
+            if profile_path != "-":
+                profiler.write(profile_path)
+        if exporter is not None and trace_path is not None:
+            exporter.write(trace_path)
 
 
 def run_update(args):
-    config = Config(args)
+    with instrument(args) as tracer:
+        if args.workspace is not None:
+            Workspace(args, args.workspace, tracer).update()
+        else:
+            update_project(args, Update.MODE_UPDATE, tracer)
+
 
-    manifest = Manifest(config.manifest)
-    packages = Packages(config)
-    cache = Cache(config)
+def run_install(args):
+    with instrument(args) as tracer:
+        if args.offline:
+            update_project(args, Update.MODE_OFFLINE, tracer)
+        elif args.frozen:
+            update_project(args, Update.MODE_FROZEN, tracer)
+        else:
+            update_project(args, Update.MODE_INSTALL, tracer)
 
-    project = Project(manifest, packages, cache, config)
-    downloader = GithubDownloader(config.token)
-    updater = Update(project, downloader)
 
-    updater.update_project()
+def add_instrument_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        help="Report where the run spent its time, and write the report as JSON "
+        "to FILE if given",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write a Chrome trace of every request, transfer, hash and file write",
+    )
 
 
 def main():
@@ -72,16 +191,62 @@ def main():
     update_parser = subparsers.add_parser(
         "update", help="Download and update dependencies"
     )
+    update_parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of dependencies to download concurrently",
+    )
+    update_parser.add_argument(
+        "--verify",
+        choices=["stat", "full", "none"],
+        help="How cached barrels are verified before reuse (default: stat)",
+    )
+    update_parser.add_argument(
+        "--workspace",
+        help="Update every project matched by a glob, or listed in a file of globs",
+    )
+    add_instrument_arguments(update_parser)
     update_parser.set_defaults(func=run_update)
 
+    install_parser = subparsers.add_parser(
+        "install", help="Install the dependency versions recorded in mbget.lock"
+    )
+    install_parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of dependencies to download concurrently",
+    )
+    install_parser.add_argument(
+        "--frozen",
+        action="store_true",
+        help="Fail instead of resolving dependencies that are not locked",
+    )
+    install_parser.add_argument(
+        "--verify",
+        choices=["stat", "full", "none"],
+        help="How cached barrels are verified before reuse (default: stat)",
+    )
+    install_parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Install from the local caches only, without network access",
+    )
+    add_instrument_arguments(install_parser)
+    install_parser.set_defaults(func=run_install)
+
     args = parser.parse_args()
 
     logging.basicConfig(format="%(levelname)s:%(message)s", level=logging.INFO)
 
-    if args.func is not None:
-        args.func(args)
-    else:
+    if args.func is None:
         parser.print_help()
+        return
+
+    try:
+        args.func(args)
+    except Error as e:
+        logging.error(e.message)
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -28,7 +28,8 @@
 #                                                                              #
 # ############################################################################ #
 
-from typing import TextIO, Union
+import zipfile
+from typing import IO, Union
 from xml.etree import ElementTree as Et
 
 from mbget.errors import Error
@@ -37,11 +38,30 @@ from mbget.errors import Error
 class Manifest(object):
     ns = {"iq": "http://www.garmin.com/xml/connectiq"}
 
-    def __init__(self, manifest_stream: Union[TextIO, str]):
+    # Where a barrel embeds its own manifest
+    BARREL_MANIFEST = "manifest.xml"
+
+    def __init__(self, manifest_stream: Union[IO, str]):
         self.root = Et.ElementTree(file=manifest_stream).getroot()
         self.__validate_manifest()
         self.__build_version_map()
 
+    @classmethod
+    def from_barrel(cls, barrel_path: str) -> "Manifest":
+        """
+        Read the manifest embedded in a barrel
+
+        :raises Error: If the barrel has no valid manifest
+        """
+        try:
+            with zipfile.ZipFile(barrel_path) as barrel:
+                with barrel.open(cls.BARREL_MANIFEST) as f:
+                    return cls(f)
+        except (KeyError, OSError, zipfile.BadZipFile, Et.ParseError):
+            raise Error(
+                "No valid manifest in barrel {barrel}".format(barrel=barrel_path)
+            )
+
     def get_depends(self):
         return list(self.version_map.keys())
 
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import logging
+import socket
+import threading
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from mbget.config import Config
+from mbget.profiler import Profiler
+from mbget.tracing import Span, Tracer
+
+
+class Metrics(object):
+    """
+    Metrics of a run for monitoring a build fleet: the counters and gauges
+    collected by a profiler, and the duration of each phase.
+
+    Metrics are written as a Prometheus textfile for node_exporter's textfile
+    collector, or sent to a StatsD daemon, once the run has finished. The
+    textfile only holds the last run, so its values are all gauges. StatsD
+    receives counters and timers, which the daemon aggregates across runs.
+    """
+
+    DESCRIPTIONS = {
+        "api_requests": "GitHub API requests made, one per listed page",
+        "bytes_downloaded": "Bytes of barrels downloaded",
+        "cache_hits": "Dependencies installed from the project cache",
+        "cache_misses": "Dependencies missing from the project cache",
+        "dependencies_resolved": "Dependencies resolved against GitHub releases",
+        "dependencies_installed": "Dependencies downloaded or installed from the store",
+        "dependencies_failed": "Dependencies that failed to install",
+        "rate_limit_remaining": "GitHub API requests remaining in the rate limit",
+        "rate_limit": "GitHub API requests allowed per rate limit window",
+    }
+
+    def __init__(self, profiler: Profiler, prefix: str = "mbget"):
+        """
+        :param profiler: Profiler of the run, the metrics add its phases to a
+            histogram
+        :param prefix: Prefix of every metric's name
+        """
+        self.__profiler = profiler
+        self.__prefix = prefix
+        self.__lock = threading.Lock()
+        self.__phases: Dict[str, List[float]] = {}
+        self.__started = time.perf_counter()
+        self.__duration: Optional[float] = None
+        self.__success = False
+        profiler.add_callback(self.__observe)
+
+    def __observe(self, span: Span) -> None:
+        if span.category != Tracer.PHASE:
+            return
+
+        with self.__lock:
+            self.__phases.setdefault(span.name, []).append(span.duration)
+
+    def finish(self, success: bool) -> None:
+        """
+        Record the end of the run
+        """
+        self.__duration = time.perf_counter() - self.__started
+        self.__success = success
+
+    def __name(self, name: str) -> str:
+        return "{prefix}_{name}".format(prefix=self.__prefix, name=name)
+
+    def prometheus(self) -> str:
+        """
+        The metrics in Prometheus' text exposition format
+        """
+        report = self.__profiler.report()
+        lines: List[str] = []
+
+        def add(name: str, kind: str, help_text: str, samples: List[str]) -> None:
+            lines.append("# HELP {name} {help}".format(name=name, help=help_text))
+            lines.append("# TYPE {name} {kind}".format(name=name, kind=kind))
+            lines.extend(samples)
+
+        # The textfile is replaced on every run, so the counts of a run are
+        # gauges. As counters, two runs with the same count would read as no
+        # increase.
+        for counter, value in sorted(report["counters"].items()):
+            name = self.__name(counter + "_last_run")
+            help_text = self.DESCRIPTIONS.get(counter, counter) + " by the last run"
+            add(name, "gauge", help_text, ["{} {}".format(name, value)])
+
+        for gauge, value in sorted(report["gauges"].items()):
+            name = self.__name(gauge)
+            help_text = self.DESCRIPTIONS.get(gauge, gauge)
+            add(name, "gauge", help_text, ["{} {}".format(name, value)])
+
+        with self.__lock:
+            phases = {phase: list(times) for phase, times in self.__phases.items()}
+        for metric, help_text, aggregate in (
+            ("phase_seconds_last_run", "Time spent in each phase", sum),
+            ("phase_max_seconds_last_run", "Longest call of each phase", max),
+            ("phase_calls_last_run", "Calls of each phase", len),
+        ):
+            name = self.__name(metric)
+            samples = [
+                '{name}{{phase="{phase}"}} {value}'.format(
+                    name=name, phase=phase, value=aggregate(times)
+                )
+                for phase, times in sorted(phases.items())
+            ]
+            add(name, "gauge", help_text + " by the last run", samples)
+
+        if self.__duration is not None:
+            name = self.__name("run_duration_seconds")
+            add(
+                name,
+                "gauge",
+                "Duration of the last run",
+                ["{} {}".format(name, self.__duration)],
+            )
+            name = self.__name("run_success")
+            add(
+                name,
+                "gauge",
+                "Whether the last run succeeded",
+                ["{} {}".format(name, int(self.__success))],
+            )
+            name = self.__name("last_run_timestamp_seconds")
+            add(
+                name,
+                "gauge",
+                "When the last run finished",
+                ["{} {}".format(name, int(time.time()))],
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def statsd(self) -> List[str]:
+        """
+        The metrics as StatsD lines, phase durations are timers so that the
+        daemon aggregates them
+        """
+        report = self.__profiler.report()
+        lines = [
+            "{name}:{value}|c".format(name=self.__statsd_name(counter), value=value)
+            for counter, value in sorted(report["counters"].items())
+        ]
+        lines += [
+            "{name}:{value}|g".format(name=self.__statsd_name(gauge), value=value)
+            for gauge, value in sorted(report["gauges"].items())
+        ]
+
+        with self.__lock:
+            phases = {phase: list(times) for phase, times in self.__phases.items()}
+        for phase, times in sorted(phases.items()):
+            name = self.__statsd_name("phase." + phase.replace(" ", "_"))
+            lines += ["{}:{:.3f}|ms".format(name, t * 1000) for t in times]
+
+        if self.__duration is not None:
+            lines.append(
+                "{}:{:.3f}|ms".format(
+                    self.__statsd_name("run_duration"), self.__duration * 1000
+                )
+            )
+            lines.append(
+                "{}:1|c".format(
+                    self.__statsd_name(
+                        "runs.success" if self.__success else "runs.failure"
+                    )
+                )
+            )
+        return lines
+
+    def __statsd_name(self, name: str) -> str:
+        return "{prefix}.{name}".format(prefix=self.__prefix, name=name)
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Write the metrics as a Prometheus textfile. The file is replaced
+        atomically, so the collector never reads a partial file.
+        """
+
+        def write(f: TextIO) -> None:
+            f.write(self.prometheus())
+
+        Config.replace_file(path, "w", write)
+
+    # Keep datagrams within the payload that is safe on any network
+    MAX_DATAGRAM = 512
+
+    def send_statsd(self, address: Tuple[str, int]) -> None:
+        """
+        Send the metrics to a StatsD daemon, as few datagrams as possible
+        """
+        datagrams: List[str] = []
+        for line in self.statsd():
+            if datagrams and len(datagrams[-1]) + len(line) + 1 <= self.MAX_DATAGRAM:
+                datagrams[-1] += "\n" + line
+            else:
+                datagrams.append(line)
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for datagram in datagrams:
+                sock.sendto(datagram.encode(), address)
+
+
+def publish(metrics: Metrics, config: Config) -> None:
+    """
+    Write or send the metrics of a run wherever the config asks for them.
+    Metrics are best effort, failing to publish them does not fail the run.
+    """
+    metrics_file = config.metrics_file
+    if metrics_file is not None:
+        try:
+            metrics.write_textfile(metrics_file)
+        except OSError as e:
+            logging.warning(
+                "Failed to write metrics to {file}: {err}".format(
+                    file=metrics_file, err=e
+                )
+            )
+
+    statsd = config.statsd
+    if statsd is not None:
+        try:
+            metrics.send_statsd(statsd)
+        except OSError as e:
+            logging.warning("Failed to send metrics to StatsD: {err}".format(err=e))
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from mbget.tracing import Span, Tracer
+
+
+class Profiler(Tracer):
+    """
+    Collects where an update spends its time: wall and CPU time per phase,
+    resolve and download times per dependency, counters such as API requests
+    and bytes downloaded, and the peak memory allocated.
+
+    Phases that run on several workers, like downloads, add up the time spent
+    on every worker. Phases may nest, hashing during cache validation is part of
+    loading the cache.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        """
+        :param trace_memory: Whether to trace memory allocations for the peak
+            memory, which slows the run down
+        """
+        super(Profiler, self).__init__()
+        self.__trace_memory = trace_memory
+        self.__lock = threading.Lock()
+        self.__phases: Dict[str, Dict[str, float]] = {}
+        self.__dependencies: Dict[str, Dict[str, float]] = {}
+        self.__counters: Dict[str, int] = {}
+        self.__gauges: Dict[str, float] = {}
+        self.__started: Optional[float] = None
+        self.__started_cpu = 0.0
+        self.__wall = 0.0
+        self.__cpu = 0.0
+        self.__peak_memory: Optional[int] = None
+        self.add_callback(self.__record)
+
+    def start(self) -> None:
+        """
+        Start profiling the run
+        """
+        if self.__trace_memory:
+            tracemalloc.start()
+        self.__started = time.perf_counter()
+        self.__started_cpu = time.process_time()
+
+    def stop(self) -> None:
+        if self.__started is None:
+            return
+
+        self.__wall = time.perf_counter() - self.__started
+        self.__cpu = time.process_time() - self.__started_cpu
+        if self.__trace_memory:
+            self.__peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        self.__started = None
+
+    def __record(self, span: Span) -> None:
+        if span.category != self.PHASE:
+            return
+
+        with self.__lock:
+            phase = self.__phases.setdefault(
+                span.name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+            )
+            phase["wall_seconds"] += span.duration
+            phase["cpu_seconds"] += span.cpu
+            phase["calls"] += 1
+
+            dependency = span.args.get("dependency")
+            if dependency is not None:
+                times = self.__dependencies.setdefault(dependency, {})
+                key = "{phase}_seconds".format(phase=span.name)
+                times[key] = times.get(key, 0.0) + span.duration
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Add to a counter. Safe to use from multiple workers at once.
+        """
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge. Safe to use from multiple workers at once.
+        """
+        with self.__lock:
+            self.__gauges[name] = value
+
+    def report(self) -> Dict[str, Any]:
+        """
+        The profile of the run, as written to the JSON report
+        """
+        with self.__lock:
+            return {
+                "wall_seconds": self.__wall,
+                "cpu_seconds": self.__cpu,
+                "peak_memory_bytes": self.__peak_memory,
+                "phases": {k: dict(v) for k, v in self.__phases.items()},
+                "dependencies": {k: dict(v) for k, v in self.__dependencies.items()},
+                "counters": dict(self.__counters),
+                "gauges": dict(self.__gauges),
+            }
+
+    def format_report(self) -> str:
+        """
+        The profile of the run as a table
+        """
+        report = self.report()
+        lines: List[str] = [
+            "Profile: {wall:.3f}s wall, {cpu:.3f}s CPU".format(
+                wall=report["wall_seconds"], cpu=report["cpu_seconds"]
+            )
+        ]
+        if report["peak_memory_bytes"] is not None:
+            lines[0] += ", {mib:.1f} MiB peak memory".format(
+                mib=report["peak_memory_bytes"] / (1 << 20)
+            )
+
+        lines.append(
+            "  {:<24} {:>10} {:>10} {:>6}".format(
+                "Phase", "Wall (s)", "CPU (s)", "Calls"
+            )
+        )
+        for name, phase in report["phases"].items():
+            lines.append(
+                "  {:<24} {:>10.3f} {:>10.3f} {:>6}".format(
+                    name, phase["wall_seconds"], phase["cpu_seconds"], phase["calls"]
+                )
+            )
+
+        if len(report["dependencies"]) > 0:
+            lines.append(
+                "  {:<24} {:>11} {:>12}".format(
+                    "Dependency", "Resolve (s)", "Download (s)"
+                )
+            )
+            for name, times in sorted(report["dependencies"].items()):
+                lines.append(
+                    "  {:<24} {:>11.3f} {:>12.3f}".format(
+                        name,
+                        times.get("resolve_seconds", 0.0),
+                        times.get("download_seconds", 0.0),
+                    )
+                )
+
+        values = dict(report["counters"], **report["gauges"])
+        for name, value in sorted(values.items()):
+            lines.append("  {:<24} {:>10}".format(name, value))
+
+        return "\n".join(lines)
+
+    def write(self, path: str) -> None:
+        """
+        Write the profile of the run as JSON
+        """
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
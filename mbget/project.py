@@ -28,13 +28,16 @@
 #                                                                              #
 # ############################################################################ #
 
-from typing import Dict, List
+import threading
+from typing import ContextManager, Dict, List
 
 from mbget.cache import Cache
 from mbget.manifest import Manifest
 from mbget.packages import Packages
 from mbget.dependency import Dependency
 from mbget.config import Config
+from mbget.errors import UpdateError
+from mbget.tracing import NullTracer, Tracer
 
 
 class Project(object):
@@ -47,8 +50,24 @@ class Project(object):
         self.packages = packages
         self.__cache = cache
         self.__config = config
+        self.__lock = threading.Lock()
         self.__build_dependencies()
 
+    @classmethod
+    def load(cls, config: Config, tracer: Tracer = NullTracer()) -> "Project":
+        """
+        Load the project described by a configuration, its manifest, package map
+        and dependency cache
+        """
+        with tracer.phase("manifest"):
+            manifest = Manifest(config.manifest)
+            packages = Packages(config)
+
+        # Cached dependencies are validated as the project is built
+        with tracer.phase("cache"):
+            cache = Cache(config, tracer=tracer)
+            return cls(manifest, packages, cache, config)
+
     @property
     def config(self) -> Config:
         return self.__config
@@ -69,10 +88,43 @@ class Project(object):
                 deps.append(dep)
         return deps
 
+    def is_cached(self, dependency: Dependency) -> bool:
+        return dependency in self.__cache
+
+    def require(self, package_name: str, version: str) -> Dependency:
+        """
+        Add a package that one of the dependencies' barrels depends on, its
+        repository is looked up in the package map.
+
+        :raises UpdateError: If the package is not in the package map
+        """
+        try:
+            self.packages.get_repo_for_package(package_name)
+        except KeyError:
+            raise UpdateError(
+                "Package {package} is not in the package map".format(
+                    package=package_name
+                )
+            )
+
+        with self.__lock:
+            return self.__initialize_dependency(package_name, version)
+
     def update_dependency(self, dependency: Dependency):
+        """
+        Record a freshly downloaded dependency. Safe to call from multiple
+        download workers, the cache is committed when the enclosing transaction
+        ends.
+        """
         self.__cache.add_dependency(dependency)
-        self.__cache.write_cache()
-        self.__add_dependency(dependency)
+        with self.__lock:
+            self.__add_dependency(dependency)
+
+    def transaction(self) -> ContextManager[None]:
+        """
+        Batch dependency updates into a single write of the dependency cache
+        """
+        return self.__cache.transaction()
 
     def __write_barrel_jungle(self, file) -> None:
         barrel_path = "$(base.barrelPath)"
@@ -81,7 +133,8 @@ class Project(object):
         for dep in self.dependencies.values():
             file.write(
                 '{name} = "{asset}"\n'.format(
-                    name=dep.package_name, asset=dep.barrel_name
+                    name=dep.package_name,
+                    asset=self.__config.relative_path(dep.barrel_name),
                 )
             )
             barrel_path += ";$({name})".format(name=dep.package_name)
@@ -96,17 +149,21 @@ class Project(object):
 
     def __build_dependencies(self):
         for dep in self.manifest.get_depends():
-            self.__initialize_dependency(dep)
+            self.__initialize_dependency(dep, self.manifest.get_required_version(dep))
 
-    def __initialize_dependency(self, package_name: str) -> None:
+    def __initialize_dependency(self, package_name: str, version: str) -> Dependency:
         new_dep = Dependency(package_name)
-        new_dep.set_version(self.manifest.get_required_version(package_name))
+        new_dep.set_version(version)
         new_dep.set_repo(self.packages.get_repo_for_package(package_name))
 
         if new_dep in self.__cache:
             new_dep.set_barrel_name(self.__cache.get_barrel_for_package(new_dep))
+            tag = self.__cache.get_tag_for_package(new_dep)
+            if tag is not None:
+                new_dep.set_resolved_tag(tag)
 
         self.__add_dependency(new_dep)
+        return new_dep
 
     def __add_dependency(self, dep: Dependency) -> None:
         self.dependencies[dep.package_name] = dep
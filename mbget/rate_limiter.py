@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import logging
+import threading
+import time
+from typing import Callable, Mapping, Optional, Tuple
+
+from mbget.errors import Error
+
+
+class RateLimiter(object):
+    """
+    Schedules requests to the GitHub REST API within its rate limit.
+
+    The quota is tracked from the X-RateLimit-* headers of each response. Once
+    it is spent, or GitHub asks to back off with Retry-After, requests are held
+    back until the limit resets instead of failing. Requests are only failed if
+    that would take longer than max_wait seconds.
+    """
+
+    # How long to back off when GitHub rejects a request for exceeding a limit
+    # without saying for how long
+    DEFAULT_BACKOFF = 60
+
+    def __init__(
+        self,
+        max_wait: float,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.__max_wait = max_wait
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__lock = threading.Lock()
+
+        self.__limit: Optional[int] = None
+        self.__remaining: Optional[int] = None
+        self.__reset: Optional[float] = None
+        self.__not_before = 0.0
+
+        self.__requests = 0
+        self.__waited = 0.0
+
+    def acquire(self) -> None:
+        """
+        Wait until a request can be sent within the rate limit. Safe to call
+        from multiple workers at once.
+
+        :raises Error: If the limit would not allow a request within max_wait
+        """
+        while True:
+            with self.__lock:
+                wait = self.__get_wait()
+                if wait <= 0:
+                    if self.__remaining is not None:
+                        self.__remaining -= 1
+                    self.__requests += 1
+                    return
+
+                if wait > self.__max_wait:
+                    raise Error(
+                        "GitHub API rate limit exceeded, it resets in {wait} seconds. "
+                        "Use a token for a higher limit".format(wait=int(wait))
+                    )
+
+                self.__waited += wait
+
+            logging.warning(
+                "GitHub API rate limit reached, waiting {wait} seconds".format(
+                    wait=int(wait)
+                )
+            )
+            self.__sleep(wait)
+
+    def __get_wait(self) -> float:
+        now = self.__clock()
+        if self.__not_before > now:
+            return self.__not_before - now
+
+        if self.__remaining is not None and self.__remaining <= 0:
+            if self.__reset is not None and self.__reset > now:
+                # Allow for the clock of this machine lagging GitHub's
+                return self.__reset - now + 1
+
+            # The limit has been reset, learn the new quota from the responses
+            self.__remaining = None
+
+        return 0
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Track the quota reported by a response's headers
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        try:
+            remaining = self.__get_int(headers, "x-ratelimit-remaining")
+            limit = self.__get_int(headers, "x-ratelimit-limit")
+            reset = self.__get_int(headers, "x-ratelimit-reset")
+            retry_after = self.__get_int(headers, "retry-after")
+        except ValueError:
+            return
+
+        with self.__lock:
+            if limit is not None:
+                self.__limit = limit
+
+            if remaining is not None:
+                if (
+                    self.__remaining is None
+                    or (reset is not None and reset != self.__reset)
+                    or remaining < self.__remaining
+                ):
+                    self.__remaining = remaining
+
+            if reset is not None:
+                self.__reset = reset
+
+            if retry_after is not None:
+                self.__not_before = max(self.__not_before, self.__clock() + retry_after)
+
+    def limited(self, headers: Mapping[str, str]) -> None:
+        """
+        Track a response that GitHub rejected for exceeding a rate limit, the
+        next request waits for the limit to reset
+        """
+        self.update(headers)
+        with self.__lock:
+            if self.__not_before <= self.__clock() and (
+                self.__remaining is None or self.__remaining > 0
+            ):
+                self.__not_before = self.__clock() + self.DEFAULT_BACKOFF
+
+    @staticmethod
+    def is_limited(status_code: int, headers: Mapping[str, str]) -> bool:
+        """
+        Whether a response was rejected for exceeding a rate limit
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        if status_code == 429:
+            return True
+
+        return status_code == 403 and (
+            headers.get("x-ratelimit-remaining") == "0" or "retry-after" in headers
+        )
+
+    @property
+    def quota(self) -> Tuple[Optional[int], Optional[int]]:
+        """
+        The requests remaining and the limit last reported by GitHub, None if
+        not known
+        """
+        with self.__lock:
+            remaining = self.__remaining
+            if remaining is not None:
+                remaining = max(remaining, 0)
+            return remaining, self.__limit
+
+    def summary(self) -> Optional[str]:
+        """
+        Describe the quota used during this run, None if no requests were made
+        """
+        with self.__lock:
+            if self.__requests == 0:
+                return None
+
+            summary = "GitHub API: {requests} calls".format(requests=self.__requests)
+            if self.__remaining is not None and self.__limit is not None:
+                summary += ", {remaining} of {limit} remaining".format(
+                    remaining=max(self.__remaining, 0), limit=self.__limit
+                )
+            if self.__waited > 0:
+                summary += ", waited {waited} seconds for the rate limit".format(
+                    waited=int(self.__waited)
+                )
+            return summary
+
+    @staticmethod
+    def __get_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+        value = headers.get(name)
+        return None if value is None else int(value)
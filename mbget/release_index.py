@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import bisect
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+
+from mbget.config import Config
+from mbget.version import Version
+
+
+class ReleaseIndex(object):
+    """
+    On disk index of the releases published by each repository.
+
+    Each release is recorded with its tag, publish date and barrel assets so
+    that a dependency can be resolved without listing the repository's releases
+    again. Releases are kept newest first, in the order GitHub lists them.
+    """
+
+    def __init__(self, config: Config, directory: Optional[str] = None):
+        """
+        :param config: The project configuration
+        :param directory: Where to keep the index, the barrel dir by default
+        """
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self.__config = config
+        self.__directory = directory if directory is not None else config.barrel_dir
+        self.__lock = threading.Lock()
+
+        # Releases of each repository sorted by version, built on first lookup
+        self.__sorted: Dict[str, Tuple[List[Tuple], List[Dict[str, Any]]]] = {}
+
+        self.__read_index_file_if_exists()
+
+    def __process_index(self, file: TextIO):
+        try:
+            self.index = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            logging.debug("Release index is corrupt.")
+
+    def __read_index_file_if_exists(self) -> None:
+        if os.path.exists(self.__index_file):
+            self.__config.open_file(self.__index_file, "r", self.__process_index)
+
+    @property
+    def __index_file(self):
+        return os.path.join(self.__directory, ".mbgetreleases")
+
+    def __get_repo(self, repo: str) -> Dict[str, Any]:
+        return self.index.get(repo, {"complete": False, "releases": []})
+
+    def release_ids(self, repo: str) -> Set[int]:
+        """
+        Ids of every indexed release of a repository
+        """
+        with self.__lock:
+            return {r["id"] for r in self.__get_repo(repo)["releases"]}
+
+    def is_complete(self, repo: str) -> bool:
+        """
+        Whether the releases of a repository have been listed back to the first
+        """
+        with self.__lock:
+            return self.__get_repo(repo)["complete"]
+
+    def __get_sorted(self, repo: str) -> Tuple[List[Tuple], List[Dict[str, Any]]]:
+        if repo not in self.__sorted:
+            releases = sorted(
+                self.__get_repo(repo)["releases"],
+                key=lambda r: Version(r["tag"]).sort_key,
+            )
+            keys = [Version(r["tag"]).sort_key for r in releases]
+            self.__sorted[repo] = (keys, releases)
+
+        return self.__sorted[repo]
+
+    def find(self, repo: str, version: Version) -> Optional[Dict[str, Any]]:
+        """
+        Find the highest indexed release of a repository matching version
+        """
+        with self.__lock:
+            key_range = version.key_range()
+            if key_range is None:
+                # Not a semantic version, only an exact tag can match
+                for release in self.__get_repo(repo)["releases"]:
+                    if version.matches(release["tag"]):
+                        return release
+                return None
+
+            lowest, highest = key_range
+            keys, releases = self.__get_sorted(repo)
+
+            # Walk down from the highest version that could match, prereleases
+            # that were not asked for are the only releases skipped
+            i = bisect.bisect_right(keys, highest)
+            while i > 0 and keys[i - 1] >= lowest:
+                i -= 1
+                if version.matches(releases[i]["tag"]):
+                    return releases[i]
+
+        return None
+
+    @staticmethod
+    def __merge(known: Dict[str, Any], release: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Merge a release listed again into its indexed record. Sources do not
+        all know every field, GraphQL has no digests, so a field is only
+        replaced by a known value.
+        """
+        merged = dict(known)
+        merged.update({k: v for k, v in release.items() if v is not None})
+
+        assets = {a["id"]: a for a in known.get("assets", [])}
+        merged["assets"] = [
+            dict(
+                assets.get(asset["id"], {}),
+                **{k: v for k, v in asset.items() if v is not None}
+            )
+            for asset in release.get("assets", [])
+        ]
+        return merged
+
+    def add_releases(
+        self, repo: str, releases: Iterable[Dict[str, Any]], complete: bool
+    ) -> None:
+        """
+        Add newly listed releases to the index of a repository and write the
+        index out to disk.
+
+        :param releases: The new releases, newest first
+        :param complete: True if the listing reached the repository's first
+                         release
+        """
+        with self.__lock:
+            entry = self.__get_repo(repo)
+            by_id = {r["id"]: r for r in entry["releases"]}
+            for release in releases:
+                known = by_id.get(release["id"])
+                by_id[release["id"]] = (
+                    release if known is None else self.__merge(known, release)
+                )
+            merged: List[Dict[str, Any]] = sorted(
+                by_id.values(), key=lambda r: r["id"], reverse=True
+            )
+
+            self.index[repo] = {
+                "complete": entry["complete"] or complete,
+                "releases": merged,
+            }
+            self.__sorted.pop(repo, None)
+
+            # The index is only a cache, and may be shared by concurrent runs
+            # through the barrel store, failing to write it is not an error
+            try:
+                self.__config.replace_file(
+                    self.__index_file, "w", lambda f: json.dump(self.index, f)
+                )
+            except OSError as e:
+                logging.warning(
+                    "Failed to write the release index {file}: {err}".format(
+                        file=self.__index_file, err=e
+                    )
+                )
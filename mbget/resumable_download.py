@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+import urllib3
+
+from mbget.errors import Error
+
+
+class _RangesUnsupported(Exception):
+    """The server ignored a Range request"""
+
+
+class ResumableDownload(object):
+    """
+    Downloads a file into .part files that outlive a failed transfer.
+
+    An interrupted transfer is resumed with a Range request for the missing
+    bytes, on the next attempt or on the next run. Large files can be split into
+    segments that are downloaded in parallel, if the server supports ranges.
+    """
+
+    CHUNK_SIZE = 65536
+    # Smallest segment worth a request of its own
+    MIN_SEGMENT_SIZE = 1 << 20
+
+    def __init__(
+        self,
+        name: str,
+        open_response: Callable[[Dict[str, str]], requests.Response],
+        part_path: str,
+        size: Optional[int] = None,
+        retries: int = 3,
+        segments: int = 1,
+    ):
+        """
+        :param name: Name of the file, for messages
+        :param open_response: Sends the download request with the given extra
+            headers and returns the streamed response
+        :param part_path: Where the file is downloaded to
+        :param size: Size of the file if it is known, required for segments
+        :param retries: How many times an interrupted transfer is resumed
+        :param segments: How many parallel segments to split the file into
+        """
+        self.__name = name
+        self.__open_response = open_response
+        self.__part_path = part_path
+        self.__size = size
+        self.__retries = retries
+        self.__segments = segments
+        self.__hasher = hashlib.sha256()
+        self.__lock = threading.Lock()
+        self.__received = 0
+
+    @property
+    def bytes_received(self) -> int:
+        """
+        Bytes transferred so far, including those of interrupted attempts
+        """
+        with self.__lock:
+            return self.__received
+
+    def run(self) -> str:
+        """
+        Download the file into the part file
+
+        :return: The SHA-256 digest of the file
+        :raises Error: If the download failed, the part file is kept to resume
+        """
+        ranges = self.__split()
+        if len(ranges) > 1:
+            try:
+                return self.__fetch_segments(ranges)
+            except _RangesUnsupported:
+                logging.debug(
+                    "Server does not support ranges, downloading {name} whole".format(
+                        name=self.__name
+                    )
+                )
+
+        if os.path.exists(self.__part_path):
+            # Resuming, the bytes already downloaded are part of the digest
+            with open(self.__part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                    self.__hasher.update(chunk)
+
+        self.__fetch(self.__part_path, 0, -1)
+        return self.__hasher.hexdigest()
+
+    def __split(self) -> List[Tuple[int, int]]:
+        """
+        Split the file into the byte ranges of its segments
+        """
+        if self.__size is None or self.__segments <= 1:
+            return [(0, -1)]
+
+        count = min(self.__segments, self.__size // self.MIN_SEGMENT_SIZE)
+        if count <= 1:
+            return [(0, -1)]
+
+        length = -(-self.__size // count)
+        return [
+            (start, min(start + length, self.__size) - 1)
+            for start in range(0, self.__size, length)
+        ]
+
+    def __fetch_segments(self, ranges: List[Tuple[int, int]]) -> str:
+        paths = [
+            "{path}.{i}".format(path=self.__part_path, i=i) for i in range(len(ranges))
+        ]
+        segments = [(path, start, end) for path, (start, end) in zip(paths, ranges)]
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                list(pool.map(lambda segment: self.__fetch(*segment), segments))
+        except _RangesUnsupported:
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        # Join the segments, hashing them on the way
+        with open(self.__part_path, "wb") as out:
+            for path in paths:
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                        out.write(chunk)
+                        self.__hasher.update(chunk)
+
+        for path in paths:
+            os.remove(path)
+
+        return self.__hasher.hexdigest()
+
+    def __fetch(self, path: str, start: int, end: int) -> None:
+        """
+        Download a byte range into a file, resuming from the bytes already in
+        it. An end of -1 downloads to the end of the file.
+        """
+        attempt = 0
+        furthest = -1
+        while True:
+            offset = os.path.getsize(path) if os.path.exists(path) else 0
+            # Retries only run out for transfers that stopped making progress,
+            # a slow but flaky transfer keeps resuming. A server that restarts
+            # the file on every request makes no progress.
+            if offset > furthest:
+                furthest = offset
+                attempt = 0
+
+            if end >= 0 and start + offset > end:
+                return
+
+            headers = {}
+            if end >= 0:
+                headers["Range"] = "bytes={first}-{last}".format(
+                    first=start + offset, last=end
+                )
+            elif offset > 0:
+                headers["Range"] = "bytes={first}-".format(first=offset)
+
+            received = 0
+            try:
+                with self.__open_response(headers) as response:
+                    mode = self.__get_write_mode(response, headers, start + offset)
+                    if mode is None:
+                        return
+
+                    with open(path, mode) as f:
+                        for chunk in self.__iter_content(response):
+                            f.write(chunk)
+                            received += len(chunk)
+                            if end < 0:
+                                self.__hasher.update(chunk)
+                break
+            except requests.RequestException as e:
+                attempt += 1
+                if attempt > self.__retries and not self.__progressed(path, furthest):
+                    raise Error(
+                        "Download of {name} failed: {err}".format(
+                            name=self.__name, err=e
+                        )
+                    )
+
+                logging.warning(
+                    "Download of {name} interrupted, resuming: {err}".format(
+                        name=self.__name, err=e
+                    )
+                )
+                time.sleep(min(attempt, 5))
+            finally:
+                with self.__lock:
+                    self.__received += received
+
+        if end >= 0 and os.path.getsize(path) != end - start + 1:
+            os.remove(path)
+            raise Error("Download of {name} is incomplete".format(name=self.__name))
+
+    @staticmethod
+    def __progressed(path: str, furthest: int) -> bool:
+        """
+        Whether a failed attempt left more of the range in the file than any
+        attempt before it
+        """
+        return os.path.exists(path) and os.path.getsize(path) > furthest
+
+    @classmethod
+    def __iter_content(cls, response: requests.Response) -> Iterator[bytes]:
+        """
+        Read a response's content as it arrives. urllib3 2 buffers reads until
+        a whole chunk has arrived and drops the buffer when the connection
+        breaks, read1 hands over what arrived so that the part file keeps it.
+        """
+        raw = response.raw
+        if not isinstance(raw, urllib3.response.HTTPResponse) or not hasattr(
+            raw, "read1"
+        ):
+            yield from response.iter_content(chunk_size=cls.CHUNK_SIZE)
+            return
+
+        try:
+            while True:
+                chunk = raw.read1(cls.CHUNK_SIZE, decode_content=True)
+                if len(chunk) == 0:
+                    return
+                yield chunk
+        except urllib3.exceptions.HTTPError as e:
+            # As iter_content would raise it
+            raise requests.ConnectionError(e)
+
+    def __get_write_mode(
+        self, response: requests.Response, headers: Dict[str, str], first: int
+    ) -> Optional[str]:
+        """
+        How to write a response to the part file: appended to the bytes already
+        downloaded, or from scratch. None if there is nothing left to write.
+        """
+        ranged = "Range" in headers
+        if response.status_code == 206 and ranged:
+            content_range = response.headers.get("Content-Range", "")
+            if not content_range.startswith("bytes {first}-".format(first=first)):
+                raise Error(
+                    "Download of {name} returned the wrong range".format(
+                        name=self.__name
+                    )
+                )
+            return "ab"
+
+        if response.status_code == 200:
+            if ranged and headers["Range"].endswith("-"):
+                # The server ignored the range, start again from scratch
+                self.__hasher = hashlib.sha256()
+                return "wb"
+            if ranged:
+                raise _RangesUnsupported()
+            return "wb"
+
+        if response.status_code == 416 and ranged and headers["Range"].endswith("-"):
+            # Nothing past the bytes already downloaded, the file is complete
+            return None
+
+        raise Error(
+            "Download of {name} failed with HTTP {status}".format(
+                name=self.__name, status=response.status_code
+            )
+        )
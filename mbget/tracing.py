@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# CPU time of the calling thread, so spans that run on several download workers
+# at once are not charged for each other's work
+_thread_time = getattr(time, "thread_time", time.process_time)
+
+
+class Span(object):
+    """
+    A timed operation: an API request, asset transfer, hash or file write, or a
+    whole phase of the run
+    """
+
+    def __init__(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        end: float,
+        cpu: float,
+        thread: Optional[int],
+        args: Dict[str, Any],
+    ):
+        """
+        :param start: time.perf_counter() when the span started
+        :param end: time.perf_counter() when the span ended
+        :param cpu: CPU seconds spent by the thread during the span
+        :param thread: Identifier of the thread the span ran on
+        :param args: Details of the operation, such as the package or URL
+        """
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = end
+        self.cpu = cpu
+        self.thread = thread
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+SpanCallback = Callable[[Span], None]
+
+
+class Tracer(object):
+    """
+    Calls span callbacks with every operation that Update, GithubDownloader and
+    Cache time. Spans end on the thread that ran them, so callbacks must be safe
+    to call from multiple download workers at once.
+    """
+
+    # Spans of the phases of a run, which the profile is made of
+    PHASE = "phase"
+
+    def __init__(self):
+        self.__callbacks: List[SpanCallback] = []
+
+    def add_callback(self, callback: SpanCallback) -> None:
+        self.__callbacks.append(callback)
+
+    def start(self) -> None:
+        """
+        Start tracing the run
+        """
+
+    def stop(self) -> None:
+        """
+        Stop tracing the run
+        """
+
+    @contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time an operation. The span is ended even if the operation fails.
+
+        :return: The span's args, to record the outcome of the operation in
+        """
+        start = time.perf_counter()
+        cpu = _thread_time()
+        try:
+            yield args
+        finally:
+            span = Span(
+                name,
+                category,
+                start,
+                time.perf_counter(),
+                _thread_time() - cpu,
+                threading.current_thread().ident,
+                args,
+            )
+            for callback in self.__callbacks:
+                callback(span)
+
+    def phase(self, name: str, dependency: Optional[str] = None) -> Any:
+        """
+        Time a phase of the run
+
+        :param dependency: The package the phase is working on
+        """
+        if dependency is None:
+            return self.span(name, self.PHASE)
+        return self.span(name, self.PHASE, dependency=dependency)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        Add to a counter, such as the API requests made
+        """
+
+    def gauge(self, name: str, value: float) -> None:
+        """
+        Set a gauge, such as the API quota remaining
+        """
+
+
+class _NoSpan(object):
+    def __enter__(self) -> Dict[str, Any]:
+        return {}
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+class NullTracer(Tracer):
+    """
+    Tracer of runs that are neither traced nor profiled, which does nothing
+    """
+
+    __NO_SPAN = _NoSpan()
+
+    def add_callback(self, callback: SpanCallback) -> None:
+        raise TypeError("NullTracer never calls span callbacks")
+
+    def span(self, name: str, category: str, **args: Any) -> Any:
+        return self.__NO_SPAN
+
+    def phase(self, name: str, dependency: Optional[str] = None) -> Any:
+        return self.__NO_SPAN
+
+
+class ChromeTraceExporter(object):
+    """
+    Span callback that collects spans as Chrome trace events, which can be
+    opened in chrome://tracing or Perfetto. Each download worker shows up as a
+    track of its own.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__origin = time.perf_counter()
+        self.__events: List[Dict[str, Any]] = []
+        self.__threads: Dict[Optional[int], str] = {}
+
+    def __call__(self, span: Span) -> None:
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": self.__microseconds(span.start - self.__origin),
+            "dur": self.__microseconds(span.duration),
+            "pid": os.getpid(),
+            "tid": span.thread,
+            "args": dict(span.args, cpu_ms=round(span.cpu * 1000, 3)),
+        }
+        with self.__lock:
+            self.__events.append(event)
+            if span.thread not in self.__threads:
+                self.__threads[span.thread] = threading.current_thread().name
+
+    @staticmethod
+    def __microseconds(seconds: float) -> float:
+        return round(seconds * 1000000, 1)
+
+    def trace(self) -> Dict[str, Any]:
+        """
+        The trace in Chrome's trace event format
+        """
+        with self.__lock:
+            names = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": thread,
+                    "args": {"name": name},
+                }
+                for thread, name in self.__threads.items()
+            ]
+            events = sorted(self.__events, key=lambda e: e["ts"])
+        return {"traceEvents": names + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
@@ -28,24 +28,67 @@
 #                                                                              #
 # ############################################################################ #
 
-import os
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
-from mbget.errors import Error
+from mbget.barrel_asset import BarrelAsset
+from mbget.barrel_store import BarrelStore
+from mbget.errors import Error, UpdateError
 from mbget.dependency import Dependency
-from mbget.github_downloader import GithubDownloader
+from mbget.dependency_graph import DependencyGraph
+from mbget.lazy_downloader import Downloader
+from mbget.lockfile import Lockfile
+from mbget.tracing import NullTracer, Tracer
 from mbget.project import Project
 
 
 class Update(object):
     """Update handler"""
 
-    def __init__(self, project: Project, downloader: GithubDownloader):
+    # Resolve the newest matching releases and lock them
+    MODE_UPDATE = "update"
+    # Install locked releases, resolving and locking any new dependencies
+    MODE_INSTALL = "install"
+    # Install locked releases only, without resolving anything
+    MODE_FROZEN = "frozen"
+    # Install locked releases from the local caches only
+    MODE_OFFLINE = "offline"
+
+    def __init__(
+        self,
+        project: Project,
+        downloader: Downloader,
+        store: Optional[BarrelStore] = None,
+        lockfile: Optional[Lockfile] = None,
+        mode: str = MODE_UPDATE,
+        tracer: Tracer = NullTracer(),
+    ):
         self.__downloader = downloader
         self.__project = project
+        self.__store = store
+        self.__lockfile = lockfile
+        self.__mode = mode
+        self.__tracer = tracer
 
-    def update_project(self) -> None:
+    @property
+    def __locked(self) -> bool:
+        """Whether every dependency must be installed from the lockfile"""
+        return self.__mode in (self.MODE_FROZEN, self.MODE_OFFLINE)
+
+    def update_project(self) -> bool:
+        """
+        :return: True if every dependency was installed
+        :raises UpdateError: If installing from the lockfile and a dependency is
+            not locked, not available offline or failed to install
+        """
         self.__project.config.prepare_project_dir()
+        layer = list(self.__project.dependencies.values())
+        if self.__locked:
+            self.__check_locked_dependencies(
+                layer, self.__project.uncached_dependencies
+            )
 
         # Print info for cached dependencies
         for dep in self.__project.cached_dependencies:
@@ -57,38 +100,230 @@ class Update(object):
                 )
             )
 
-        for dep in self.__project.uncached_dependencies:
-            self.__update_dependency(dep)
+        graph = DependencyGraph(self.__project)
+        pending = self.__pending_dependencies()
+        failed: List[str] = []
+        # The commit also persists entries refreshed or dropped while the
+        # cache was validated above
+        with self.__project.transaction():
+            # Each layer holds the packages first required by the barrels of
+            # the previous one, starting from the application's dependencies
+            while len(layer) > 0:
+                layer_failed, depends = self.__install_layer(layer, pending, graph)
+                failed += layer_failed
+
+                layer = graph.next_layer(layer, depends)
+                uncached = [dep for dep in layer if not self.__project.is_cached(dep)]
+                if self.__locked:
+                    self.__check_locked_dependencies(layer, uncached)
+
+                pending = uncached + [
+                    dep
+                    for dep in layer
+                    if dep not in uncached and self.__needs_locking(dep)
+                ]
+
+        with self.__tracer.phase("jungle"):
+            self.__project.write_barrel_jungle()
+
+        if self.__lockfile is not None and not self.__locked:
+            with self.__tracer.phase("lockfile"):
+                self.__lockfile.write(self.__project.dependencies.keys())
+
+        if self.__mode != self.MODE_UPDATE and len(failed) > 0:
+            raise UpdateError(
+                "Failed to install {packages}".format(packages=", ".join(failed))
+            )
+        return len(failed) == 0
+
+    def __install_layer(
+        self,
+        layer: List[Dependency],
+        pending: List[Dependency],
+        graph: DependencyGraph,
+    ) -> Tuple[List[str], List[List[Tuple[str, str]]]]:
+        """
+        Install the pending dependencies of a layer and read what the barrels of
+        the layer depend on
 
-        self.__project.write_barrel_jungle()
+        :return: The packages that failed to install and the requirements of
+            each barrel of the layer
+        """
+        unresolved = [dep for dep in pending if self.__find_locked(dep) is None]
+        if len(unresolved) > 0:
+            with self.__tracer.phase("prefetch"):
+                self.__downloader.prefetch(unresolved)
 
-    def __update_dependency(self, dep: Dependency) -> None:
+        def visit(dep: Dependency) -> Tuple[bool, List[Tuple[str, str]]]:
+            if dep in pending and not self.__update_dependency(dep):
+                return False, []
+            with self.__tracer.phase("barrel manifests"):
+                return True, graph.read_depends(dep)
+
+        with ThreadPoolExecutor(max_workers=self.__project.config.jobs) as pool:
+            # Consume the results so that any unexpected worker exception is
+            # raised here rather than silently dropped
+            results = list(pool.map(visit, layer))
+
+        failed = [dep.package_name for dep, (ok, _) in zip(layer, results) if not ok]
+        return failed, [depends for _, depends in results]
+
+    def __pending_dependencies(self) -> List[Dependency]:
+        """
+        The dependencies to install, the uncached ones and, when locking, any
+        cached dependency that is not locked yet
+        """
+        pending = self.__project.uncached_dependencies
+        pending += [
+            dep
+            for dep in self.__project.cached_dependencies
+            if self.__needs_locking(dep)
+        ]
+        return pending
+
+    def __needs_locking(self, dep: Dependency) -> bool:
+        return (
+            self.__lockfile is not None
+            and not self.__locked
+            and self.__lockfile.find(dep) is None
+        )
+
+    def __find_locked(
+        self, dep: Dependency
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        if self.__lockfile is None or self.__mode == self.MODE_UPDATE:
+            return None
+        return self.__lockfile.find(dep)
+
+    def __check_locked_dependencies(
+        self, deps: List[Dependency], uncached: List[Dependency]
+    ) -> None:
+        """
+        Fail before installing a layer if one of its dependencies can not be
+        installed from the lockfile
+        """
+        unlocked = [dep.package_name for dep in deps if self.__find_locked(dep) is None]
+        if len(unlocked) > 0:
+            raise UpdateError(
+                "Lockfile is missing or out of date for {packages}, "
+                "run mbget update".format(packages=", ".join(unlocked))
+            )
+
+        if self.__mode != self.MODE_OFFLINE:
+            return
+
+        missing = [dep.package_name for dep in uncached if not self.__is_stored(dep)]
+        if len(missing) > 0:
+            raise UpdateError(
+                "Not available offline: {packages}".format(packages=", ".join(missing))
+            )
+
+    def __is_stored(self, dep: Dependency) -> bool:
+        locked = self.__find_locked(dep)
+        assert locked is not None
+        return self.__store is not None and self.__store.contains(locked[1]["digest"])
+
+    def __update_dependency(self, dep: Dependency) -> bool:
         logging.info(
             "Updating Dependency {dep}:{version} from repository {repo}".format(
                 dep=dep.package_name, version=dep.version, repo=dep.repo
             )
         )
-        self.__download_dependency_assets(dep)
+        if not self.__download_dependency_assets(dep):
+            self.__tracer.count("dependencies_failed")
+            return False
+
         self.__project.update_dependency(dep)
+        self.__tracer.count("dependencies_installed")
+        return True
 
-    def __download_dependency_assets(self, dep: Dependency) -> None:
+    def __download_dependency_assets(self, dep: Dependency) -> bool:
         try:
-            asset = self.__downloader.download_barrel(dep)
-            logging.info(
-                "Downloaded barrel {barrel} from release {tag}".format(
-                    barrel=asset.name, tag=asset.version
-                )
-            )
+            asset = self.__get_barrel(dep)
         except Error as e:
             logging.error(
                 "Failed to download barrel for {dep}:{version} - {msg}".format(
                     dep=dep.package_name, version=dep.version, msg=e.message
                 )
             )
-            return
+            return False
+
+        dep.set_barrel_name(asset.path)
+        dep.set_barrel_hash(asset.hash)
+        dep.set_resolved_tag(str(asset.version))
+        return True
+
+    def __get_barrel(self, dep: Dependency) -> BarrelAsset:
+        """
+        Install the barrel for a dependency from the barrel store, downloading it
+        if it is not stored yet
+        """
+        assert dep.repo is not None
+
+        with self.__tracer.phase("resolve", dep.package_name):
+            locked = self.__find_locked(dep)
+            if locked is not None:
+                release, release_asset = locked
+            else:
+                release, release_asset = self.__downloader.resolve_barrel(dep)
+                self.__tracer.count("dependencies_resolved")
+
+        with self.__tracer.phase("download", dep.package_name):
+            asset = self.__install_barrel(dep, release, release_asset)
+        if self.__lockfile is not None and not self.__locked:
+            self.__lockfile.add(dep, release, release_asset, asset.hash)
+
+        return asset
 
-        barrel_name = os.path.join(self.__project.config.barrel_dir, asset.name)
-        self.__project.config.open_file(
-            barrel_name, "wb", lambda f: f.write(asset.content)
+    def __install_barrel(
+        self, dep: Dependency, release: Dict[str, Any], release_asset: Dict[str, Any]
+    ) -> BarrelAsset:
+        assert dep.repo is not None
+
+        barrel_dir = self.__project.config.barrel_dir
+        tag, name = release["tag"], release_asset["name"]
+
+        if self.__store is None:
+            return self.__fetch_barrel(release, release_asset, barrel_dir)
+
+        with self.__store.lock(dep.repo, tag, name):
+            # A published or locked digest also finds the same content stored
+            # from another release
+            digest = release_asset["digest"]
+            if digest is None:
+                digest = self.__store.lookup(dep.repo, tag, name)
+            elif not self.__store.contains(digest):
+                digest = None
+
+            barrel_path = os.path.join(barrel_dir, name)
+            if digest is not None:
+                with self.__tracer.span("store install", "file", asset=name):
+                    installed = self.__store.install(digest, barrel_path)
+
+                if installed:
+                    logging.info(
+                        "Installed barrel {barrel} from release {tag} from the "
+                        "store".format(barrel=name, tag=tag)
+                    )
+                    return BarrelAsset(name, tag, barrel_path, digest)
+
+            asset = self.__fetch_barrel(release, release_asset, barrel_dir)
+            with self.__tracer.span("store add", "file", asset=name):
+                self.__store.add(dep.repo, tag, name, asset.path, asset.hash)
+            return asset
+
+    def __fetch_barrel(
+        self, release: Dict[str, Any], release_asset: Dict[str, Any], barrel_dir: str
+    ) -> BarrelAsset:
+        if self.__mode == self.MODE_OFFLINE:
+            raise UpdateError(
+                "{barrel} is not available offline".format(barrel=release_asset["name"])
+            )
+
+        asset = self.__downloader.fetch_barrel(release, release_asset, barrel_dir)
+        logging.info(
+            "Downloaded barrel {barrel} from release {tag}".format(
+                barrel=asset.name, tag=asset.version
+            )
         )
-        dep.set_barrel_name(barrel_name)
+        return asset
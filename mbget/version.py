@@ -28,13 +28,34 @@
 #                                                                              #
 # ############################################################################ #
 
+
 import re
-from typing import Any
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+VersionParts = Tuple[int, Optional[int], Optional[int], Optional[str]]
 
 
 class Version(object):
+    """
+    A semantic version, or a version requirement when only some of its
+    components are given. "1.2" is satisfied by any 1.2.x release.
+
+    Versions are parsed once into (major, minor, patch, prerelease), their
+    sort_key orders them by semantic version precedence. Tags that are not
+    semantic versions order before all that are. Versions themselves only
+    compare equal by their text, "1.0.0" and "v1.0.0" are different tags of the
+    same precedence.
+    """
+
+    SEMVER = re.compile(
+        r"^v?(0|[1-9]\d*)(?:\.(0|[1-9]\d*))?(?:\.(0|[1-9]\d*))?"
+        r"(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$"
+    )
+
     def __init__(self, version: str):
         self.version = version
+        self.__parts = self.__parse(version)
 
     def __str__(self) -> str:
         return self.version
@@ -45,14 +66,110 @@ class Version(object):
 
         return other.version == self.version
 
+    def __hash__(self) -> int:
+        return hash(self.version)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def __parse(version: str) -> Optional[VersionParts]:
+        m = Version.SEMVER.match(version)
+        if m is None:
+            return None
+
+        major, minor, patch, prerelease = m.groups()
+        if minor is None and patch is not None:
+            return None
+
+        return (
+            int(major),
+            None if minor is None else int(minor),
+            None if patch is None else int(patch),
+            prerelease,
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def __sort_key(parts: Optional[VersionParts]) -> Tuple:
+        if parts is None:
+            return (-1,)
+
+        major, minor, patch, prerelease = parts
+        key: Tuple = (major, minor or 0, patch or 0)
+        if prerelease is None:
+            # A release has precedence over all of its prereleases
+            return key + (1,)
+
+        return key + (
+            0,
+            tuple(
+                (0, int(p)) if p.isdigit() else (1, p) for p in prerelease.split(".")
+            ),
+        )
+
+    @property
+    def parts(self) -> Optional[VersionParts]:
+        """
+        The (major, minor, patch, prerelease) components of the version, with
+        None for components that were not given. None if the version is not a
+        semantic version.
+        """
+        return self.__parts
+
+    @property
+    def is_exact(self) -> bool:
+        """
+        True if this version names a single release, with its major, minor and
+        patch components all given
+        """
+        return self.__parts is not None and self.__parts[2] is not None
+
+    @property
+    def sort_key(self) -> Tuple:
+        return self.__sort_key(self.__parts)
+
+    def key_range(self) -> Optional[Tuple[Tuple, Tuple]]:
+        """
+        The lowest and highest sort keys a version matching this requirement
+        can have, or None if this is not a semantic version.
+        """
+        if self.__parts is None:
+            return None
+
+        major, minor, patch, prerelease = self.__parts
+        if prerelease is not None:
+            return self.sort_key, self.sort_key
+
+        inf = float("inf")
+        return (
+            (major, minor or 0, patch or 0, 0),
+            (
+                major,
+                inf if minor is None else minor,
+                inf if patch is None else patch,
+                1,
+            ),
+        )
+
     def matches(self, other) -> bool:
         """
+        Check whether a version or release tag satisfies this version.
 
-        :param other:
-        :return:
+        Each component given in this version must equal the same component of
+        other. A prerelease only matches when this version names it.
+
+        :param other: A Version or tag name
+        :return: True if other satisfies this version
         """
-        tag_match = re.compile("^v?{version}".format(version=self.version))
-        if tag_match.match(str(other)) is None:
+        other = str(other)
+        if self.__parts is None:
+            return other == self.version or other == "v" + self.version
+
+        other_parts = self.__parse(other)
+        if other_parts is None:
             return False
 
-        return True
+        for required, actual in zip(self.__parts, other_parts):
+            if required is not None and required != actual:
+                return False
+
+        return self.__parts[3] is not None or other_parts[3] is None
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import glob
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
+from xml.etree.ElementTree import ParseError
+
+from mbget.barrel_store import BarrelStore
+from mbget.config import Config
+from mbget.errors import Error, UpdateError
+from mbget.lazy_downloader import Downloader, LazyDownloader
+from mbget.lockfile import Lockfile
+from mbget.tracing import NullTracer, Tracer
+from mbget.project import Project
+from mbget.release_index import ReleaseIndex
+from mbget.update import Update
+
+if TYPE_CHECKING:
+    from mbget.github_downloader import GithubDownloader  # noqa: F401
+
+
+class Workspace(object):
+    """
+    Updates every project of a workspace in one run.
+
+    The projects share one GitHub client, connection pool, release index and
+    barrel store, so a release used by several projects is resolved and
+    downloaded once. Each project keeps its own cache and jungle, exactly as if
+    it had been updated on its own.
+    """
+
+    def __init__(self, args, spec: str, tracer: Tracer = NullTracer()):
+        """
+        :param args: The parsed command line arguments, applied to every project
+        :param spec: A glob matching the projects, or a file listing one glob per
+            line
+        :param tracer: Traces or profiles the update of every project
+        """
+        self.__args = args
+        self.__tracer = tracer
+        self.__config = Config(args)
+        self.__roots = self.discover(args, spec)
+
+    @property
+    def roots(self) -> List[str]:
+        return self.__roots
+
+    @staticmethod
+    def discover(args, spec: str) -> List[str]:
+        """
+        Find the root directory of every project matched by a workspace spec.
+
+        A match is a project if it is a directory holding a manifest and package
+        map, or is one of those files. Globs listed in a file are relative to it,
+        blank lines and lines starting with # are ignored.
+        """
+        patterns = [spec]
+        if os.path.isfile(spec) and not Workspace.__is_project_file(args, spec):
+            base = os.path.dirname(spec)
+            with open(spec, "r") as f:
+                lines = [line.strip() for line in f]
+            patterns = [
+                os.path.join(base, line)
+                for line in lines
+                if len(line) > 0 and not line.startswith("#")
+            ]
+
+        roots: List[str] = []
+        for pattern in patterns:
+            for match in sorted(glob.glob(pattern, recursive=True)):
+                root = match if os.path.isdir(match) else os.path.dirname(match)
+                root = os.path.normpath(root or os.curdir)
+                if root not in roots and Workspace.__is_project(args, root):
+                    roots.append(root)
+
+        return roots
+
+    @staticmethod
+    def __is_project_file(args, path: str) -> bool:
+        config = Config(args, os.path.dirname(path))
+        return os.path.normpath(path) in (
+            os.path.normpath(config.manifest),
+            os.path.normpath(config.package),
+        )
+
+    @staticmethod
+    def __is_project(args, root: str) -> bool:
+        config = Config(args, root)
+        return os.path.isfile(config.manifest) and os.path.isfile(config.package)
+
+    def update(self) -> None:
+        """
+        Update every project in the workspace, projects are updated side by side
+
+        :raises UpdateError: If any project failed to update
+        """
+        if len(self.__roots) == 0:
+            raise UpdateError("No projects found in the workspace")
+
+        downloader = LazyDownloader(self.__create_downloader)
+        store_dir = self.__config.store_dir
+        store = None if store_dir is None else BarrelStore(store_dir)
+
+        try:
+            projects = [self.__load_project(root) for root in self.__roots]
+
+            # Resolve the releases needed by every project in one go
+            with self.__tracer.phase("prefetch"):
+                downloader.prefetch(
+                    dep
+                    for project in projects
+                    if project is not None
+                    for dep in project.uncached_dependencies
+                )
+
+            workers = min(self.__config.jobs, len(projects))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(
+                    pool.map(
+                        lambda project: self.__update_project(
+                            project, downloader, store
+                        ),
+                        projects,
+                    )
+                )
+        finally:
+            downloader.close()
+
+        failed = [root for root, ok in zip(self.__roots, results) if not ok]
+        if len(failed) > 0:
+            raise UpdateError(
+                "Failed to update {count} project(s): {roots}".format(
+                    count=len(failed),
+                    roots=", ".join(failed),
+                )
+            )
+
+    def __create_downloader(self) -> "GithubDownloader":
+        with self.__tracer.phase("client setup"):
+            from mbget.github_downloader import GithubDownloader
+
+            return GithubDownloader(
+                ReleaseIndex(self.__config, self.__index_dir()),
+                self.__config.token,
+                self.__config.pool_size,
+                self.__config.rate_limit_wait,
+                self.__config.retries,
+                self.__config.segments,
+                self.__config.api_url,
+                self.__tracer,
+            )
+
+    def __index_dir(self) -> str:
+        """
+        The release index is shared by the workspace, it is kept in the barrel
+        store, or the workspace's own barrel dir when the store is disabled
+        """
+        directory = self.__config.store_dir
+        if directory is None:
+            directory = self.__config.barrel_dir
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def __load_project(self, root: str) -> Optional[Project]:
+        try:
+            return Project.load(Config(self.__args, root), self.__tracer)
+        except (Error, OSError, ParseError) as e:
+            logging.error(
+                "Failed to load project {root}: {error}".format(
+                    root=root,
+                    error=e.message if isinstance(e, Error) else e,
+                )
+            )
+            return None
+
+    def __update_project(
+        self,
+        project: Optional[Project],
+        downloader: Downloader,
+        store: Optional[BarrelStore],
+    ) -> bool:
+        if project is None:
+            return False
+
+        root = project.config.root
+        logging.info("Updating project {root}".format(root=root))
+        try:
+            lockfile = Lockfile(project.config)
+            updater = Update(project, downloader, store, lockfile, tracer=self.__tracer)
+            # False when a dependency failed to download, each failure is
+            # logged by the update
+            return updater.update_project()
+        except (Error, OSError) as e:
+            logging.error(
+                "Failed to update project {root}: {error}".format(
+                    root=root, error=e.message if isinstance(e, Error) else e
+                )
+            )
+            return False
@@ -35,7 +35,7 @@ here = pathlib.Path(__file__).parent
 
 readme = (here / "README.md").read_text()
 
-requires = ["requests>=2.0,<3", "PyGithub~=1.53"]
+requires = ["requests>=2.0,<3", "PyGithub~=1.58"]
 
 setup(
     name="mbpkg",
@@ -52,7 +52,6 @@ setup(
         "Natural Language :: English",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -64,7 +63,7 @@ setup(
         "Tracker": "https://github.com/gcaufield/MonkeyPack/issues",
     },
     packages=["mbget"],
-    python_requires=">=3.6.*, < 4",
+    python_requires=">=3.7.*, < 4",
     install_requires=requires,
     entry_points={"console_scripts": ["mbget=mbget.main:main"]},
 )
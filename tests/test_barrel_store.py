@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from mbget.barrel_store import BarrelStore
+
+
+class TestBarrelStore(unittest.TestCase):
+    def setUp(self):
+        super(TestBarrelStore, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+
+        self.__root = os.path.join(self.__dir.name, "store")
+        self.__project = os.path.join(self.__dir.name, "project")
+        os.mkdir(self.__project)
+
+    def __write_barrel(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.__project, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    @staticmethod
+    def __read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_lookup_missing_asset(self):
+        store = BarrelStore(self.__root)
+
+        self.assertIsNone(store.lookup("owner/A", "v1.0.0", "A.barrel"))
+
+    def test_added_barrel_can_be_looked_up(self):
+        store = BarrelStore(self.__root)
+        path = self.__write_barrel("A.barrel", b"barrel")
+        digest = hashlib.sha256(b"barrel").hexdigest()
+
+        store.add("owner/A", "v1.0.0", "A.barrel", path, digest)
+
+        self.assertEqual(digest, store.lookup("owner/A", "v1.0.0", "A.barrel"))
+        self.assertTrue(store.contains(digest))
+        self.assertIsNone(store.lookup("owner/A", "v1.0.1", "A.barrel"))
+
+    def test_identical_content_is_stored_once(self):
+        store = BarrelStore(self.__root)
+        path = self.__write_barrel("A.barrel", b"barrel")
+        digest = hashlib.sha256(b"barrel").hexdigest()
+
+        store.add("owner/A", "v1.0.0", "A.barrel", path, digest)
+        store.add("owner/A", "v1.0.1", "A.barrel", path, digest)
+
+        self.assertEqual([digest], os.listdir(os.path.join(self.__root, "sha256")))
+        self.assertEqual(digest, store.lookup("owner/A", "v1.0.1", "A.barrel"))
+
+    def test_install_into_other_project(self):
+        store = BarrelStore(self.__root)
+        path = self.__write_barrel("A.barrel", b"barrel")
+        digest = hashlib.sha256(b"barrel").hexdigest()
+        store.add("owner/A", "v1.0.0", "A.barrel", path, digest)
+
+        other = os.path.join(self.__dir.name, "other.barrel")
+        self.assertTrue(store.install(digest, other))
+
+        self.assertEqual(b"barrel", self.__read(other))
+
+    def test_install_replaces_existing_barrel(self):
+        store = BarrelStore(self.__root)
+        path = self.__write_barrel("A.barrel", b"barrel")
+        digest = hashlib.sha256(b"barrel").hexdigest()
+        store.add("owner/A", "v1.0.0", "A.barrel", path, digest)
+
+        other = self.__write_barrel("B.barrel", b"old")
+        self.assertTrue(store.install(digest, other))
+
+        self.assertEqual(b"barrel", self.__read(other))
+
+    def test_install_missing_digest(self):
+        store = BarrelStore(self.__root)
+
+        self.assertFalse(store.install("0123", os.path.join(self.__project, "x")))
+
+    def test_install_copies_when_links_are_unsupported(self):
+        store = BarrelStore(self.__root)
+        path = self.__write_barrel("A.barrel", b"barrel")
+        digest = hashlib.sha256(b"barrel").hexdigest()
+        other = os.path.join(self.__dir.name, "other.barrel")
+
+        with patch("fcntl.ioctl", side_effect=OSError), patch(
+            "os.link", side_effect=OSError
+        ):
+            store.add("owner/A", "v1.0.0", "A.barrel", path, digest)
+            self.assertTrue(store.install(digest, other))
+
+        self.assertEqual(b"barrel", self.__read(other))
+        self.assertNotEqual(os.stat(path).st_ino, os.stat(other).st_ino)
+        self.assertEqual([], [f for f in os.listdir(self.__dir.name) if ".tmp" in f])
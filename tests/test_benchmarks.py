@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+
+from benchmarks import e2e, micro
+from benchmarks.fake_github import FakeGithub
+
+
+class TestFakeGithub(unittest.TestCase):
+    def setUp(self):
+        super(TestFakeGithub, self).setUp()
+        self.__github = FakeGithub(releases=3, asset_size=100, rate_limit=2)
+        self.__github.add_repo("bench/A", "A")
+        self.__github.start()
+        self.addCleanup(self.__github.stop)
+
+    def test_lists_releases_newest_first(self):
+        response = requests.get(self.__github.url + "/repos/bench/A/releases")
+
+        self.assertEqual(
+            ["v1.0.2", "v1.0.1", "v1.0.0"], [r["tag_name"] for r in response.json()]
+        )
+        self.assertEqual("1", response.headers["X-RateLimit-Remaining"])
+
+    def test_downloads_ranges_outside_rate_limit(self):
+        release = requests.get(
+            self.__github.url + "/repos/bench/A/releases/tags/v1.0.0"
+        ).json()
+        asset = release["assets"][0]
+
+        for _ in range(3):
+            response = requests.get(
+                asset["browser_download_url"], headers={"Range": "bytes=10-"}
+            )
+            self.assertEqual(206, response.status_code)
+            self.assertEqual(asset["size"] - 10, len(response.content))
+
+        self.assertEqual(3, self.__github.stats["downloads"])
+
+    def test_exceeded_rate_limit_is_rejected(self):
+        for _ in range(2):
+            requests.get(self.__github.url + "/repos/bench/A/releases")
+
+        response = requests.get(self.__github.url + "/repos/bench/A/releases")
+
+        self.assertEqual(403, response.status_code)
+        self.assertIn("rate limit exceeded", response.json()["message"])
+        self.assertEqual(1, self.__github.stats["rate_limited"])
+
+
+class TestEndToEnd(unittest.TestCase):
+    def test_scenarios_write_results(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, "results.json")
+            e2e.main_benchmark(
+                ["--deps", "2", "--repeat", "1", "--asset-size", "100"]
+                + ["--output", output]
+            )
+
+            with open(output, "r") as f:
+                results = json.load(f)
+
+        runs = {r["scenario"]: r["runs"][0] for r in results["results"]}
+        self.assertEqual({"cold", "warm", "partial", "store"}, set(runs))
+        self.assertEqual(2, runs["cold"]["downloads"])
+        self.assertEqual(0, runs["warm"]["downloads"])
+        self.assertEqual(1, runs["partial"]["downloads"])
+        self.assertEqual(0, runs["store"]["downloads"])
+
+
+class TestMicro(unittest.TestCase):
+    def test_compare_reports_regressions_beyond_threshold(self):
+        baseline = {"a": 1.0, "b": 1.0, "c": 1.0}
+        results = {"a": 1.2, "b": 1.3, "d": 5.0}
+
+        self.assertEqual(["b"], micro.compare(results, baseline, 0.25))
+
+    def test_results_are_in_calibration_units(self):
+        seconds, units = micro.run_benchmark(lambda root: micro.calibrate, 20, 5)
+
+        self.assertGreater(seconds, 0)
+        self.assertGreater(units, 0.5)
+        self.assertLess(units, 2.0)
+
+    def test_update_baseline_then_compare(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, "baseline.json")
+            args = ["-k", "parse_packages", "--repeat", "1", "--baseline", baseline]
+
+            self.assertEqual(0, micro.main_benchmark(args + ["--update-baseline"]))
+            with open(baseline, "r") as f:
+                self.assertEqual(["parse_packages[1000]"], list(json.load(f)))
+
+            with open(baseline, "w") as f:
+                json.dump({"parse_packages[1000]": 1e-9}, f)
+            self.assertEqual(1, micro.main_benchmark(args))
@@ -29,14 +29,24 @@
 # ############################################################################ #
 
 import json
+import os
+import tempfile
 import unittest
 from io import StringIO
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, PropertyMock
 
 from mbget.dependency import Dependency
 from mbget.file_hasher import FileHasher
 from mbget.config import Config
 from mbget.cache import Cache
+from mbget.profiler import Profiler
+
+
+def build_mock_config() -> Mock:
+    mock_config = Mock(Config)
+    type(mock_config).root = PropertyMock(return_value="")
+    mock_config.relative_path.side_effect = lambda path: path
+    return mock_config
 
 
 class CacheTest(unittest.TestCase):
@@ -59,7 +69,7 @@ class CacheTest(unittest.TestCase):
         return json.dumps(cache)
 
     def test_cache_initializes_empty_if_cache_doesnt_exist(self):
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         config = {"exists.return_value": False}
         with patch("os.path", **config):
             cache = Cache(mock_config)
@@ -72,7 +82,7 @@ class CacheTest(unittest.TestCase):
         self.assertNotIn(depTest, cache)
 
     def test_cache_reads_cache_file(self):
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         config = {"exists.return_value": True}
         with patch("os.path", **config):
             Cache(mock_config)
@@ -82,7 +92,7 @@ class CacheTest(unittest.TestCase):
     def test_cache_reads_json_cache_file(self):
         fake_cache = StringIO(self.__build_fake_cache())
 
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
         mock_config.configure_mock(**attr)
 
@@ -90,19 +100,18 @@ class CacheTest(unittest.TestCase):
         hash_attr = {"match.return_value": True}
         mock_hasher.configure_mock(**hash_attr)
 
-        config = {"exists.return_value": True}
-        with patch("os.path", **config):
-            cache = Cache(mock_config, mock_hasher)
-
         depTest = Dependency("Depend")
         depTest.set_version("0.1.2")
 
-        self.assertTrue(depTest in cache)
+        config = {"exists.return_value": True}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+            self.assertTrue(depTest in cache)
 
     def test_cache_does_not_contain_uncached(self):
         fake_cache = StringIO(self.__build_fake_cache())
 
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
         mock_config.configure_mock(**attr)
 
@@ -119,8 +128,32 @@ class CacheTest(unittest.TestCase):
 
         self.assertFalse(depTest in cache)
 
+    def test_cache_counts_hits_and_misses_once_per_package(self):
+        fake_cache = StringIO(self.__build_fake_cache())
+
+        mock_config = build_mock_config()
+        attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
+        mock_config.configure_mock(**attr)
+
+        mock_hasher = Mock(FileHasher)
+        mock_hasher.configure_mock(**{"match.return_value": True})
+
+        profiler = Profiler()
+        config = {"exists.return_value": True}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher, profiler)
+
+            for name in ["Depend", "Depend", "Depend2"]:
+                dep = Dependency(name)
+                dep.set_version("0.1.2")
+                self.assertEqual(name == "Depend", dep in cache)
+
+        counters = profiler.report()["counters"]
+        self.assertEqual({"cache_hits": 1, "cache_misses": 1}, counters)
+        self.assertEqual(1, profiler.report()["phases"]["hash"]["calls"])
+
     def test_can_add_dependency(self):
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
 
         mock_hasher = Mock(FileHasher)
         hash_attr = {"hash_file.return_value": "0123"}
@@ -137,10 +170,46 @@ class CacheTest(unittest.TestCase):
         cache.add_dependency(depTest)
         self.assertIn(depTest, cache)
 
+    def test_add_dependency_uses_known_hash(self):
+        mock_config = build_mock_config()
+        mock_hasher = Mock(FileHasher)
+
+        config = {"exists.return_value": False}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+
+        depTest = Dependency("Depend2")
+        depTest.set_version("0.1.2")
+        depTest.set_barrel_name("test.barrel")
+        depTest.set_barrel_hash("4567")
+
+        cache.add_dependency(depTest)
+
+        mock_hasher.hash_file.assert_not_called()
+        self.assertEqual("4567", cache.cache["Depend2"]["hash"])
+
+    def test_add_dependency_records_resolved_tag(self):
+        mock_config = build_mock_config()
+        mock_hasher = Mock(FileHasher)
+
+        config = {"exists.return_value": False}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+
+        depTest = Dependency("Depend2")
+        depTest.set_version("0")
+        depTest.set_barrel_name("test.barrel")
+        depTest.set_barrel_hash("4567")
+        depTest.set_resolved_tag("v0.1.2")
+
+        cache.add_dependency(depTest)
+
+        self.assertEqual("v0.1.2", cache.get_tag_for_package(depTest))
+
     def test_can_overwrite_dependency(self):
         fake_cache = StringIO(self.__build_fake_cache())
 
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
         mock_config.configure_mock(**attr)
 
@@ -148,14 +217,14 @@ class CacheTest(unittest.TestCase):
         hash_attr = {"hash_file.return_value": "0123"}
         mock_hasher.configure_mock(**hash_attr)
 
+        depTest = Dependency("Depend")
+        depTest.set_version("0.1.2")
+
         config = {"exists.return_value": True}
         with patch("os.path", **config):
             cache = Cache(mock_config, mock_hasher)
-
-        depTest = Dependency("Depend")
-        depTest.set_version("0.1.2")
-        self.assertIn(depTest, cache)
-        self.assertNotEqual("test3.barrel", cache.get_barrel_for_package(depTest))
+            self.assertIn(depTest, cache)
+            self.assertNotEqual("test3.barrel", cache.get_barrel_for_package(depTest))
 
         depTest.set_barrel_name("test3.barrel")
         cache.add_dependency(depTest)
@@ -165,7 +234,7 @@ class CacheTest(unittest.TestCase):
     def test_corrupt_barrel_not_in_cache(self):
         fake_cache = StringIO(self.__build_fake_cache())
 
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
         mock_config.configure_mock(**attr)
 
@@ -185,7 +254,7 @@ class CacheTest(unittest.TestCase):
     def test_removed_barrel_not_in_cache(self):
         fake_cache = StringIO(self.__build_fake_cache(2))
 
-        mock_config = Mock(Config)
+        mock_config = build_mock_config()
         attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
         mock_config.configure_mock(**attr)
 
@@ -193,15 +262,258 @@ class CacheTest(unittest.TestCase):
         hash_attr = {"match.return_value": True}
         mock_hasher.configure_mock(**hash_attr)
 
-        config = {"exists.side_effect": lambda x: {"test0.barrel": False}.get(x, True)}
-        with patch("os.path", **config):
-            cache = Cache(mock_config, mock_hasher)
-
         dep1Test = Dependency("Depend0")
         dep1Test.set_version("0.1.2")
 
         dep2Test = Dependency("Depend1")
         dep2Test.set_version("0.1.2")
 
-        self.assertIn(dep2Test, cache)
-        self.assertNotIn(dep1Test, cache)
+        config = {"exists.side_effect": lambda x: {"test0.barrel": False}.get(x, True)}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+            self.assertIn(dep2Test, cache)
+            self.assertNotIn(dep1Test, cache)
+
+    def test_unreferenced_entries_are_not_validated(self):
+        fake_cache = StringIO(self.__build_fake_cache(3))
+
+        mock_config = build_mock_config()
+        attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
+        mock_config.configure_mock(**attr)
+
+        mock_hasher = Mock(FileHasher)
+        hash_attr = {"match.return_value": True}
+        mock_hasher.configure_mock(**hash_attr)
+
+        depTest = Dependency("Depend1")
+        depTest.set_version("0.1.2")
+
+        config = {"exists.return_value": True}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+            mock_hasher.match.assert_not_called()
+
+            self.assertIn(depTest, cache)
+
+        mock_hasher.match.assert_called_once_with("test1.barrel", "012345")
+        self.assertIn("Depend0", cache.cache)
+        self.assertIn("Depend2", cache.cache)
+
+    def test_entries_are_validated_once(self):
+        fake_cache = StringIO(self.__build_fake_cache())
+
+        mock_config = build_mock_config()
+        attr = {"open_file.side_effect": lambda name, mode, cb: cb(fake_cache)}
+        mock_config.configure_mock(**attr)
+
+        mock_hasher = Mock(FileHasher)
+        hash_attr = {"match.return_value": True}
+        mock_hasher.configure_mock(**hash_attr)
+
+        depTest = Dependency("Depend")
+        depTest.set_version("0.1.2")
+
+        config = {"exists.return_value": True}
+        with patch("os.path", **config):
+            cache = Cache(mock_config, mock_hasher)
+            self.assertIn(depTest, cache)
+            self.assertIn(depTest, cache)
+            self.assertEqual("test.barrel", cache.get_barrel_for_package(depTest))
+
+        mock_hasher.match.assert_called_once()
+
+
+class CacheVerifyTest(unittest.TestCase):
+    def setUp(self):
+        super(CacheVerifyTest, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+
+        self.__barrel = os.path.join(self.__dir.name, "test.barrel")
+        with open(self.__barrel, "wb") as f:
+            f.write(b"barrel")
+
+        self.__hasher = Mock(wraps=FileHasher())
+
+    def __build_config(self, verify: str) -> Mock:
+        mock_config = build_mock_config()
+        type(mock_config).verify = PropertyMock(return_value=verify)
+        type(mock_config).barrel_dir = PropertyMock(return_value=self.__dir.name)
+        mock_config.open_file.side_effect = Config.open_file
+        mock_config.replace_file.side_effect = Config.replace_file
+        return mock_config
+
+    def __build_cache(self, verify: str) -> Cache:
+        return Cache(self.__build_config(verify), self.__hasher)
+
+    def __populate_cache(self) -> Dependency:
+        dep = Dependency("Depend")
+        dep.set_version("0.1.2")
+        dep.set_barrel_name(self.__barrel)
+
+        cache = self.__build_cache("stat")
+        cache.add_dependency(dep)
+        cache.write_cache()
+        self.__hasher.reset_mock()
+        return dep
+
+    def test_stat_skips_hash_for_unchanged_barrel(self):
+        dep = self.__populate_cache()
+
+        cache = self.__build_cache("stat")
+
+        self.assertIn(dep, cache)
+        self.__hasher.match.assert_not_called()
+
+    def test_stat_rehashes_touched_barrel(self):
+        dep = self.__populate_cache()
+        st = os.stat(self.__barrel)
+        os.utime(self.__barrel, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+
+        cache = self.__build_cache("stat")
+
+        self.assertIn(dep, cache)
+        self.__hasher.match.assert_called_once()
+
+    def test_stat_refreshes_metadata_of_touched_barrel(self):
+        dep = self.__populate_cache()
+        st = os.stat(self.__barrel)
+        os.utime(self.__barrel, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+
+        cache = self.__build_cache("stat")
+        self.assertIn(dep, cache)
+        cache.write_cache()
+        self.__hasher.reset_mock()
+        cache = self.__build_cache("stat")
+
+        self.assertIn(dep, cache)
+        self.__hasher.match.assert_not_called()
+
+    def test_stat_rejects_modified_barrel(self):
+        dep = self.__populate_cache()
+        with open(self.__barrel, "ab") as f:
+            f.write(b"corrupt")
+
+        cache = self.__build_cache("stat")
+
+        self.assertNotIn(dep, cache)
+
+    def test_full_always_hashes(self):
+        dep = self.__populate_cache()
+
+        cache = self.__build_cache("full")
+
+        self.assertIn(dep, cache)
+        self.__hasher.match.assert_called_once()
+
+    def test_none_never_hashes(self):
+        dep = self.__populate_cache()
+        with open(self.__barrel, "ab") as f:
+            f.write(b"corrupt")
+
+        cache = self.__build_cache("none")
+
+        self.assertIn(dep, cache)
+        self.__hasher.match.assert_not_called()
+
+    def test_unmodified_cache_is_not_rewritten(self):
+        self.__populate_cache()
+        config = self.__build_config("stat")
+
+        Cache(config, self.__hasher).write_cache()
+
+        self.assertNotIn("w", [c[0][1] for c in config.open_file.call_args_list])
+
+
+class CacheTransactionTest(unittest.TestCase):
+    def setUp(self):
+        super(CacheTransactionTest, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+        self.__cache_file = os.path.join(self.__dir.name, ".mbgetcache")
+
+    def __build_cache(self) -> Cache:
+        mock_config = build_mock_config()
+        type(mock_config).verify = PropertyMock(return_value="stat")
+        type(mock_config).barrel_dir = PropertyMock(return_value=self.__dir.name)
+        mock_config.open_file.side_effect = Config.open_file
+        mock_config.replace_file.side_effect = Config.replace_file
+        return Cache(mock_config)
+
+    def __build_dependency(self, name: str) -> Dependency:
+        barrel = os.path.join(self.__dir.name, "{}.barrel".format(name))
+        with open(barrel, "wb") as f:
+            f.write(name.encode())
+
+        dep = Dependency(name)
+        dep.set_version("0.1.2")
+        dep.set_barrel_name(barrel)
+        return dep
+
+    def __read_lines(self):
+        with open(self.__cache_file, "r") as f:
+            return f.read().splitlines()
+
+    def test_transaction_commits_snapshot(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(3)]
+
+        cache = self.__build_cache()
+        with cache.transaction():
+            for dep in deps:
+                cache.add_dependency(dep)
+
+        lines = self.__read_lines()
+        self.assertEqual(1, len(lines))
+        self.assertEqual(3, len(json.loads(lines[0])))
+        barrel_dir = os.path.dirname(self.__cache_file)
+        self.assertEqual([], [f for f in os.listdir(barrel_dir) if ".tmp" in f])
+
+    def test_transaction_journals_each_dependency(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(2)]
+
+        cache = self.__build_cache()
+        with cache.transaction():
+            cache.add_dependency(deps[0])
+            self.assertEqual(1, len([x for x in self.__read_lines() if x]))
+            cache.add_dependency(deps[1])
+            self.assertEqual(2, len([x for x in self.__read_lines() if x]))
+
+    def test_interrupted_transaction_keeps_finished_dependencies(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(2)]
+
+        cache = self.__build_cache()
+        with patch.object(cache, "write_cache"):
+            with cache.transaction():
+                cache.add_dependency(deps[0])
+
+        cache = self.__build_cache()
+        self.assertIn(deps[0], cache)
+        self.assertNotIn(deps[1], cache)
+
+    def test_journal_is_replayed_over_snapshot(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(2)]
+        cache = self.__build_cache()
+        with cache.transaction():
+            cache.add_dependency(deps[0])
+
+        cache = self.__build_cache()
+        with patch.object(cache, "write_cache"):
+            with cache.transaction():
+                cache.add_dependency(deps[1])
+
+        cache = self.__build_cache()
+        self.assertIn(deps[0], cache)
+        self.assertIn(deps[1], cache)
+
+    def test_torn_journal_record_is_ignored(self):
+        dep = self.__build_dependency("Depend")
+        cache = self.__build_cache()
+        with patch.object(cache, "write_cache"):
+            with cache.transaction():
+                cache.add_dependency(dep)
+
+        with open(self.__cache_file, "a") as f:
+            f.write('\n["Depend2", {"asset": ')
+
+        cache = self.__build_cache()
+        self.assertIn(dep, cache)
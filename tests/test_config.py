@@ -27,10 +27,13 @@
 # IN THE SOFTWARE.                                                             #
 #                                                                              #
 # ############################################################################ #
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open, Mock
 
 from mbget.config import Config
+from mbget.errors import Error
 
 
 class MicroMock(object):
@@ -47,6 +50,8 @@ class TestConfig(unittest.TestCase):
         jungle=None,
         manifest=None,
         config=None,
+        jobs=None,
+        verify=None,
     ):
         return MicroMock(
             token=token,
@@ -55,10 +60,19 @@ class TestConfig(unittest.TestCase):
             jungle=jungle,
             manifest=manifest,
             config=config,
+            jobs=jobs,
+            verify=verify,
         )
 
     @staticmethod
-    def __build_cfg(package=None, directory=None, jungle=None, manifest=None) -> str:
+    def __build_cfg(
+        package=None,
+        directory=None,
+        jungle=None,
+        manifest=None,
+        jobs=None,
+        verify=None,
+    ) -> str:
         rv = "[mbget]\n"
 
         if package is not None:
@@ -73,6 +87,12 @@ class TestConfig(unittest.TestCase):
         if manifest is not None:
             rv += "manifest = {}\n".format(manifest)
 
+        if jobs is not None:
+            rv += "jobs = {}\n".format(jobs)
+
+        if verify is not None:
+            rv += "verify = {}\n".format(verify)
+
         return rv
 
     def setUp(self):
@@ -101,6 +121,38 @@ class TestConfig(unittest.TestCase):
 
         m.assert_called_once_with("test.ini", "r")
 
+    def test_reads_default_config_file_from_root(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="")
+        with patch("builtins.open", m):
+            Config(self.__build_args(), os.path.join("apps", "watch"))
+
+        m.assert_called_once_with(os.path.join("apps", "watch", "mbgetcfg.ini"), "r")
+
+    def test_paths_are_relative_to_root(self):
+        root = os.path.join("apps", "watch")
+        cfg = Config(self.__build_args(directory="barrels"), root)
+
+        self.assertEqual(os.path.join(root, "barrels"), cfg.barrel_dir)
+        self.assertEqual(os.path.join(root, "packages.txt"), cfg.package)
+        self.assertEqual(os.path.join(root, "manifest.xml"), cfg.manifest)
+        self.assertEqual(os.path.join(root, "barrels.jungle"), cfg.jungle)
+
+    def test_relative_path_strips_root(self):
+        root = os.path.join("apps", "watch")
+        cfg = Config(self.__build_args(), root)
+
+        self.assertEqual(
+            os.path.join(".mbpkg", "A.barrel"),
+            cfg.relative_path(os.path.join(cfg.barrel_dir, "A.barrel")),
+        )
+
+    def test_relative_path_keeps_absolute_paths(self):
+        cfg = Config(self.__build_args(), "watch")
+        path = os.path.abspath("A.barrel")
+
+        self.assertEqual(path, cfg.relative_path(path))
+
     def test_token_is_none(self):
         cfg = Config(self.__build_args(token=None))
         self.assertIsNone(cfg.token)
@@ -183,6 +235,148 @@ class TestConfig(unittest.TestCase):
 
         self.assertEqual("man.xml", cfg.manifest)
 
+    def test_default_jobs_is_valid(self):
+        cfg = Config(self.__build_args())
+        self.assertEqual(4, cfg.jobs)
+
+    def test_jobs_is_valid(self):
+        cfg = Config(self.__build_args(jobs=8))
+        self.assertEqual(8, cfg.jobs)
+
+    def test_jobs_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data=self.__build_cfg(jobs="2"))
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual(2, cfg.jobs)
+
+    def test_jobs_is_at_least_one(self):
+        cfg = Config(self.__build_args(jobs=0))
+        self.assertEqual(1, cfg.jobs)
+
+    def test_default_pool_size_matches_jobs(self):
+        cfg = Config(self.__build_args(jobs=6))
+        self.assertEqual(6, cfg.pool_size)
+
+    def test_pool_size_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\npool_size = 12\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual(12, cfg.pool_size)
+
+    def test_default_rate_limit_wait_is_valid(self):
+        cfg = Config(self.__build_args())
+        self.assertEqual(3600, cfg.rate_limit_wait)
+
+    def test_rate_limit_wait_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\nrate_limit_wait = 0\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual(0, cfg.rate_limit_wait)
+
+    def test_default_retries_and_segments_are_valid(self):
+        cfg = Config(self.__build_args())
+        self.assertEqual(3, cfg.retries)
+        self.assertEqual(1, cfg.segments)
+
+    def test_segments_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\nsegments = 4\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual(4, cfg.segments)
+
+    def test_default_api_url_is_github(self):
+        cfg = Config(self.__build_args())
+        self.assertEqual("https://api.github.com", cfg.api_url)
+
+    def test_api_url_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\napi_url = https://ghe/api/v3\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual("https://ghe/api/v3", cfg.api_url)
+
+    def test_default_store_dir_is_in_user_cache(self):
+        with patch.dict("os.environ", {"XDG_CACHE_HOME": "/cache"}):
+            cfg = Config(self.__build_args())
+            self.assertEqual(os.path.join("/cache", "mbget", "store"), cfg.store_dir)
+
+    def test_store_dir_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\nstore = /barrels\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual("/barrels", cfg.store_dir)
+
+    def test_store_can_be_disabled(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\nstore = none\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertIsNone(cfg.store_dir)
+
+    def test_metrics_are_disabled_by_default(self):
+        cfg = Config(self.__build_args())
+        self.assertIsNone(cfg.metrics_file)
+        self.assertIsNone(cfg.statsd)
+        self.assertEqual("mbget", cfg.metrics_prefix)
+
+    def test_metrics_from_cfg_are_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(
+            read_data="[mbget]\nmetrics_file = /metrics/mbget.prom\n"
+            "statsd = statsd.local:9125\nmetrics_prefix = ci\n"
+        )
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual("/metrics/mbget.prom", cfg.metrics_file)
+        self.assertEqual(("statsd.local", 9125), cfg.statsd)
+        self.assertEqual("ci", cfg.metrics_prefix)
+
+    def test_statsd_port_defaults_to_8125(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data="[mbget]\nstatsd = localhost\n")
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual(("localhost", 8125), cfg.statsd)
+
+    def test_default_verify_is_stat(self):
+        cfg = Config(self.__build_args())
+        self.assertEqual("stat", cfg.verify)
+
+    def test_verify_is_valid(self):
+        cfg = Config(self.__build_args(verify="full"))
+        self.assertEqual("full", cfg.verify)
+
+    def test_verify_from_cfg_is_valid(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data=self.__build_cfg(verify="none"))
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        self.assertEqual("none", cfg.verify)
+
+    def test_invalid_verify_raises(self):
+        self.__mock_path.return_value = True
+        m = mock_open(read_data=self.__build_cfg(verify="sometimes"))
+        with patch("builtins.open", m):
+            cfg = Config(self.__build_args())
+
+        with self.assertRaises(Error):
+            cfg.verify
+
     def test_prepare_builds_output_dir_if_not_exists(self):
         cfg = Config(self.__build_args(directory="barrels"))
 
@@ -216,6 +410,49 @@ class TestConfig(unittest.TestCase):
                 "mockfile", "r", lambda f: self.assertEqual("A Test file", f.readline())
             )
 
+    def test_replace_file_replaces_contents(self):
+        cfg = Config(self.__build_args())
+
+        with tempfile.TemporaryDirectory() as d:
+            name = os.path.join(d, "file.txt")
+            cfg.open_file(name, "w", lambda f: f.write("old"))
+            cfg.replace_file(name, "w", lambda f: f.write("new"))
+
+            self.assertEqual(["file.txt"], os.listdir(d))
+            cfg.open_file(name, "r", lambda f: self.assertEqual("new", f.read()))
+
+    def test_replace_file_keeps_original_on_failure(self):
+        cfg = Config(self.__build_args())
+
+        def fail(f):
+            f.write("partial")
+            raise OSError("disk full")
+
+        with tempfile.TemporaryDirectory() as d:
+            name = os.path.join(d, "file.txt")
+            cfg.open_file(name, "w", lambda f: f.write("old"))
+            with self.assertRaises(OSError):
+                cfg.replace_file(name, "w", fail)
+
+            cfg.open_file(name, "r", lambda f: self.assertEqual("old", f.read()))
+            self.assertEqual(["file.txt"], os.listdir(d))
+
+    def test_concurrent_replace_file_writers_do_not_collide(self):
+        cfg = Config(self.__build_args())
+
+        with tempfile.TemporaryDirectory() as d:
+            name = os.path.join(d, "file.txt")
+
+            def write_first(f):
+                # A second writer replaces the file while the first one writes
+                cfg.replace_file(name, "w", lambda g: g.write("second"))
+                f.write("first")
+
+            cfg.replace_file(name, "w", write_first)
+
+            self.assertEqual(["file.txt"], os.listdir(d))
+            cfg.open_file(name, "r", lambda f: self.assertEqual("first", f.read()))
+
     def test_open_file_can_write(self):
         cfg = Config(self.__build_args())
         m = mock_open()
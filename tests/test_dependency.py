@@ -57,6 +57,12 @@ class TestDependency(unittest.TestCase):
 
         self.assertEqual("x.barrel", dep.barrel_name)
 
+    def test_dependency_can_get_barrel_hash(self):
+        dep = Dependency("Depend")
+        dep.set_barrel_hash("0123")
+
+        self.assertEqual("0123", dep.barrel_hash)
+
     def test_dependecy_eq_with_self(self):
         dep = Dependency("Depend")
         dep.set_version("1.2.3")
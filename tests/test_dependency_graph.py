@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest.mock import MagicMock, patch
+
+from mbget.dependency import Dependency
+from mbget.dependency_graph import DependencyGraph
+from mbget.errors import UpdateError
+from mbget.manifest import Manifest
+from mbget.project import Project
+
+
+def build_manifest(depends: dict) -> str:
+    manifest = (
+        '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+        "<iq:barrel><iq:barrels>"
+    )
+    for name, version in depends.items():
+        manifest += '<iq:depends name="{name}" version="{version}"/>'.format(
+            name=name, version=version
+        )
+    return manifest + "</iq:barrels></iq:barrel></iq:manifest>"
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        super(TestDependencyGraph, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+
+    def __build_dependency(self, name: str, version: str, depends=None) -> Dependency:
+        dep = Dependency(name)
+        dep.set_version(version)
+        dep.set_repo("owner/{}".format(name))
+
+        if depends is not None:
+            path = os.path.join(self.__dir.name, "{}.barrel".format(name))
+            with zipfile.ZipFile(path, "w") as barrel:
+                barrel.writestr("manifest.xml", build_manifest(depends))
+            dep.set_barrel_name(path)
+
+        return dep
+
+    def __build_project(self, deps) -> MagicMock:
+        mock_project = MagicMock(Project)
+        mock_project.dependencies = {dep.package_name: dep for dep in deps}
+
+        def require(name, version):
+            dep = self.__build_dependency(name, version)
+            mock_project.dependencies[name] = dep
+            return dep
+
+        mock_project.require.side_effect = require
+        return mock_project
+
+    def test_read_depends_of_barrel(self):
+        dep = self.__build_dependency("A", "1.0", {"B": "2.1", "C": "1"})
+        graph = DependencyGraph(self.__build_project([dep]))
+
+        self.assertEqual([("B", "2.1"), ("C", "1")], graph.read_depends(dep))
+
+    def test_read_depends_of_barrel_without_manifest(self):
+        dep = self.__build_dependency("A", "1.0")
+        dep.set_barrel_name(os.path.join(self.__dir.name, "missing.barrel"))
+        graph = DependencyGraph(self.__build_project([dep]))
+
+        self.assertEqual([], graph.read_depends(dep))
+
+    def test_read_depends_reads_each_node_once(self):
+        dep = self.__build_dependency("A", "1.0", {"B": "2.1"})
+        graph = DependencyGraph(self.__build_project([dep]))
+
+        with patch.object(Manifest, "from_barrel", wraps=Manifest.from_barrel) as read:
+            graph.read_depends(dep)
+            graph.read_depends(dep)
+
+        read.assert_called_once_with(dep.barrel_name)
+
+    def test_next_layer_requires_new_packages(self):
+        a = self.__build_dependency("A", "1.0")
+        b = self.__build_dependency("B", "1.0")
+        project = self.__build_project([a, b])
+        graph = DependencyGraph(project)
+
+        layer = graph.next_layer([a, b], [[("C", "2.0")], [("C", "2"), ("A", "1")]])
+
+        self.assertEqual(["C"], [dep.package_name for dep in layer])
+        self.assertEqual("2.0", str(layer[0].version))
+        project.require.assert_called_once_with("C", "2.0")
+
+    def test_next_layer_narrows_new_requirements(self):
+        a = self.__build_dependency("A", "1.0")
+        b = self.__build_dependency("B", "1.0")
+        graph = DependencyGraph(self.__build_project([a, b]))
+
+        layer = graph.next_layer([a, b], [[("C", "2")], [("C", "2.1.3")]])
+
+        self.assertEqual("2.1.3", str(layer[0].version))
+
+    def test_next_layer_rejects_conflicting_requirements(self):
+        a = self.__build_dependency("A", "1.0")
+        b = self.__build_dependency("B", "1.0")
+        graph = DependencyGraph(self.__build_project([a, b]))
+
+        with self.assertRaises(UpdateError) as ctx:
+            graph.next_layer([a, b], [[("C", "2.0")], [("C", "3.0")]])
+
+        self.assertIn("A requires 2.0", ctx.exception.message)
+        self.assertIn("B requires 3.0", ctx.exception.message)
+
+    def test_next_layer_rejects_conflict_with_installed_package(self):
+        a = self.__build_dependency("A", "1.0")
+        b = self.__build_dependency("B", "1.0.2")
+        graph = DependencyGraph(self.__build_project([a, b]))
+
+        with self.assertRaises(UpdateError) as ctx:
+            graph.next_layer([a], [[("B", "1.1")]])
+
+        self.assertIn(DependencyGraph.APPLICATION, ctx.exception.message)
+
+    def test_next_layer_accepts_requirement_met_by_installed_release(self):
+        a = self.__build_dependency("A", "1.0")
+        lib = self.__build_dependency("Lib", "1")
+        lib.set_resolved_tag("1.5.0")
+        project = self.__build_project([a, lib])
+        graph = DependencyGraph(project)
+
+        # The application's partial requirement is narrowed by the barrel
+        self.assertEqual([], graph.next_layer([a], [[("Lib", "1.5")]]))
+        project.require.assert_not_called()
+
+    def test_next_layer_rejects_requirement_not_met_by_installed_release(self):
+        a = self.__build_dependency("A", "1.0")
+        lib = self.__build_dependency("Lib", "1")
+        lib.set_resolved_tag("v1.4.0")
+        graph = DependencyGraph(self.__build_project([a, lib]))
+
+        with self.assertRaises(UpdateError) as ctx:
+            graph.next_layer([a], [[("Lib", "1.5")]])
+
+        self.assertIn("installed as v1.4.0", ctx.exception.message)
+        self.assertIn("A requires 1.5", ctx.exception.message)
+
+    def test_next_layer_is_empty_without_new_packages(self):
+        a = self.__build_dependency("A", "1.0")
+        graph = DependencyGraph(self.__build_project([a]))
+
+        self.assertEqual([], graph.next_layer([a], [[]]))
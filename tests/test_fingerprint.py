@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from mbget.config import Config
+from mbget.fingerprint import Fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        super(TestFingerprint, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+        self.__root = self.__dir.name
+
+        self.__config = Mock(Config)
+        self.__config.manifest = self.__path("manifest.xml")
+        self.__config.package = self.__path("packages.txt")
+        self.__config.jungle = self.__path("barrels.jungle")
+        self.__config.barrel_dir = self.__path("barrels")
+        self.__config.store_dir = None
+        self.__config.api_url = "https://api.github.com"
+        self.__config.verify = "stat"
+        self.__config.replace_file.side_effect = Config.replace_file
+
+        self.__write("manifest.xml", "<manifest/>")
+        self.__write("packages.txt", "LibraryA=>foo/bar")
+        self.__write("barrels.jungle", "base.barrelPath = barrels/A.barrel")
+        os.mkdir(self.__config.barrel_dir)
+        self.__write(os.path.join("barrels", "A.barrel"), "barrel")
+        self.__write(os.path.join("barrels", ".mbgetcache"), "{}")
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__root, name)
+
+    def __write(self, name: str, content: str) -> None:
+        with open(self.__path(name), "w") as f:
+            f.write(content)
+
+    def __stamp(self, mode: str = "update") -> Fingerprint:
+        fingerprint = Fingerprint(self.__config, mode)
+        fingerprint.write(fingerprint.read_inputs())
+        return fingerprint
+
+    def test_no_stamp_is_not_current(self):
+        self.assertFalse(Fingerprint(self.__config, "update").is_current())
+
+    def test_stamp_is_current_while_nothing_changes(self):
+        fingerprint = self.__stamp()
+
+        self.assertTrue(fingerprint.is_current())
+        self.assertTrue(
+            os.path.isfile(os.path.join(self.__config.barrel_dir, ".mbgetstamp"))
+        )
+
+    def test_editing_an_input_invalidates_the_stamp(self):
+        fingerprint = self.__stamp()
+
+        self.__write("packages.txt", "LibraryA=>foo/baz")
+
+        self.assertFalse(fingerprint.is_current())
+
+    def test_removing_a_barrel_invalidates_the_stamp(self):
+        fingerprint = self.__stamp()
+
+        os.remove(self.__path(os.path.join("barrels", "A.barrel")))
+
+        self.assertFalse(fingerprint.is_current())
+
+    def test_updating_the_cache_invalidates_the_stamp(self):
+        fingerprint = self.__stamp()
+
+        self.__write(os.path.join("barrels", ".mbgetcache"), '{"LibraryA": {}}')
+
+        self.assertFalse(fingerprint.is_current())
+
+    def test_config_and_mode_are_part_of_the_stamp(self):
+        self.__stamp()
+        self.assertFalse(Fingerprint(self.__config, "frozen").is_current())
+
+        self.__config.api_url = "https://ghe/api/v3"
+        self.assertFalse(Fingerprint(self.__config, "update").is_current())
+
+    def test_inputs_are_stamped_as_read_before_the_update(self):
+        fingerprint = Fingerprint(self.__config, "update")
+        inputs = fingerprint.read_inputs()
+
+        # The manifest is edited while the update runs
+        self.__write("manifest.xml", "<manifest version='2'/>")
+        fingerprint.write(inputs)
+
+        self.assertFalse(fingerprint.is_current())
+
+    def test_full_verification_is_never_skipped(self):
+        self.__config.verify = "full"
+
+        fingerprint = self.__stamp()
+
+        self.assertFalse(fingerprint.is_current())
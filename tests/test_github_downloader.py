@@ -0,0 +1,658 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from typing import Optional
+from unittest.mock import patch, call, ANY, MagicMock, Mock, PropertyMock
+
+import requests
+from github import RateLimitExceededException, UnknownObjectException
+
+from mbget.config import Config
+from mbget.dependency import Dependency
+from mbget.errors import Error
+from mbget.github_downloader import GithubDownloader
+from mbget.profiler import Profiler
+from mbget.rate_limiter import RateLimiter
+from mbget.release_index import ReleaseIndex
+from mbget.tracing import Tracer
+
+
+class TestGithubDownloader(unittest.TestCase):
+    @staticmethod
+    def __build_dependency() -> Dependency:
+        dep = Dependency("Depend")
+        dep.set_version("1.0.0")
+        dep.set_repo("owner/Depend")
+        return dep
+
+    @staticmethod
+    def __build_release(
+        release_id: int,
+        tag: str,
+        asset_name: str = "Depend.barrel",
+        digest: Optional[str] = None,
+    ) -> Mock:
+        asset = Mock()
+        asset.id = release_id * 10
+        asset.name = asset_name
+        asset.url = "https://api.github.com/assets/{}".format(asset.id)
+        asset.browser_download_url = "https://github.com/download/{}".format(asset_name)
+        asset.size = 6
+        asset._rawData = {} if digest is None else {"digest": digest}
+
+        release = Mock()
+        release.id = release_id
+        release.tag_name = tag
+        release.published_at = None
+        release.assets = [asset]
+        release._headers = {"x-ratelimit-remaining": "59", "x-ratelimit-limit": "60"}
+        return release
+
+    def __build_index(self) -> ReleaseIndex:
+        mock_config = Mock(Config)
+        type(mock_config).barrel_dir = PropertyMock(return_value=self.__index_dir.name)
+        mock_config.open_file.side_effect = Config.open_file
+        mock_config.replace_file.side_effect = Config.replace_file
+        return ReleaseIndex(mock_config)
+
+    def __build_downloader(self, token: Optional[str] = None) -> GithubDownloader:
+        return GithubDownloader(self.__build_index(), token)
+
+    def __set_releases(self, releases) -> Mock:
+        def get_page(page):
+            first = page * GithubDownloader.PER_PAGE
+            return releases[first : first + GithubDownloader.PER_PAGE]  # noqa: E203
+
+        repo = self.__github.return_value.get_repo.return_value
+        repo.get_releases.return_value.get_page.side_effect = get_page
+        return repo
+
+    def __set_tagged_releases(self, releases) -> Mock:
+        by_tag = {r.tag_name: r for r in releases}
+
+        def get_release(tag):
+            if tag not in by_tag:
+                raise UnknownObjectException(404, {"message": "Not Found"}, {})
+            return by_tag[tag]
+
+        repo = self.__github.return_value.get_repo.return_value
+        repo.get_release.side_effect = get_release
+        return repo
+
+    @staticmethod
+    def __build_response(chunks, status_code=200) -> MagicMock:
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.status_code = status_code
+        response.iter_content.return_value = chunks
+        return response
+
+    def setUp(self):
+        super(TestGithubDownloader, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+        self.__index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__index_dir.cleanup)
+
+        pat = patch("mbget.github_downloader.Github")
+        self.__github = pat.start()
+        self.addCleanup(pat.stop)
+        # The quota is only ever read from the responses
+        type(self.__github.return_value).rate_limiting = PropertyMock(
+            side_effect=AssertionError("GET /rate_limit")
+        )
+
+        self.__set_releases(
+            [self.__build_release(2, "v1.1.0"), self.__build_release(1, "v1.0.0")]
+        )
+        self.__set_tagged_releases([])
+
+        pat = patch("mbget.github_downloader.requests.Session")
+        self.__session = pat.start()
+        self.__get = self.__session.return_value.get
+        self.addCleanup(pat.stop)
+
+    def test_download_streams_barrel_to_directory(self):
+        self.__get.return_value = self.__build_response([b"abc", b"def"])
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("Depend.barrel", asset.name)
+        self.assertEqual("v1.0.0", str(asset.version))
+        self.assertEqual(os.path.join(self.__dir.name, "Depend.barrel"), asset.path)
+        with open(asset.path, "rb") as f:
+            self.assertEqual(b"abcdef", f.read())
+
+    def test_download_hashes_barrel(self):
+        self.__get.return_value = self.__build_response([b"abc", b"def"])
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual(hashlib.sha256(b"abcdef").hexdigest(), asset.hash)
+
+    def test_download_verifies_published_digest(self):
+        digest = "sha256:" + hashlib.sha256(b"abcdef").hexdigest()
+        self.__set_releases([self.__build_release(1, "v1.0.0", digest=digest)])
+        self.__get.return_value = self.__build_response([b"abc", b"def"])
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual(hashlib.sha256(b"abcdef").hexdigest(), asset.hash)
+
+    def test_digest_mismatch_raises_and_leaves_no_file(self):
+        digest = "sha256:" + hashlib.sha256(b"other").hexdigest()
+        self.__set_releases([self.__build_release(1, "v1.0.0", digest=digest)])
+        self.__get.return_value = self.__build_response([b"abc", b"def"])
+
+        with self.assertRaises(Error):
+            self.__build_downloader().download_barrel(
+                self.__build_dependency(), self.__dir.name
+            )
+
+        self.assertEqual([], os.listdir(self.__dir.name))
+
+    def test_download_requests_stream(self):
+        self.__get.return_value = self.__build_response([b"abc"])
+
+        self.__build_downloader("token").download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        _, kwargs = self.__get.call_args
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual("token token", kwargs["headers"]["Authorization"])
+
+    def test_requests_and_transfer_are_traced(self):
+        self.__get.return_value = self.__build_response([b"abc", b"def"])
+        spans = []
+        tracer = Tracer()
+        tracer.add_callback(spans.append)
+
+        GithubDownloader(self.__build_index(), "token", tracer=tracer).download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        # The tag lookups find no release, so the releases are listed
+        self.assertEqual(
+            [
+                ("get release", "api"),
+                ("get release", "api"),
+                ("list releases", "api"),
+                ("GET asset", "api"),
+                ("transfer", "transfer"),
+            ],
+            [(span.name, span.category) for span in spans],
+        )
+        self.assertEqual(200, spans[3].args["status"])
+        self.assertEqual(6, spans[4].args["bytes"])
+
+    def test_anonymous_download_uses_browser_url(self):
+        self.__get.return_value = self.__build_response([b"abc"])
+
+        self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        args, kwargs = self.__get.call_args
+        self.assertEqual(("https://github.com/download/Depend.barrel",), args)
+        self.assertNotIn("Authorization", kwargs["headers"])
+
+    def test_rate_limited_download_is_retried(self):
+        limited = self.__build_response([], 403)
+        limited.headers = {
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int(time.time()) - 1),
+        }
+        self.__get.side_effect = [limited, self.__build_response([b"abc"])]
+
+        asset = self.__build_downloader("token").download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual(2, self.__get.call_count)
+        self.assertEqual(hashlib.sha256(b"abc").hexdigest(), asset.hash)
+
+    def test_rate_limited_api_call_is_retried(self):
+        repo = self.__set_releases([])
+        listing = repo.get_releases.return_value
+        listing.get_page.side_effect = [
+            RateLimitExceededException(
+                403,
+                {"message": "API rate limit exceeded"},
+                {"x-ratelimit-remaining": "0", "retry-after": "0"},
+            ),
+            [self.__build_release(1, "v1.0.0")],
+        ]
+        self.__get.return_value = self.__build_response([b"abc"])
+        dep = self.__build_dependency()
+        dep.set_version("1.0")
+
+        with patch.object(RateLimiter, "DEFAULT_BACKOFF", 0):
+            asset = self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        self.assertEqual("v1.0.0", str(asset.version))
+        self.assertEqual(2, listing.get_page.call_count)
+
+    def test_releases_are_listed_page_by_page(self):
+        releases = [
+            self.__build_release(i, "v0.{}.0".format(i)) for i in range(100, 0, -1)
+        ]
+        repo = self.__set_releases(releases)
+        listing = repo.get_releases.return_value
+        get_page = listing.get_page.side_effect
+        limited = [False]
+
+        def get_page_limited_once(page):
+            # The limit is exceeded on the third page
+            if page == 2 and not limited[0]:
+                limited[0] = True
+                raise RateLimitExceededException(
+                    403,
+                    {"message": "API rate limit exceeded"},
+                    {"x-ratelimit-remaining": "0", "retry-after": "0"},
+                )
+            return get_page(page)
+
+        listing.get_page.side_effect = get_page_limited_once
+        tracer = Mock(Tracer)
+        tracer.span.return_value.__enter__ = Mock(return_value={})
+        tracer.span.return_value.__exit__ = Mock(return_value=False)
+        downloader = GithubDownloader(self.__build_index(), tracer=tracer)
+        dep = self.__build_dependency()
+        dep.set_version("2.0")
+
+        with patch.object(RateLimiter, "DEFAULT_BACKOFF", 0):
+            with self.assertRaises(Error):
+                downloader.resolve_barrel(dep)
+
+        # Only the limited page is requested again, and each request counts
+        pages = [c[0][0] for c in listing.get_page.call_args_list]
+        self.assertEqual([0, 1, 2, 2, 3], pages)
+        self.assertEqual(5, tracer.count.call_args_list.count(call("api_requests")))
+
+    def test_profile_counts_a_request_per_listed_page(self):
+        self.__set_releases(
+            [self.__build_release(i, "v0.{}.0".format(i)) for i in range(100, 0, -1)]
+        )
+        profiler = Profiler(trace_memory=False)
+        downloader = GithubDownloader(self.__build_index(), tracer=profiler)
+        dep = self.__build_dependency()
+        dep.set_version("2.0")
+
+        with self.assertRaises(Error):
+            downloader.resolve_barrel(dep)
+
+        # 100 releases are listed over 4 pages
+        self.assertEqual(4, profiler.report()["counters"]["api_requests"])
+
+    def test_close_reports_api_quota(self):
+        downloader = self.__build_downloader()
+        dep = self.__build_dependency()
+        dep.set_version("1.0")
+        downloader.resolve_barrel(dep)
+
+        with self.assertLogs(level="INFO") as logs:
+            downloader.close()
+
+        self.assertIn("GitHub API: 1 calls, 59 of 60 remaining", logs.output[0])
+
+    def test_responses_without_rate_limit_headers_are_not_tracked(self):
+        release = self.__build_release(1, "v1.0.0")
+        release._headers = {}
+        self.__set_releases([release])
+        downloader = self.__build_downloader()
+        dep = self.__build_dependency()
+        dep.set_version("1.0")
+
+        downloader.resolve_barrel(dep)
+
+        with self.assertLogs(level="INFO") as logs:
+            downloader.close()
+        self.assertEqual("INFO:root:GitHub API: 1 calls", logs.output[0])
+
+    def test_failed_status_raises_and_leaves_no_file(self):
+        self.__get.return_value = self.__build_response([b"Not Found"], 404)
+
+        with self.assertRaises(Error):
+            self.__build_downloader().download_barrel(
+                self.__build_dependency(), self.__dir.name
+            )
+
+        self.assertEqual([], os.listdir(self.__dir.name))
+
+    def __build_interrupted_response(self) -> MagicMock:
+        def chunks():
+            yield b"abc"
+            raise requests.ConnectionError("reset")
+
+        return self.__build_response(chunks())
+
+    def __build_partial_response(self, chunks, first: int, size: int) -> MagicMock:
+        response = self.__build_response(chunks, 206)
+        response.headers = {
+            "Content-Range": "bytes {}-{}/{}".format(first, size - 1, size)
+        }
+        return response
+
+    @patch("mbget.resumable_download.time.sleep")
+    def test_interrupted_transfer_is_resumed(self, _):
+        self.__get.side_effect = [
+            self.__build_interrupted_response(),
+            self.__build_partial_response([b"def"], 3, 6),
+        ]
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        _, kwargs = self.__get.call_args
+        self.assertEqual("bytes=3-", kwargs["headers"]["Range"])
+        self.assertEqual(hashlib.sha256(b"abcdef").hexdigest(), asset.hash)
+        self.assertEqual(["Depend.barrel"], os.listdir(self.__dir.name))
+
+    @patch("mbget.resumable_download.time.sleep")
+    def test_failed_transfer_keeps_part_to_resume(self, _):
+        self.__get.side_effect = lambda *args, **kwargs: (
+            self.__build_interrupted_response()
+        )
+
+        with self.assertRaises(Error):
+            self.__build_downloader().download_barrel(
+                self.__build_dependency(), self.__dir.name
+            )
+
+        self.assertEqual([".Depend.barrel.10.part"], os.listdir(self.__dir.name))
+
+    def test_next_run_resumes_part(self):
+        with open(os.path.join(self.__dir.name, ".Depend.barrel.10.part"), "wb") as f:
+            f.write(b"abc")
+        self.__get.return_value = self.__build_partial_response([b"def"], 3, 6)
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        _, kwargs = self.__get.call_args
+        self.assertEqual("bytes=3-", kwargs["headers"]["Range"])
+        self.assertEqual(hashlib.sha256(b"abcdef").hexdigest(), asset.hash)
+
+    def test_no_matching_release_raises(self):
+        dep = self.__build_dependency()
+        dep.set_version("2.0.0")
+
+        with self.assertRaises(Error):
+            self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+    def test_downloads_share_one_session(self):
+        downloader = self.__build_downloader()
+
+        for version in ["1.0.0", "1.1.0"]:
+            dep = self.__build_dependency()
+            dep.set_version(version)
+            self.__get.return_value = self.__build_response([b"abc"])
+            downloader.download_barrel(dep, self.__dir.name)
+
+        self.__session.assert_called_once()
+        self.assertEqual(2, self.__get.call_count)
+
+    def test_pool_size_is_applied(self):
+        GithubDownloader(self.__build_index(), "token", pool_size=16)
+
+        self.__github.assert_called_once_with(
+            login_or_token="token", base_url="https://api.github.com", pool_size=16
+        )
+        adapter = self.__session.return_value.mount.call_args[0][1]
+        self.assertEqual(16, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+
+    def test_second_run_resolves_from_index(self):
+        self.__get.return_value = self.__build_response([b"abc"])
+        self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        def releases():
+            yield self.__build_release(2, "v1.1.0")
+            self.fail("Listed past the indexed releases")
+
+        self.__set_releases(releases())
+        self.__get.return_value = self.__build_response([b"abc"])
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("v1.0.0", str(asset.version))
+
+    def test_refresh_only_lists_new_releases(self):
+        dep = self.__build_dependency()
+        dep.set_version("1.1")
+        self.__get.return_value = self.__build_response([b"abc"])
+        self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        repo = self.__set_releases(
+            [
+                self.__build_release(3, "v1.1.1"),
+                self.__build_release(2, "v1.1.0"),
+                self.__build_release(1, "v1.0.0"),
+            ]
+        )
+        listing = repo.get_releases.return_value
+        listing.reset_mock()
+        self.__get.return_value = self.__build_response([b"abc"])
+        # A page per release shows how far the listing went
+        with patch.object(GithubDownloader, "PER_PAGE", 1):
+            asset = self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        self.assertEqual("v1.1.1", str(asset.version))
+        listing.get_page.assert_called_once_with(0)
+
+    def test_complete_index_stops_at_first_indexed_release(self):
+        dep = self.__build_dependency()
+        dep.set_version("2.0")
+        with self.assertRaises(Error):
+            self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        repo = self.__set_releases(
+            [
+                self.__build_release(3, "v1.1.1"),
+                self.__build_release(2, "v1.1.0"),
+                self.__build_release(1, "v1.0.0"),
+            ]
+        )
+        listing = repo.get_releases.return_value
+        listing.reset_mock()
+        self.__get.return_value = self.__build_response([b"abc"])
+        dep.set_version("1.0")
+        with patch.object(GithubDownloader, "PER_PAGE", 1):
+            asset = self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        self.assertEqual("v1.0.0", str(asset.version))
+        self.assertEqual(2, listing.get_page.call_count)
+
+    def test_incomplete_index_lists_older_releases(self):
+        dep = self.__build_dependency()
+        dep.set_version("1.1")
+        self.__get.return_value = self.__build_response([b"abc"])
+        self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        self.__get.return_value = self.__build_response([b"abc"])
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("v1.0.0", str(asset.version))
+
+    def test_repository_is_refreshed_once_per_run(self):
+        repo = self.__github.return_value.get_repo.return_value
+        downloader = self.__build_downloader()
+
+        for version in ["1.0.0", "1.1.0"]:
+            dep = self.__build_dependency()
+            dep.set_version(version)
+            self.__get.return_value = self.__build_response([b"abc"])
+            downloader.download_barrel(dep, self.__dir.name)
+
+        repo.get_releases.assert_called_once()
+
+    def test_exact_version_is_looked_up_by_tag(self):
+        repo = self.__set_tagged_releases([self.__build_release(1, "v1.0.0")])
+        self.__get.return_value = self.__build_response([b"abc"])
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("v1.0.0", str(asset.version))
+        repo.get_release.assert_called_once_with("v1.0.0")
+        repo.get_releases.assert_not_called()
+
+    def test_exact_version_is_looked_up_without_v_prefix(self):
+        repo = self.__set_tagged_releases([self.__build_release(1, "1.0.0")])
+        self.__get.return_value = self.__build_response([b"abc"])
+
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("1.0.0", str(asset.version))
+        self.assertEqual(2, repo.get_release.call_count)
+        repo.get_releases.assert_not_called()
+
+    def test_indexed_exact_version_makes_no_requests(self):
+        self.__set_tagged_releases([self.__build_release(1, "v1.0.0")])
+        self.__get.return_value = self.__build_response([b"abc"])
+        self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        repo = self.__set_tagged_releases([])
+        repo.reset_mock()
+        self.__get.return_value = self.__build_response([b"abc"])
+        asset = self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        self.assertEqual("v1.0.0", str(asset.version))
+        repo.get_release.assert_not_called()
+        repo.get_releases.assert_not_called()
+
+    def test_partial_version_lists_releases(self):
+        dep = self.__build_dependency()
+        dep.set_version("1.0")
+        repo = self.__set_tagged_releases([self.__build_release(1, "v1.0.0")])
+        self.__get.return_value = self.__build_response([b"abc"])
+
+        self.__build_downloader().download_barrel(dep, self.__dir.name)
+
+        repo.get_release.assert_not_called()
+        repo.get_releases.assert_called_once()
+
+    def test_prefetch_resolves_from_graphql(self):
+        dep = self.__build_dependency()
+        dep.set_version("1.0")
+        release = {
+            "id": 1,
+            "tag": "v1.0.0",
+            "published_at": None,
+            "assets": [
+                {
+                    "id": 10,
+                    "name": "Depend.barrel",
+                    "url": "https://api.github.com/assets/10",
+                    "size": 3,
+                    "digest": None,
+                }
+            ],
+        }
+        repo = self.__set_tagged_releases([])
+        downloader = self.__build_downloader("token")
+
+        with patch("mbget.github_downloader.GraphqlResolver") as resolver:
+            resolver.return_value.resolve.return_value = {
+                "owner/Depend": ([release], True)
+            }
+            downloader.prefetch([dep])
+
+        self.__get.return_value = self.__build_response([b"abc"])
+        asset = downloader.download_barrel(dep, self.__dir.name)
+
+        self.assertEqual("v1.0.0", str(asset.version))
+        resolver.return_value.resolve.assert_called_once_with({"owner/Depend"})
+        repo.get_releases.assert_not_called()
+
+    def test_enterprise_api_url_is_applied(self):
+        downloader = GithubDownloader(
+            self.__build_index(), "token", api_url="https://ghe/api/v3/"
+        )
+
+        with patch("mbget.github_downloader.GraphqlResolver") as resolver:
+            resolver.return_value.resolve.return_value = {}
+            downloader.prefetch([self.__build_dependency()])
+
+        self.__github.assert_called_once_with(
+            login_or_token="token", base_url="https://ghe/api/v3", pool_size=10
+        )
+        resolver.assert_called_once_with(
+            ANY,
+            "token",
+            "https://ghe/api/graphql",
+            "https://ghe/api/v3",
+            GithubDownloader.TIMEOUT,
+        )
+
+    def test_prefetch_requires_token(self):
+        with patch("mbget.github_downloader.GraphqlResolver") as resolver:
+            self.__build_downloader().prefetch([self.__build_dependency()])
+
+        resolver.assert_not_called()
+
+    def test_prefetch_skips_indexed_pinned_versions(self):
+        self.__set_tagged_releases([self.__build_release(1, "v1.0.0")])
+        self.__get.return_value = self.__build_response([b"abc"])
+        self.__build_downloader().download_barrel(
+            self.__build_dependency(), self.__dir.name
+        )
+
+        with patch("mbget.github_downloader.GraphqlResolver") as resolver:
+            self.__build_downloader("token").prefetch([self.__build_dependency()])
+
+        resolver.assert_not_called()
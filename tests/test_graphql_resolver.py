@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import Mock
+
+import requests
+
+from mbget.graphql_resolver import GraphqlResolver
+
+
+class FakeGraphqlHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.headers, body))
+
+        if self.server.status != 200:
+            self.send_response(self.server.status)
+            self.end_headers()
+            return
+
+        # Answer each aliased repository from the fake's repositories
+        data = {}
+        variables = body["variables"]
+        i = 0
+        while "o{}".format(i) in variables:
+            repo = "{}/{}".format(
+                variables["o{}".format(i)], variables["n{}".format(i)]
+            )
+            data["r{}".format(i)] = self.server.repos.get(repo)
+            i += 1
+
+        payload = json.dumps({"data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGraphqlResolver(unittest.TestCase):
+    @staticmethod
+    def __build_repo(tags, has_next_page=False) -> dict:
+        return {
+            "releases": {
+                "pageInfo": {"hasNextPage": has_next_page},
+                "nodes": [
+                    {
+                        "databaseId": i,
+                        "tagName": tag,
+                        "publishedAt": "2020-10-0{}T00:00:00Z".format(i),
+                        "releaseAssets": {
+                            "nodes": [
+                                {
+                                    "databaseId": i * 10,
+                                    "name": "b.barrel",
+                                    "size": 5,
+                                    "downloadUrl": "https://github.com/{}".format(tag),
+                                }
+                            ]
+                        },
+                    }
+                    for i, tag in reversed(list(enumerate(tags, 1)))
+                ],
+            }
+        }
+
+    def setUp(self):
+        super(TestGraphqlResolver, self).setUp()
+        self.__server = HTTPServer(("127.0.0.1", 0), FakeGraphqlHandler)
+        self.__server.requests = []
+        self.__server.repos = {}
+        self.__server.status = 200
+        thread = threading.Thread(
+            target=self.__server.serve_forever, args=(0.05,), daemon=True
+        )
+        thread.start()
+        self.addCleanup(self.__server.server_close)
+        self.addCleanup(self.__server.shutdown)
+
+        self.__session = requests.Session()
+        self.addCleanup(self.__session.close)
+
+    def __build_resolver(self) -> GraphqlResolver:
+        url = "http://127.0.0.1:{}/graphql".format(self.__server.server_port)
+        return GraphqlResolver(self.__session, "token", url, "https://api.example.com")
+
+    def test_resolves_all_repos_in_one_request(self):
+        self.__server.repos = {
+            "owner/A": self.__build_repo(["v1.0.0", "v1.1.0"]),
+            "owner/B": self.__build_repo(["v0.1.0"]),
+        }
+
+        resolved = self.__build_resolver().resolve(["owner/A", "owner/B", "owner/A"])
+
+        self.assertEqual(1, len(self.__server.requests))
+        self.assertEqual({"owner/A", "owner/B"}, set(resolved.keys()))
+        releases, complete = resolved["owner/A"]
+        self.assertTrue(complete)
+        self.assertEqual(["v1.1.0", "v1.0.0"], [r["tag"] for r in releases])
+
+    def test_builds_release_index_records(self):
+        self.__server.repos = {"owner/A": self.__build_repo(["v1.0.0"])}
+
+        releases, _ = self.__build_resolver().resolve(["owner/A"])["owner/A"]
+
+        self.assertEqual(
+            {
+                "id": 1,
+                "tag": "v1.0.0",
+                "published_at": "2020-10-01T00:00:00Z",
+                "assets": [
+                    {
+                        "id": 10,
+                        "name": "b.barrel",
+                        "url": "https://api.example.com/repos/owner/A/releases/assets/10",
+                        "download_url": "https://github.com/v1.0.0",
+                        "size": 5,
+                        "digest": None,
+                    }
+                ],
+            },
+            releases[0],
+        )
+
+    def test_more_releases_is_incomplete(self):
+        self.__server.repos = {"owner/A": self.__build_repo(["v1.0.0"], True)}
+
+        _, complete = self.__build_resolver().resolve(["owner/A"])["owner/A"]
+
+        self.assertFalse(complete)
+
+    def test_sends_token(self):
+        self.__build_resolver().resolve(["owner/A"])
+
+        headers, _ = self.__server.requests[0]
+        self.assertEqual("bearer token", headers["Authorization"])
+
+    def test_query_times_out(self):
+        session = Mock(requests.Session)
+        session.post.side_effect = requests.Timeout()
+        resolver = GraphqlResolver(session, "token", timeout=5)
+
+        self.assertEqual({}, resolver.resolve(["owner/A"]))
+        self.assertEqual(5, session.post.call_args[1]["timeout"])
+
+    def test_unknown_repo_is_not_resolved(self):
+        self.__server.repos = {"owner/A": self.__build_repo(["v1.0.0"])}
+
+        resolved = self.__build_resolver().resolve(["owner/A", "owner/Missing"])
+
+        self.assertEqual({"owner/A"}, set(resolved.keys()))
+
+    def test_failed_query_resolves_nothing(self):
+        self.__server.status = 502
+
+        self.assertEqual({}, self.__build_resolver().resolve(["owner/A"]))
+
+    def test_large_workspaces_are_batched(self):
+        repos = [
+            "owner/R{}".format(i) for i in range(GraphqlResolver.REPOS_PER_QUERY + 1)
+        ]
+
+        self.__build_resolver().resolve(repos)
+
+        self.assertEqual(2, len(self.__server.requests))
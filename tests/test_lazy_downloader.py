@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import unittest
+from unittest.mock import Mock
+
+from mbget.dependency import Dependency
+from mbget.github_downloader import GithubDownloader
+from mbget.lazy_downloader import LazyDownloader
+
+
+class TestLazyDownloader(unittest.TestCase):
+    def setUp(self):
+        super(TestLazyDownloader, self).setUp()
+        self.__downloader = Mock(GithubDownloader)
+        self.__factory = Mock(return_value=self.__downloader)
+
+    def test_downloader_is_not_created_until_needed(self):
+        lazy = LazyDownloader(self.__factory)
+
+        lazy.prefetch([])
+        lazy.close()
+
+        self.assertFalse(lazy.created)
+        self.__factory.assert_not_called()
+        self.__downloader.close.assert_not_called()
+
+    def test_downloader_is_created_once(self):
+        lazy = LazyDownloader(self.__factory)
+        dep = Dependency("LibraryA")
+
+        lazy.prefetch(iter([dep]))
+        lazy.resolve_barrel(dep)
+        lazy.fetch_barrel({}, {}, "barrels")
+        lazy.close()
+
+        self.assertTrue(lazy.created)
+        self.__factory.assert_called_once_with()
+        self.__downloader.prefetch.assert_called_once_with([dep])
+        self.__downloader.resolve_barrel.assert_called_once_with(dep)
+        self.__downloader.fetch_barrel.assert_called_once_with({}, {}, "barrels")
+        self.__downloader.close.assert_called_once_with()
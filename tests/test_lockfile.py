@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, PropertyMock
+
+from mbget.config import Config
+from mbget.dependency import Dependency
+from mbget.errors import UpdateError
+from mbget.lockfile import Lockfile
+
+
+class TestLockfile(unittest.TestCase):
+    def setUp(self):
+        super(TestLockfile, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+        self.__path = os.path.join(self.__dir.name, "mbget.lock")
+
+    def __build_config(self) -> Mock:
+        mock_config = Mock(Config)
+        type(mock_config).manifest = PropertyMock(
+            return_value=os.path.join(self.__dir.name, "manifest.xml")
+        )
+        mock_config.open_file.side_effect = Config.open_file
+        mock_config.replace_file.side_effect = Config.replace_file
+        return mock_config
+
+    @staticmethod
+    def __build_dependency(name: str, version: str = "1.0") -> Dependency:
+        dep = Dependency(name)
+        dep.set_version(version)
+        dep.set_repo("owner/{}".format(name))
+        return dep
+
+    @staticmethod
+    def __build_asset(name: str) -> dict:
+        return {
+            "id": 7,
+            "name": "{}.barrel".format(name),
+            "url": "https://example.com/{}".format(name),
+            "download_url": "https://example.com/download/{}".format(name),
+            "size": 8,
+            "digest": None,
+        }
+
+    def __lock(self, lockfile: Lockfile, dep: Dependency, tag: str = "v1.0.2"):
+        asset = self.__build_asset(dep.package_name)
+        lockfile.add(dep, {"tag": tag}, asset, "0123")
+
+    def test_missing_lockfile_is_empty(self):
+        lockfile = Lockfile(self.__build_config())
+
+        self.assertFalse(lockfile.exists)
+        self.assertIsNone(lockfile.find(self.__build_dependency("A")))
+
+    def test_locked_asset_is_found_after_reload(self):
+        dep = self.__build_dependency("A")
+        lockfile = Lockfile(self.__build_config())
+        self.__lock(lockfile, dep)
+        lockfile.write(["A"])
+
+        release, asset = Lockfile(self.__build_config()).find(dep)
+
+        self.assertEqual({"tag": "v1.0.2"}, release)
+        self.assertEqual(
+            dict(self.__build_asset("A"), digest="0123"),
+            asset,
+        )
+
+    def test_entry_without_download_url_is_found(self):
+        entry = {
+            "repo": "owner/A",
+            "tag": "v1.0.2",
+            "asset_id": 7,
+            "name": "A.barrel",
+            "url": "https://example.com/A",
+            "size": 8,
+            "sha256": "0123",
+        }
+        with open(self.__path, "w") as f:
+            json.dump({"packages": {"A": entry}}, f)
+
+        _, asset = Lockfile(self.__build_config()).find(self.__build_dependency("A"))
+
+        self.assertIsNone(asset["download_url"])
+        self.assertEqual("https://example.com/A", asset["url"])
+
+    def test_entry_for_other_requirement_is_ignored(self):
+        lockfile = Lockfile(self.__build_config())
+        self.__lock(lockfile, self.__build_dependency("A"))
+
+        self.assertIsNone(lockfile.find(self.__build_dependency("A", "2.0")))
+
+    def test_entry_for_other_repo_is_ignored(self):
+        lockfile = Lockfile(self.__build_config())
+        self.__lock(lockfile, self.__build_dependency("A"))
+        moved = self.__build_dependency("A")
+        moved.set_repo("fork/A")
+
+        self.assertIsNone(lockfile.find(moved))
+
+    def test_write_drops_removed_packages(self):
+        lockfile = Lockfile(self.__build_config())
+        self.__lock(lockfile, self.__build_dependency("A"))
+        self.__lock(lockfile, self.__build_dependency("B"))
+
+        lockfile.write(["B"])
+
+        with open(self.__path, "r") as f:
+            self.assertEqual(["B"], list(json.load(f)["packages"].keys()))
+
+    def test_unchanged_lockfile_is_not_rewritten(self):
+        config = self.__build_config()
+        lockfile = Lockfile(config)
+        self.__lock(lockfile, self.__build_dependency("A"))
+        lockfile.write(["A"])
+        config.replace_file.reset_mock()
+
+        self.__lock(lockfile, self.__build_dependency("A"))
+        lockfile.write(["A"])
+
+        config.replace_file.assert_not_called()
+
+    def test_corrupt_lockfile_raises(self):
+        with open(self.__path, "w") as f:
+            f.write("{not json")
+
+        with self.assertRaises(UpdateError):
+            Lockfile(self.__build_config())
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestMain(unittest.TestCase):
+    # mbget runs in every incremental build, importing the command line must
+    # stay well under the cost of importing PyGithub and requests
+    IMPORT_BUDGET_SECONDS = 0.25
+
+    @staticmethod
+    def __import_times(module: str) -> Dict[str, float]:
+        """
+        Import a module in a fresh interpreter, and return the cumulative
+        import time of every module it imported
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import " + module],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+
+        times = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1e6
+        return times
+
+    def test_import_does_not_load_the_network_stack(self):
+        times = self.__import_times("mbget.main")
+
+        self.assertIn("mbget.main", times)
+        for module in ("github", "requests", "mbget.github_downloader"):
+            self.assertNotIn(module, times)
+
+    def test_import_time_is_within_budget(self):
+        # Best of a few runs, a busy machine only ever makes imports slower
+        best = min(self.__import_times("mbget.main")["mbget.main"] for _ in range(3))
+
+        self.assertLess(best, self.IMPORT_BUDGET_SECONDS)
+
+    def test_errors_are_reported_without_a_traceback(self):
+        with tempfile.TemporaryDirectory() as project:
+            with open(os.path.join(project, "manifest.xml"), "w") as f:
+                f.write(
+                    '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+                    '<iq:application><iq:barrels><iq:depends name="A" version="1.0.0"/>'
+                    "</iq:barrels></iq:application></iq:manifest>"
+                )
+            with open(os.path.join(project, "packages.txt"), "w") as f:
+                f.write("A => owner/A\n")
+
+            # Nothing is locked, so a frozen install fails
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "-c",
+                    "from mbget.main import main; main()",
+                    "install",
+                    "--frozen",
+                ],
+                cwd=project,
+                env=dict(os.environ, PYTHONPATH=ROOT),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+            )
+
+        self.assertEqual(1, result.returncode)
+        self.assertIn("ERROR:", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
@@ -28,9 +28,13 @@
 #                                                                              #
 # ############################################################################ #
 
+import os
+import tempfile
 import unittest
+import zipfile
 from io import StringIO
 
+from mbget.errors import Error
 from mbget.manifest import Manifest
 
 
@@ -83,3 +87,24 @@ class TestManifest(unittest.TestCase):
         manifest = Manifest(fake_manifest)
 
         self.assertEqual("0.2.5", manifest.get_required_version("TestBarrel"))
+
+    def test_from_barrel_reads_embedded_manifest(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "Test.barrel")
+            with zipfile.ZipFile(path, "w") as barrel:
+                barrel.writestr(
+                    "manifest.xml", self.__build_fake_manifest({"OtherBarrel": "0.4"})
+                )
+
+            manifest = Manifest.from_barrel(path)
+
+        self.assertEqual("0.4", manifest.get_required_version("OtherBarrel"))
+
+    def test_from_barrel_without_manifest_raises(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "Test.barrel")
+            with zipfile.ZipFile(path, "w") as barrel:
+                barrel.writestr("resources.xml", "")
+
+            with self.assertRaises(Error):
+                Manifest.from_barrel(path)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from mbget.metrics import Metrics, publish
+from mbget.profiler import Profiler
+
+
+class TestMetrics(unittest.TestCase):
+    def __build_metrics(self) -> Metrics:
+        profiler = Profiler(trace_memory=False)
+        metrics = Metrics(profiler, "mbget")
+        profiler.count("cache_hits", 2)
+        profiler.count("bytes_downloaded", 1234)
+        profiler.gauge("rate_limit_remaining", 57)
+        with profiler.phase("download", "A"):
+            pass
+        with profiler.phase("download", "B"):
+            pass
+        with profiler.span("GET asset", "api"):
+            pass
+        return metrics
+
+    def test_prometheus_counters_and_gauges(self):
+        text = self.__build_metrics().prometheus()
+
+        self.assertIn("# TYPE mbget_cache_hits_last_run gauge\n", text)
+        self.assertIn("\nmbget_cache_hits_last_run 2\n", text)
+        self.assertIn("\nmbget_bytes_downloaded_last_run 1234\n", text)
+        self.assertNotIn("counter", text)
+        self.assertIn("# TYPE mbget_rate_limit_remaining gauge\n", text)
+        self.assertIn("\nmbget_rate_limit_remaining 57\n", text)
+
+    def test_prometheus_phase_durations(self):
+        text = self.__build_metrics().prometheus()
+
+        self.assertIn("# TYPE mbget_phase_seconds_last_run gauge\n", text)
+        self.assertIn('mbget_phase_seconds_last_run{phase="download"} ', text)
+        self.assertIn('mbget_phase_max_seconds_last_run{phase="download"} ', text)
+        self.assertIn('mbget_phase_calls_last_run{phase="download"} 2\n', text)
+        self.assertNotIn("GET asset", text)
+
+    def test_finish_adds_run_gauges(self):
+        metrics = self.__build_metrics()
+        self.assertNotIn("mbget_run_success", metrics.prometheus())
+
+        metrics.finish(False)
+
+        self.assertIn("\nmbget_run_success 0\n", metrics.prometheus())
+        self.assertIn("mbget_run_duration_seconds", metrics.prometheus())
+
+    def test_statsd_lines(self):
+        metrics = self.__build_metrics()
+        metrics.finish(True)
+
+        lines = metrics.statsd()
+
+        self.assertIn("mbget.cache_hits:2|c", lines)
+        self.assertIn("mbget.rate_limit_remaining:57|g", lines)
+        self.assertEqual(
+            2, len([line for line in lines if line.startswith("mbget.phase.download:")])
+        )
+        self.assertIn("mbget.runs.success:1|c", lines)
+
+    def test_write_textfile(self):
+        metrics = self.__build_metrics()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mbget.prom")
+            metrics.write_textfile(path)
+            with open(path, "r") as f:
+                self.assertEqual(metrics.prometheus(), f.read())
+
+    def test_send_statsd_batches_lines_into_datagrams(self):
+        metrics = self.__build_metrics()
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(("127.0.0.1", 0))
+        receiver.settimeout(5)
+
+        with receiver:
+            metrics.send_statsd(receiver.getsockname())
+            datagram = receiver.recv(Metrics.MAX_DATAGRAM).decode()
+
+        self.assertEqual("\n".join(metrics.statsd()), datagram)
+
+    def test_publish_failures_do_not_fail_the_run(self):
+        metrics = self.__build_metrics()
+        config = MagicMock()
+        config.metrics_file = "/missing/dir/mbget.prom"
+        config.statsd = ("localhost", 8125)
+
+        with patch("socket.socket", side_effect=OSError("no network")):
+            with self.assertLogs(level="WARNING") as logs:
+                publish(metrics, config)
+
+        self.assertEqual(2, len(logs.output))
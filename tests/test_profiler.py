@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from mbget.profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_phases_add_up_calls(self):
+        profiler = Profiler()
+
+        for _ in range(3):
+            with profiler.phase("resolve"):
+                pass
+
+        phase = profiler.report()["phases"]["resolve"]
+        self.assertEqual(3, phase["calls"])
+        self.assertGreaterEqual(phase["wall_seconds"], 0.0)
+
+    def test_phase_is_recorded_when_it_fails(self):
+        profiler = Profiler()
+
+        with self.assertRaises(ValueError):
+            with profiler.phase("download", "A"):
+                raise ValueError()
+
+        self.assertEqual(1, profiler.report()["phases"]["download"]["calls"])
+        self.assertIn("download_seconds", profiler.report()["dependencies"]["A"])
+
+    def test_dependency_times_are_kept_per_phase(self):
+        profiler = Profiler()
+
+        with profiler.phase("resolve", "A"):
+            pass
+        with profiler.phase("download", "A"):
+            pass
+        with profiler.phase("download", "B"):
+            pass
+
+        dependencies = profiler.report()["dependencies"]
+        self.assertEqual(
+            {"resolve_seconds", "download_seconds"}, set(dependencies["A"])
+        )
+        self.assertEqual({"download_seconds"}, set(dependencies["B"]))
+
+    def test_only_phases_are_profiled(self):
+        profiler = Profiler()
+
+        with profiler.span("GET asset", "api"):
+            pass
+
+        self.assertEqual({}, profiler.report()["phases"])
+
+    def test_counters_are_thread_safe(self):
+        profiler = Profiler()
+
+        def count():
+            for _ in range(1000):
+                profiler.count("api_requests")
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, profiler.report()["counters"]["api_requests"])
+
+    def test_start_and_stop_measure_peak_memory(self):
+        profiler = Profiler()
+
+        profiler.start()
+        data = bytearray(1 << 20)
+        profiler.stop()
+
+        report = profiler.report()
+        self.assertGreaterEqual(report["peak_memory_bytes"], len(data))
+        self.assertGreater(report["wall_seconds"], 0.0)
+
+    def test_format_report_lists_phases_dependencies_and_counters(self):
+        profiler = Profiler()
+        with profiler.phase("download", "LibraryA"):
+            pass
+        profiler.count("bytes_downloaded", 1234)
+
+        report = profiler.format_report()
+
+        self.assertIn("download", report)
+        self.assertIn("LibraryA", report)
+        self.assertIn("1234", report)
+
+    def test_write_report_as_json(self):
+        profiler = Profiler()
+        profiler.count("api_requests", 2)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.json")
+            profiler.write(path)
+            with open(path, "r") as f:
+                report = json.load(f)
+
+        self.assertEqual({"api_requests": 2}, report["counters"])
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import unittest
+
+from mbget.errors import Error
+from mbget.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        super(TestRateLimiter, self).setUp()
+        self.__now = 1000.0
+        self.__sleeps = []
+
+    def __clock(self) -> float:
+        return self.__now
+
+    def __sleep(self, seconds: float) -> None:
+        self.__sleeps.append(seconds)
+        self.__now += seconds
+
+    def __build_limiter(self, max_wait: float = 3600) -> RateLimiter:
+        return RateLimiter(max_wait, self.__clock, self.__sleep)
+
+    def test_acquire_without_quota_does_not_wait(self):
+        limiter = self.__build_limiter()
+
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertEqual([], self.__sleeps)
+
+    def test_acquire_waits_for_reset_once_quota_is_spent(self):
+        limiter = self.__build_limiter()
+        limiter.update(
+            {
+                "X-RateLimit-Remaining": "1",
+                "X-RateLimit-Limit": "60",
+                "X-RateLimit-Reset": "1100",
+            }
+        )
+
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertEqual([101], self.__sleeps)
+
+    def test_acquire_honours_retry_after(self):
+        limiter = self.__build_limiter()
+        limiter.update({"Retry-After": "30"})
+
+        limiter.acquire()
+
+        self.assertEqual([30], self.__sleeps)
+
+    def test_acquire_fails_if_reset_is_too_far(self):
+        limiter = self.__build_limiter(max_wait=60)
+        limiter.update({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "4000"})
+
+        with self.assertRaises(Error):
+            limiter.acquire()
+
+        self.assertEqual([], self.__sleeps)
+
+    def test_limited_without_headers_backs_off(self):
+        limiter = self.__build_limiter()
+
+        limiter.limited({})
+        limiter.acquire()
+
+        self.assertEqual([RateLimiter.DEFAULT_BACKOFF], self.__sleeps)
+
+    def test_is_limited(self):
+        self.assertTrue(RateLimiter.is_limited(429, {}))
+        self.assertTrue(RateLimiter.is_limited(403, {"X-RateLimit-Remaining": "0"}))
+        self.assertTrue(RateLimiter.is_limited(403, {"Retry-After": "5"}))
+        self.assertFalse(RateLimiter.is_limited(403, {"X-RateLimit-Remaining": "3"}))
+        self.assertFalse(RateLimiter.is_limited(200, {}))
+
+    def test_quota_is_last_reported_by_github(self):
+        limiter = self.__build_limiter()
+        self.assertEqual((None, None), limiter.quota)
+
+        limiter.update({"X-RateLimit-Remaining": "57", "X-RateLimit-Limit": "60"})
+
+        self.assertEqual((57, 60), limiter.quota)
+
+    def test_summary_reports_quota_and_waits(self):
+        limiter = self.__build_limiter()
+        self.assertIsNone(limiter.summary())
+
+        limiter.update({"Retry-After": "5"})
+        limiter.acquire()
+        limiter.update({"X-RateLimit-Remaining": "57", "X-RateLimit-Limit": "60"})
+
+        self.assertEqual(
+            "GitHub API: 1 calls, 57 of 60 remaining, "
+            "waited 5 seconds for the rate limit",
+            limiter.summary(),
+        )
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, PropertyMock
+
+from mbget.config import Config
+from mbget.release_index import ReleaseIndex
+from mbget.version import Version
+
+
+class TestReleaseIndex(unittest.TestCase):
+    @staticmethod
+    def __build_release(release_id: int, tag: str) -> dict:
+        return {"id": release_id, "tag": tag, "published_at": None, "assets": []}
+
+    def setUp(self):
+        super(TestReleaseIndex, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+
+    def __build_index(self) -> ReleaseIndex:
+        mock_config = Mock(Config)
+        type(mock_config).barrel_dir = PropertyMock(return_value=self.__dir.name)
+        mock_config.open_file.side_effect = Config.open_file
+        mock_config.replace_file.side_effect = Config.replace_file
+        self.__config = mock_config
+        return ReleaseIndex(mock_config)
+
+    def test_empty_index(self):
+        index = self.__build_index()
+
+        self.assertEqual(set(), index.release_ids("owner/Depend"))
+        self.assertFalse(index.is_complete("owner/Depend"))
+        self.assertIsNone(index.find("owner/Depend", Version("1.0.0")))
+
+    def test_find_returns_newest_match(self):
+        index = self.__build_index()
+        index.add_releases(
+            "owner/Depend",
+            [self.__build_release(2, "v1.0.1"), self.__build_release(1, "v1.0.0")],
+            False,
+        )
+
+        self.assertEqual(2, index.find("owner/Depend", Version("1.0"))["id"])
+        self.assertEqual(1, index.find("owner/Depend", Version("1.0.0"))["id"])
+
+    def test_find_returns_highest_version(self):
+        index = self.__build_index()
+        index.add_releases(
+            "owner/Depend",
+            [
+                self.__build_release(4, "v1.1.1"),
+                self.__build_release(3, "v1.2.0-beta"),
+                self.__build_release(2, "v1.10.0"),
+                self.__build_release(1, "v1.2.0"),
+            ],
+            True,
+        )
+
+        self.assertEqual(2, index.find("owner/Depend", Version("1"))["id"])
+        self.assertEqual(1, index.find("owner/Depend", Version("1.2"))["id"])
+        self.assertEqual(3, index.find("owner/Depend", Version("1.2.0-beta"))["id"])
+        self.assertEqual(4, index.find("owner/Depend", Version("1.1"))["id"])
+        self.assertIsNone(index.find("owner/Depend", Version("1.3")))
+
+    def test_find_non_semver_tag(self):
+        index = self.__build_index()
+        index.add_releases(
+            "owner/Depend",
+            [self.__build_release(2, "latest"), self.__build_release(1, "v1.0.0")],
+            True,
+        )
+
+        self.assertEqual(2, index.find("owner/Depend", Version("latest"))["id"])
+
+    def test_add_releases_merges_newest_first(self):
+        index = self.__build_index()
+        index.add_releases("owner/Depend", [self.__build_release(1, "v1.0.0")], False)
+        index.add_releases("owner/Depend", [self.__build_release(2, "v1.0.1")], False)
+
+        self.assertEqual({1, 2}, index.release_ids("owner/Depend"))
+        self.assertEqual(2, index.find("owner/Depend", Version("1.0"))["id"])
+
+    def test_relisted_release_keeps_known_fields(self):
+        index = self.__build_index()
+        release = self.__build_release(1, "v1.0.0")
+        asset = {"id": 10, "name": "b.barrel", "url": "api", "size": 5}
+        rest = dict(release, assets=[dict(asset, download_url="dl", digest="abc")])
+        graphql = dict(release, assets=[dict(asset, download_url=None, digest=None)])
+
+        index.add_releases("owner/Depend", [rest], False)
+        index.add_releases("owner/Depend", [graphql], False)
+
+        found = index.find("owner/Depend", Version("1.0.0"))
+        self.assertEqual("abc", found["assets"][0]["digest"])
+        self.assertEqual("dl", found["assets"][0]["download_url"])
+
+    def test_complete_is_kept(self):
+        index = self.__build_index()
+        index.add_releases("owner/Depend", [self.__build_release(1, "v1.0.0")], True)
+        index.add_releases("owner/Depend", [self.__build_release(2, "v1.0.1")], False)
+
+        self.assertTrue(index.is_complete("owner/Depend"))
+
+    def test_index_is_persisted(self):
+        self.__build_index().add_releases(
+            "owner/Depend", [self.__build_release(1, "v1.0.0")], True
+        )
+
+        index = self.__build_index()
+
+        self.assertTrue(os.path.exists(os.path.join(self.__dir.name, ".mbgetreleases")))
+        self.assertEqual({1}, index.release_ids("owner/Depend"))
+        self.assertTrue(index.is_complete("owner/Depend"))
+
+    def test_failed_index_write_is_not_fatal(self):
+        index = self.__build_index()
+        self.__config.replace_file.side_effect = FileNotFoundError("replaced")
+
+        with self.assertLogs(level="WARNING"):
+            index.add_releases(
+                "owner/Depend", [self.__build_release(1, "v1.0.0")], True
+            )
+
+        self.assertEqual({1}, index.release_ids("owner/Depend"))
+
+    def test_corrupt_index_is_ignored(self):
+        with open(os.path.join(self.__dir.name, ".mbgetreleases"), "w") as f:
+            f.write("{corrupt")
+
+        index = self.__build_index()
+
+        self.assertEqual(set(), index.release_ids("owner/Depend"))
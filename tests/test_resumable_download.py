@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest.mock import patch
+
+import requests
+
+from mbget.errors import Error
+from mbget.resumable_download import ResumableDownload
+
+
+class FakeFileServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeFileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = self.server.content
+        requested = self.headers.get("Range")
+        with self.server.lock:
+            self.server.ranges_requested.append(requested)
+            cut = (
+                self.server.interruptions.pop(0) if self.server.interruptions else None
+            )
+
+        first, last = 0, len(content) - 1
+        match = re.match(r"^bytes=(\d+)-(\d*)$", requested or "")
+        if self.server.supports_ranges and match is not None:
+            first = int(match.group(1))
+            if match.group(2):
+                last = min(int(match.group(2)), last)
+            if first > last:
+                self.send_response(416)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(first, last, len(content))
+            )
+        else:
+            self.send_response(200)
+
+        body = content[first : last + 1]  # noqa: E203
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        if cut is not None:
+            # Drop the connection part way through the body
+            self.wfile.write(body[:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@patch("mbget.resumable_download.time.sleep")
+class TestResumableDownload(unittest.TestCase):
+    def setUp(self):
+        super(TestResumableDownload, self).setUp()
+        self.__server = FakeFileServer(("127.0.0.1", 0), FakeFileHandler)
+        self.__server.content = os.urandom(100000)
+        self.__server.supports_ranges = True
+        self.__server.interruptions = []
+        self.__server.ranges_requested = []
+        self.__server.lock = threading.Lock()
+        thread = threading.Thread(
+            target=self.__server.serve_forever, args=(0.05,), daemon=True
+        )
+        thread.start()
+        self.addCleanup(self.__server.server_close)
+        self.addCleanup(self.__server.shutdown)
+
+        self.__session = requests.Session()
+        self.addCleanup(self.__session.close)
+
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+        self.__part = os.path.join(self.__dir.name, ".file.part")
+
+        # Small chunks, so that every byte received before a connection drops
+        # makes it to the part file
+        pat = patch.object(ResumableDownload, "CHUNK_SIZE", 1000)
+        pat.start()
+        self.addCleanup(pat.stop)
+
+    def __open_response(self, headers) -> requests.Response:
+        url = "http://127.0.0.1:{}/file".format(self.__server.server_address[1])
+        return self.__session.get(url, headers=headers, stream=True, timeout=5)
+
+    def __build_download(self, **kwargs) -> ResumableDownload:
+        return ResumableDownload(
+            "file",
+            self.__open_response,
+            self.__part,
+            len(self.__server.content),
+            **kwargs
+        )
+
+    def __assert_downloaded(self, digest: str):
+        with open(self.__part, "rb") as f:
+            self.assertEqual(self.__server.content, f.read())
+        self.assertEqual(hashlib.sha256(self.__server.content).hexdigest(), digest)
+
+    def test_download_whole_file(self, _):
+        digest = self.__build_download().run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual([None], self.__server.ranges_requested)
+
+    def test_interrupted_download_resumes_with_range(self, _):
+        self.__server.interruptions = [30000]
+
+        digest = self.__build_download().run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual([None, "bytes=30000-"], self.__server.ranges_requested)
+
+    def test_interrupted_download_restarts_without_range_support(self, _):
+        self.__server.supports_ranges = False
+        self.__server.interruptions = [30000]
+
+        download = self.__build_download()
+        digest = download.run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual(130000, download.bytes_received)
+
+    def test_failed_download_keeps_part(self, _):
+        self.__server.interruptions = [30000, 0, 0]
+
+        with self.assertRaises(Error):
+            self.__build_download(retries=1).run()
+
+        self.assertEqual(30000, os.path.getsize(self.__part))
+
+        digest = self.__build_download().run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual("bytes=30000-", self.__server.ranges_requested[-1])
+
+    def test_bytes_of_a_partial_chunk_are_kept(self, _):
+        self.__server.interruptions = [30000]
+
+        with patch.object(ResumableDownload, "CHUNK_SIZE", 65536):
+            digest = self.__build_download().run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual([None, "bytes=30000-"], self.__server.ranges_requested)
+
+    def test_retries_are_reset_by_progress(self, _):
+        self.__server.interruptions = [20000, 20000, 20000, 20000]
+
+        digest = self.__build_download(retries=1).run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual(5, len(self.__server.ranges_requested))
+
+    def test_complete_part_is_not_downloaded_again(self, _):
+        with open(self.__part, "wb") as f:
+            f.write(self.__server.content)
+
+        digest = self.__build_download().run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual(["bytes=100000-"], self.__server.ranges_requested)
+
+    def test_segmented_download(self, _):
+        with patch.object(ResumableDownload, "MIN_SEGMENT_SIZE", 10000):
+            self.__server.interruptions = [5000]
+            digest = self.__build_download(segments=4).run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual(5, len(self.__server.ranges_requested))
+        self.assertIn("bytes=75000-99999", self.__server.ranges_requested)
+        self.assertEqual([".file.part"], os.listdir(self.__dir.name))
+
+    def test_segmented_download_without_range_support(self, _):
+        self.__server.supports_ranges = False
+
+        with patch.object(ResumableDownload, "MIN_SEGMENT_SIZE", 10000):
+            digest = self.__build_download(segments=4).run()
+
+        self.__assert_downloaded(digest)
+        self.assertEqual([".file.part"], os.listdir(self.__dir.name))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from mbget.tracing import ChromeTraceExporter, NullTracer, Span, Tracer
+
+
+class TestTracer(unittest.TestCase):
+    def test_span_calls_callbacks(self):
+        spans = []
+        tracer = Tracer()
+        tracer.add_callback(spans.append)
+
+        with tracer.span("GET asset", "api", asset="A.barrel") as args:
+            args["status"] = 200
+
+        self.assertEqual(1, len(spans))
+        span = spans[0]
+        self.assertEqual("GET asset", span.name)
+        self.assertEqual("api", span.category)
+        self.assertEqual({"asset": "A.barrel", "status": 200}, span.args)
+        self.assertGreaterEqual(span.duration, 0.0)
+        self.assertEqual(threading.current_thread().ident, span.thread)
+
+    def test_span_ends_when_operation_fails(self):
+        spans = []
+        tracer = Tracer()
+        tracer.add_callback(spans.append)
+
+        with self.assertRaises(ValueError):
+            with tracer.span("write cache", "file"):
+                raise ValueError()
+
+        self.assertEqual(["write cache"], [span.name for span in spans])
+
+    def test_phase_is_a_span(self):
+        spans = []
+        tracer = Tracer()
+        tracer.add_callback(spans.append)
+
+        with tracer.phase("download", "A"):
+            pass
+
+        self.assertEqual(Tracer.PHASE, spans[0].category)
+        self.assertEqual({"dependency": "A"}, spans[0].args)
+
+    def test_null_tracer_does_nothing(self):
+        tracer = NullTracer()
+
+        with tracer.span("GET asset", "api") as args:
+            args["status"] = 200
+        with tracer.phase("download", "A"):
+            tracer.count("api_requests")
+
+        with self.assertRaises(TypeError):
+            tracer.add_callback(lambda span: None)
+
+
+class TestChromeTraceExporter(unittest.TestCase):
+    def test_spans_are_complete_events(self):
+        exporter = ChromeTraceExporter()
+        tracer = Tracer()
+        tracer.add_callback(exporter)
+
+        with tracer.span("transfer", "transfer", asset="A.barrel"):
+            pass
+
+        trace = exporter.trace()
+        events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(1, len(events))
+        self.assertEqual("transfer", events[0]["name"])
+        self.assertEqual("transfer", events[0]["cat"])
+        self.assertEqual("A.barrel", events[0]["args"]["asset"])
+        self.assertGreaterEqual(events[0]["dur"], 0)
+
+    def test_worker_threads_are_named(self):
+        exporter = ChromeTraceExporter()
+
+        def worker():
+            exporter(Span("hash", "phase", 0.0, 1.0, 0.5, None, {}))
+
+        thread = threading.Thread(target=worker, name="worker-1")
+        thread.start()
+        thread.join()
+
+        names = [e for e in exporter.trace()["traceEvents"] if e["ph"] == "M"]
+        self.assertEqual("worker-1", names[0]["args"]["name"])
+
+    def test_write_trace(self):
+        exporter = ChromeTraceExporter()
+        exporter(Span("hash", "phase", 0.0, 0.001, 0.001, 1, {}))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            exporter.write(path)
+            with open(path, "r") as f:
+                trace = json.load(f)
+
+        self.assertEqual(2, len(trace["traceEvents"]))
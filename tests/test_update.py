@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+
+import unittest
+from io import StringIO
+from unittest.mock import MagicMock, Mock, PropertyMock, patch
+
+from mbget.barrel_asset import BarrelAsset
+from mbget.barrel_store import BarrelStore
+from mbget.config import Config
+from mbget.dependency import Dependency
+from mbget.errors import Error, UpdateError
+from mbget.github_downloader import GithubDownloader
+from mbget.lockfile import Lockfile
+from mbget.manifest import Manifest
+from mbget.profiler import Profiler
+from mbget.project import Project
+from mbget.update import Update
+from tests.test_dependency_graph import build_manifest
+
+
+class TestUpdate(unittest.TestCase):
+    @staticmethod
+    def __build_dependency(name: str) -> Dependency:
+        dep = Dependency(name)
+        dep.set_version("1.0.0")
+        dep.set_repo("owner/{}".format(name))
+        return dep
+
+    def __build_project(self, uncached, jobs=4, cached=()) -> Mock:
+        mock_config = Mock(Config)
+        type(mock_config).jobs = PropertyMock(return_value=jobs)
+        type(mock_config).barrel_dir = PropertyMock(return_value="barrels")
+
+        mock_project = MagicMock(Project)
+        type(mock_project).config = PropertyMock(return_value=mock_config)
+        type(mock_project).cached_dependencies = PropertyMock(
+            side_effect=lambda: list(cached)
+        )
+        type(mock_project).uncached_dependencies = PropertyMock(
+            side_effect=lambda: list(uncached)
+        )
+        mock_project.dependencies = {
+            dep.package_name: dep for dep in list(cached) + list(uncached)
+        }
+        return mock_project
+
+    @staticmethod
+    def __build_downloader() -> Mock:
+        def resolve(dep):
+            asset = {"name": "{}.barrel".format(dep.package_name), "digest": None}
+            # The release that the dependency's requirement resolves to
+            return {"tag": "v{}".format(dep.version)}, asset
+
+        mock_downloader = Mock(GithubDownloader)
+        mock_downloader.resolve_barrel.side_effect = resolve
+        mock_downloader.fetch_barrel.side_effect = lambda rel, asset, d: BarrelAsset(
+            asset["name"], rel["tag"], "{}/{}".format(d, asset["name"]), "0123"
+        )
+        return mock_downloader
+
+    @staticmethod
+    def __build_store(stored=()) -> Mock:
+        mock_store = Mock(BarrelStore)
+        mock_store.lookup.side_effect = lambda repo, tag, name: (
+            "4567" if name in stored else None
+        )
+        mock_store.contains.return_value = False
+        mock_store.install.return_value = True
+        mock_store.lock.return_value = MagicMock()
+        return mock_store
+
+    @staticmethod
+    def __build_lockfile(locked=()) -> Mock:
+        def find(dep):
+            if dep.package_name not in locked:
+                return None
+            return {"tag": "v1.0.0"}, {
+                "id": 7,
+                "name": "{}.barrel".format(dep.package_name),
+                "url": "https://example.com/{}".format(dep.package_name),
+                "size": 8,
+                "digest": "4567",
+            }
+
+        mock_lockfile = Mock(Lockfile)
+        mock_lockfile.find.side_effect = find
+        return mock_lockfile
+
+    def test_update_downloads_all_uncached_dependencies(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(10)]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+
+        self.assertTrue(Update(project, downloader).update_project())
+
+        downloader.prefetch.assert_called_once_with(deps)
+        self.assertEqual(10, downloader.fetch_barrel.call_count)
+        self.assertEqual(10, project.update_dependency.call_count)
+        for dep in deps:
+            self.assertEqual(
+                "barrels/{}.barrel".format(dep.package_name), dep.barrel_name
+            )
+            self.assertEqual("0123", dep.barrel_hash)
+
+    def test_update_profiles_each_dependency(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(3)]
+        profiler = Profiler()
+
+        Update(
+            self.__build_project(deps), self.__build_downloader(), tracer=profiler
+        ).update_project()
+
+        report = profiler.report()
+        self.assertEqual(3, report["phases"]["resolve"]["calls"])
+        self.assertEqual(3, report["phases"]["download"]["calls"])
+        self.assertEqual(1, report["phases"]["jungle"]["calls"])
+        self.assertEqual(
+            {dep.package_name for dep in deps}, set(report["dependencies"])
+        )
+
+    def test_update_commits_cache_once(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(10)]
+        project = self.__build_project(deps)
+
+        Update(project, self.__build_downloader()).update_project()
+
+        project.transaction.assert_called_once()
+        project.transaction.return_value.__exit__.assert_called_once()
+        project.write_barrel_jungle.assert_called_once()
+
+    def test_update_with_single_job(self):
+        deps = [self.__build_dependency("Depend{}".format(i)) for i in range(3)]
+        project = self.__build_project(deps, jobs=1)
+        downloader = self.__build_downloader()
+
+        Update(project, downloader).update_project()
+
+        self.assertEqual(3, project.update_dependency.call_count)
+
+    def test_update_commits_cache_when_nothing_downloaded(self):
+        project = self.__build_project([])
+        downloader = self.__build_downloader()
+
+        Update(project, downloader).update_project()
+
+        downloader.resolve_barrel.assert_not_called()
+        project.transaction.assert_called_once()
+        project.transaction.return_value.__exit__.assert_called_once()
+        project.write_barrel_jungle.assert_called_once()
+
+    def test_failed_download_is_not_added_to_project(self):
+        deps = [self.__build_dependency("Depend0"), self.__build_dependency("Depend1")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+
+        resolve = downloader.resolve_barrel.side_effect
+
+        def resolve_or_fail(dep):
+            if dep.package_name == "Depend0":
+                raise Error("No barrel")
+            return resolve(dep)
+
+        downloader.resolve_barrel.side_effect = resolve_or_fail
+
+        self.assertFalse(Update(project, downloader).update_project())
+
+        project.update_dependency.assert_called_once_with(deps[1])
+        self.assertIsNone(deps[0].barrel_name)
+
+    def test_stored_barrel_is_installed_without_download(self):
+        deps = [self.__build_dependency("Depend0"), self.__build_dependency("Depend1")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        store = self.__build_store(["Depend0.barrel"])
+
+        Update(project, downloader, store).update_project()
+
+        store.install.assert_called_once_with("4567", "barrels/Depend0.barrel")
+        downloader.fetch_barrel.assert_called_once()
+        self.assertEqual("barrels/Depend0.barrel", deps[0].barrel_name)
+        self.assertEqual("4567", deps[0].barrel_hash)
+
+    def test_downloaded_barrel_is_added_to_store(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        store = self.__build_store()
+
+        Update(project, self.__build_downloader(), store).update_project()
+
+        store.add.assert_called_once_with(
+            "owner/Depend0",
+            "v1.0.0",
+            "Depend0.barrel",
+            "barrels/Depend0.barrel",
+            "0123",
+        )
+
+    def test_stored_content_from_another_release_is_installed(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        downloader.resolve_barrel.side_effect = lambda dep: (
+            {"tag": "v1.0.1"},
+            {"name": "Depend0.barrel", "digest": "89ab"},
+        )
+        store = self.__build_store()
+        store.contains.side_effect = lambda digest: digest == "89ab"
+
+        Update(project, downloader, store).update_project()
+
+        store.install.assert_called_once_with("89ab", "barrels/Depend0.barrel")
+        downloader.fetch_barrel.assert_not_called()
+
+    def test_failed_install_falls_back_to_download(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        store = self.__build_store(["Depend0.barrel"])
+        store.install.return_value = False
+
+        Update(project, downloader, store).update_project()
+
+        downloader.fetch_barrel.assert_called_once()
+
+    def test_update_locks_installed_dependencies(self):
+        deps = [self.__build_dependency("Depend0")]
+        cached = [self.__build_dependency("Depend1")]
+        project = self.__build_project(deps, cached=cached)
+        downloader = self.__build_downloader()
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        Update(project, downloader, lockfile=lockfile).update_project()
+
+        # Update resolves afresh, cached dependencies are only resolved to lock them
+        self.assertEqual(2, downloader.resolve_barrel.call_count)
+        self.assertEqual(2, lockfile.add.call_count)
+        lockfile.add.assert_any_call(
+            deps[0], {"tag": "v1.0.0"}, downloader.resolve_barrel(deps[0])[1], "0123"
+        )
+        lockfile.write.assert_called_once_with(project.dependencies.keys())
+
+    def test_install_uses_locked_assets(self):
+        deps = [self.__build_dependency("Depend0"), self.__build_dependency("Depend1")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        Update(
+            project, downloader, lockfile=lockfile, mode=Update.MODE_INSTALL
+        ).update_project()
+
+        downloader.prefetch.assert_called_once_with([deps[1]])
+        downloader.resolve_barrel.assert_called_once_with(deps[1])
+        self.assertEqual(2, downloader.fetch_barrel.call_count)
+        lockfile.write.assert_called_once()
+
+    def test_frozen_install_never_resolves(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        Update(
+            project, downloader, lockfile=lockfile, mode=Update.MODE_FROZEN
+        ).update_project()
+
+        downloader.prefetch.assert_not_called()
+        downloader.resolve_barrel.assert_not_called()
+        release, asset = lockfile.find(deps[0])
+        downloader.fetch_barrel.assert_called_once_with(release, asset, "barrels")
+        lockfile.add.assert_not_called()
+        lockfile.write.assert_not_called()
+
+    def test_frozen_install_fails_for_unlocked_dependency(self):
+        deps = [self.__build_dependency("Depend0"), self.__build_dependency("Depend1")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        with self.assertRaises(UpdateError) as ctx:
+            Update(
+                project, downloader, lockfile=lockfile, mode=Update.MODE_FROZEN
+            ).update_project()
+
+        self.assertIn("Depend1", ctx.exception.message)
+        downloader.fetch_barrel.assert_not_called()
+
+    def test_install_fails_when_download_fails(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        downloader.fetch_barrel.side_effect = Error("Connection refused")
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        with self.assertRaises(UpdateError):
+            Update(
+                project, downloader, lockfile=lockfile, mode=Update.MODE_FROZEN
+            ).update_project()
+
+    def test_offline_install_uses_store(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        store = self.__build_store()
+        store.contains.return_value = True
+        lockfile = self.__build_lockfile(["Depend0"])
+
+        Update(
+            project, downloader, store, lockfile, Update.MODE_OFFLINE
+        ).update_project()
+
+        store.install.assert_called_once_with("4567", "barrels/Depend0.barrel")
+        downloader.fetch_barrel.assert_not_called()
+
+    def test_offline_install_fails_before_installing_if_not_stored(self):
+        deps = [self.__build_dependency("Depend0"), self.__build_dependency("Depend1")]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        store = self.__build_store()
+        store.contains.side_effect = lambda digest: False
+        lockfile = self.__build_lockfile(["Depend0", "Depend1"])
+
+        with self.assertRaises(UpdateError):
+            Update(
+                project, downloader, store, lockfile, Update.MODE_OFFLINE
+            ).update_project()
+
+        store.install.assert_not_called()
+        downloader.fetch_barrel.assert_not_called()
+
+    def test_update_installs_dependencies_of_barrels(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+        project.is_cached.return_value = False
+
+        def require(name, version):
+            dep = self.__build_dependency(name)
+            dep.set_version(version)
+            project.dependencies[name] = dep
+            return dep
+
+        project.require.side_effect = require
+        downloader = self.__build_downloader()
+        barrels = {
+            "barrels/Depend0.barrel": {"Depend1": "1.0", "Depend2": "2.0"},
+            "barrels/Depend1.barrel": {"Depend2": "2"},
+        }
+
+        with patch.object(Manifest, "from_barrel") as read:
+            read.side_effect = lambda path: Manifest(
+                StringIO(build_manifest(barrels.get(path, {})))
+            )
+            Update(project, downloader).update_project()
+
+        self.assertEqual(["Depend0", "Depend1", "Depend2"], list(project.dependencies))
+        self.assertEqual(3, project.update_dependency.call_count)
+        downloader.prefetch.assert_any_call(
+            [project.dependencies["Depend1"], project.dependencies["Depend2"]]
+        )
+
+    def test_barrel_requirement_is_checked_against_installed_release(self):
+        lib = self.__build_dependency("Lib")
+        lib.set_version("1")
+        deps = [self.__build_dependency("Widget"), lib]
+        project = self.__build_project(deps)
+        downloader = self.__build_downloader()
+        resolve = downloader.resolve_barrel.side_effect
+
+        def resolve_latest(dep):
+            # Lib's partial requirement resolves to its latest 1.x release
+            release, asset = resolve(dep)
+            if dep.package_name == "Lib":
+                release = {"tag": "v1.5.0"}
+            return release, asset
+
+        downloader.resolve_barrel.side_effect = resolve_latest
+
+        with patch.object(Manifest, "from_barrel") as read:
+            read.side_effect = lambda path: Manifest(
+                StringIO(
+                    build_manifest(
+                        {"Lib": "1.5"} if path == "barrels/Widget.barrel" else {}
+                    )
+                )
+            )
+            self.assertTrue(Update(project, downloader).update_project())
+
+        self.assertEqual("v1.5.0", lib.resolved_tag)
+        project.require.assert_not_called()
+
+    def test_update_fails_on_conflicting_barrel_dependencies(self):
+        deps = [self.__build_dependency("Depend0")]
+        project = self.__build_project(deps)
+
+        with patch.object(Manifest, "from_barrel") as read:
+            read.return_value = Manifest(StringIO(build_manifest({"Depend0": "2.0"})))
+            with self.assertRaises(UpdateError):
+                Update(project, self.__build_downloader()).update_project()
+
+        project.write_barrel_jungle.assert_not_called()
@@ -72,3 +72,80 @@ class TestVersion(unittest.TestCase):
     def test_version_ne_different_type(self):
         ver = Version("0.4.5")
         self.assertNotEqual(34, ver)
+
+    def test_version_dots_are_not_wildcards(self):
+        ver = Version("1.2.0")
+        self.assertFalse(ver.matches("1x2y0"))
+
+    def test_version_does_not_match_longer_component(self):
+        ver = Version("1.2.0")
+        self.assertFalse(ver.matches("1.2.01"))
+        self.assertFalse(ver.matches("1.2.00"))
+        self.assertFalse(ver.matches("1.20.0"))
+
+    def test_partial_version_matches_any_patch(self):
+        ver = Version("1.2")
+        self.assertTrue(ver.matches("v1.2.0"))
+        self.assertTrue(ver.matches("v1.2.7"))
+        self.assertFalse(ver.matches("v1.3.0"))
+
+    def test_version_does_not_match_prerelease(self):
+        ver = Version("1.2.0")
+        self.assertFalse(ver.matches("v1.2.0-beta.1"))
+
+    def test_prerelease_version_matches_prerelease(self):
+        ver = Version("1.2.0-beta.1")
+        self.assertTrue(ver.matches("v1.2.0-beta.1"))
+        self.assertFalse(ver.matches("v1.2.0-beta.2"))
+        self.assertFalse(ver.matches("v1.2.0"))
+
+    def test_version_matches_build_metadata(self):
+        ver = Version("1.2.0")
+        self.assertTrue(ver.matches("1.2.0+20201001"))
+
+    def test_non_semver_version_matches_exact_tag(self):
+        ver = Version("latest")
+        self.assertTrue(ver.matches("latest"))
+        self.assertTrue(ver.matches("vlatest"))
+        self.assertFalse(ver.matches("latest2"))
+
+    def test_version_parts(self):
+        self.assertEqual((1, 2, 3, "rc.1"), Version("v1.2.3-rc.1").parts)
+        self.assertEqual((1, 2, None, None), Version("1.2").parts)
+        self.assertIsNone(Version("release-one").parts)
+
+    def test_version_ordering(self):
+        versions = [
+            Version(v)
+            for v in ["v1.10.0", "1.2.0", "1.2.0-rc.2", "1.2.0-rc.10", "0.9.1", "x"]
+        ]
+
+        self.assertEqual(
+            ["x", "0.9.1", "1.2.0-rc.2", "1.2.0-rc.10", "1.2.0", "v1.10.0"],
+            [str(v) for v in sorted(versions, key=lambda v: v.sort_key)],
+        )
+
+    def test_tags_of_same_precedence_are_not_equal(self):
+        for a, b in [("1.0.0", "v1.0.0"), ("1.0.0+a", "1.0.0+b")]:
+            self.assertEqual(Version(a).sort_key, Version(b).sort_key)
+            self.assertNotEqual(Version(a), Version(b))
+            with self.assertRaises(TypeError):
+                Version(a) < Version(b)
+
+    def test_version_hash(self):
+        self.assertEqual(hash(Version("1.2.0")), hash(Version("1.2.0")))
+        self.assertEqual(1, len({Version("1.2.0"), Version("1.2.0")}))
+
+    def test_key_range_contains_matches(self):
+        lowest, highest = Version("1.2").key_range()
+        for tag in ["1.2.0-rc.1", "1.2.0", "1.2.99"]:
+            self.assertTrue(lowest <= Version(tag).sort_key <= highest)
+        for tag in ["1.1.9", "1.3.0-rc.1"]:
+            key = Version(tag).sort_key
+            self.assertFalse(lowest <= key <= highest)
+
+    def test_version_is_exact(self):
+        self.assertTrue(Version("1.2.3").is_exact)
+        self.assertTrue(Version("v1.2.3-rc.1").is_exact)
+        self.assertFalse(Version("1.2").is_exact)
+        self.assertFalse(Version("latest").is_exact)
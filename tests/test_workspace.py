@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+# ########################## Copyrights and license ########################## #
+#                                                                              #
+# Copyright 2020 Greg Caufield <greg@embeddedcoffee.ca>                        #
+#                                                                              #
+# This file is part of MonkeyPack Package Manager                              #
+#                                                                              #
+# The MIT Licence                                                              #
+#                                                                              #
+# Permission is hereby granted, free of charge, to any person obtaining a copy #
+# of this software and associated documentation files (the "Software"), to     #
+# deal in the Software without restriction, including without limitation the   #
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or  #
+# sell copies of the Software, and to permit persons to whom the Software is   #
+# furnished to do so, subject to the following conditions:                     #
+#                                                                              #
+# The above copyright notice and this permission notice shall be included in   #
+# all copies or substantial portions of the Software.                          #
+#                                                                              #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR   #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,     #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE  #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER       #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING      #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS #
+# IN THE SOFTWARE.                                                             #
+#                                                                              #
+# ############################################################################ #
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from mbget.barrel_asset import BarrelAsset
+from mbget.errors import Error, UpdateError
+from mbget.github_downloader import GithubDownloader
+from mbget.workspace import Workspace
+
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        super(TestWorkspace, self).setUp()
+        self.__dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.__dir.cleanup)
+
+        env = patch.dict(
+            "os.environ", {"XDG_CACHE_HOME": os.path.join(self.__dir.name, "cache")}
+        )
+        env.start()
+        self.addCleanup(env.stop)
+
+        pat = patch("mbget.github_downloader.GithubDownloader")
+        self.__downloader_class = pat.start()
+        self.addCleanup(pat.stop)
+        self.__downloader = self.__build_downloader()
+        self.__downloader_class.return_value = self.__downloader
+
+    @staticmethod
+    def __build_args(**kwargs) -> argparse.Namespace:
+        args = dict(
+            token=None,
+            package=None,
+            directory=None,
+            jungle=None,
+            manifest=None,
+            config=None,
+            jobs=None,
+            verify=None,
+        )
+        args.update(kwargs)
+        return argparse.Namespace(**args)
+
+    @staticmethod
+    def __build_downloader() -> Mock:
+        def resolve(dep):
+            name = "{}.barrel".format(dep.package_name)
+            asset = {"id": 1, "name": name, "url": name, "size": 8, "digest": None}
+            return {"tag": "v1.0.0"}, asset
+
+        def fetch(release, asset, directory):
+            content = asset["name"].encode()
+            path = os.path.join(directory, asset["name"])
+            with open(path, "wb") as f:
+                f.write(content)
+            digest = hashlib.sha256(content).hexdigest()
+            return BarrelAsset(asset["name"], release["tag"], path, digest)
+
+        mock_downloader = Mock(GithubDownloader)
+        mock_downloader.resolve_barrel.side_effect = resolve
+        mock_downloader.fetch_barrel.side_effect = fetch
+        return mock_downloader
+
+    def __write_project(self, path: str, depends) -> str:
+        root = os.path.join(self.__dir.name, path)
+        os.makedirs(root)
+
+        manifest = (
+            '<iq:manifest xmlns:iq="http://www.garmin.com/xml/connectiq">'
+            "<iq:application><iq:barrels>"
+        )
+        for name in depends:
+            manifest += '<iq:depends name="{name}" version="1.0.0"/>'.format(name=name)
+        manifest += "</iq:barrels></iq:application></iq:manifest>"
+
+        with open(os.path.join(root, "manifest.xml"), "w") as f:
+            f.write(manifest)
+
+        with open(os.path.join(root, "packages.txt"), "w") as f:
+            for name in depends:
+                f.write("{name} => owner/{name}\n".format(name=name))
+
+        return root
+
+    def __read(self, *path: str) -> str:
+        with open(os.path.join(self.__dir.name, *path), "r") as f:
+            return f.read()
+
+    def test_discover_matches_project_dirs(self):
+        watch = self.__write_project(os.path.join("apps", "watch"), ["A"])
+        face = self.__write_project(os.path.join("apps", "face"), ["A"])
+        os.makedirs(os.path.join(self.__dir.name, "apps", "docs"))
+
+        roots = Workspace.discover(
+            self.__build_args(), os.path.join(self.__dir.name, "apps", "*")
+        )
+
+        self.assertEqual([face, watch], roots)
+
+    def test_discover_matches_manifests(self):
+        watch = self.__write_project(os.path.join("apps", "watch"), ["A"])
+        face = self.__write_project(os.path.join("libs", "deep", "face"), ["A"])
+
+        roots = Workspace.discover(
+            self.__build_args(), os.path.join(self.__dir.name, "**", "manifest.xml")
+        )
+
+        self.assertEqual([watch, face], roots)
+
+    def test_discover_reads_globs_from_file(self):
+        watch = self.__write_project(os.path.join("apps", "watch"), ["A"])
+        self.__write_project(os.path.join("apps", "face"), ["A"])
+        listing = os.path.join(self.__dir.name, "workspace.txt")
+        with open(listing, "w") as f:
+            f.write("# Only the watch app\n\napps/watch\napps/watch\n")
+
+        roots = Workspace.discover(self.__build_args(), listing)
+
+        self.assertEqual([watch], roots)
+
+    def test_update_downloads_shared_barrels_once(self):
+        self.__write_project("watch", ["A", "B"])
+        self.__write_project("face", ["A"])
+        args = self.__build_args()
+
+        Workspace(args, os.path.join(self.__dir.name, "*")).update()
+
+        self.__downloader_class.assert_called_once()
+        self.__downloader.prefetch.assert_called()
+        self.assertEqual(2, self.__downloader.fetch_barrel.call_count)
+        for project in ["watch", "face"]:
+            self.assertEqual(
+                "A.barrel", self.__read(project, ".mbpkg", "A.barrel"), project
+            )
+
+    def test_update_records_project_relative_paths(self):
+        self.__write_project("watch", ["A"])
+
+        Workspace(self.__build_args(), os.path.join(self.__dir.name, "*")).update()
+
+        asset = os.path.join(".mbpkg", "A.barrel")
+        self.assertIn(
+            'A = "{asset}"'.format(asset=asset), self.__read("watch", "barrels.jungle")
+        )
+        cache = json.loads(self.__read("watch", ".mbpkg", ".mbgetcache"))
+        self.assertEqual(asset, cache["A"]["asset"])
+
+    def test_update_reports_failed_projects(self):
+        self.__write_project("watch", ["A"])
+        broken = self.__write_project("face", ["A"])
+        with open(os.path.join(broken, "packages.txt"), "w") as f:
+            f.write("not a package map\n")
+
+        with self.assertRaises(UpdateError) as ctx:
+            Workspace(self.__build_args(), os.path.join(self.__dir.name, "*")).update()
+
+        self.assertIn(broken, ctx.exception.message)
+        self.assertEqual("A.barrel", self.__read("watch", ".mbpkg", "A.barrel"))
+
+    def test_update_reports_projects_with_failed_downloads(self):
+        watch = self.__write_project("watch", ["A"])
+        self.__write_project("face", ["B"])
+        fetch = self.__downloader.fetch_barrel.side_effect
+
+        def fetch_failing(release, asset, directory):
+            if asset["name"] == "A.barrel":
+                raise Error("Connection reset")
+            return fetch(release, asset, directory)
+
+        self.__downloader.fetch_barrel.side_effect = fetch_failing
+
+        with self.assertRaises(UpdateError) as ctx:
+            Workspace(self.__build_args(), os.path.join(self.__dir.name, "*")).update()
+
+        self.assertIn("1 project(s): {}".format(watch), ctx.exception.message)
+        self.assertEqual("B.barrel", self.__read("face", ".mbpkg", "B.barrel"))
+
+    def test_update_without_projects_fails(self):
+        with self.assertRaises(UpdateError):
+            Workspace(self.__build_args(), os.path.join(self.__dir.name, "*")).update()